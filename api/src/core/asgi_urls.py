@@ -0,0 +1,42 @@
+"""
+URLconf for the ASGI entry point (see core/asgi.py): the async read views
+in front of the normal routes. Anything not matched here, and every
+non-GET request to these paths, is served by the same code as under WSGI.
+"""
+
+from django.urls import path, re_path
+
+from core.asyncviews import AsyncReads
+from investments.views import InvestmentViewSet
+from listings import views as lv
+from listings.views import ListingViewSet
+from users import views as u
+
+from .urls import urlpatterns as sync_urlpatterns
+
+LIST_ACTIONS = {"get": "list", "post": "create"}
+DETAIL_ACTIONS = {
+    "get": "retrieve",
+    "put": "update",
+    "patch": "partial_update",
+    "delete": "destroy",
+}
+
+# Numeric ids only, so ".../batch/", ".../export.csv" etc. fall through to
+# the router's routes below. The funding streams only exist here: served
+# synchronously, each would pin a worker for the life of the connection.
+urlpatterns = [
+    path("api/auth/me", u.ame_view),
+    path("api/listings/funding/stream/", lv.funding_multiplex_view),
+    path("api/listings/<int:pk>/funding/stream/", lv.funding_stream_view),
+    path("api/listings/", AsyncReads(ListingViewSet, LIST_ACTIONS).as_view()),
+    re_path(
+        r"^api/listings/(?P<pk>[0-9]+)/$",
+        AsyncReads(ListingViewSet, DETAIL_ACTIONS).as_view(),
+    ),
+    path("api/investments/", AsyncReads(InvestmentViewSet, LIST_ACTIONS).as_view()),
+    re_path(
+        r"^api/investments/(?P<pk>[0-9]+)/$",
+        AsyncReads(InvestmentViewSet, DETAIL_ACTIONS).as_view(),
+    ),
+] + sync_urlpatterns
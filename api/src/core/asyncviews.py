@@ -0,0 +1,108 @@
+"""
+Async read path for DRF viewsets, used by the ASGI entry point.
+
+DRF's APIView.dispatch() is synchronous, so under ASGI every request would
+hold a thread for its whole lifetime. `AsyncReads` serves GET list /
+retrieve natively instead: it sets the viewset up the way dispatch() does,
+resolves the session user with `request.auser()` and fetches rows through
+the async ORM (`AsyncReadMixin`). Everything that doesn't touch the
+database (get_queryset(), permissions, serializers, paginator bookkeeping,
+conditional-GET validators, rendering) is the viewset's own code, so both
+paths return the same responses. Other methods go to the normal sync view.
+
+Only session authentication is resolved on this path, which is all
+REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"] configures.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from rest_framework.response import Response
+
+from core import replicas
+from core.metrics import timed
+
+ASYNC_ACTIONS = ("list", "retrieve")
+
+
+class AsyncReadMixin:
+    """Async counterparts of ListModelMixin.list / RetrieveModelMixin.retrieve."""
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(
+                queryset, request, view=self
+            )
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def aget_object(self):
+        # GenericAPIView.get_object() with the lookup awaited
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class AsyncReads:
+    """
+    An async view for `viewset` bound to `actions` (as for
+    ViewSet.as_view()), serving GET/HEAD list and retrieve asynchronously.
+    """
+
+    def __init__(self, viewset, actions):
+        self.viewset = viewset
+        self.actions = dict(actions)
+        # as_view() also maps "head" to the GET action in self.actions
+        self.sync_view = viewset.as_view(self.actions)
+
+    def as_view(self):
+        async def view(request, *args, **kwargs):
+            action = self.actions.get(request.method.lower())
+            if action not in ASYNC_ACTIONS:
+                return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+            return await self.dispatch(request, action, args, kwargs)
+
+        # DRF enforces CSRF itself for session-authenticated unsafe methods
+        view.csrf_exempt = True
+        view.cls = self.viewset
+        view.actions = self.actions
+        return view
+
+    async def dispatch(self, request, action, args, kwargs):
+        view = self.viewset()
+        view.action_map = self.actions
+        view.args, view.kwargs = args, kwargs
+        request = view.initialize_request(request, *args, **kwargs)
+        view.request = request
+        view.headers = view.default_response_headers
+        try:
+            # Resolve the user up front so perform_authentication() in
+            # initial() doesn't hit the database synchronously.
+            with timed("auth"):
+                request.user = await request._request.auser()
+            request.auth = None
+            # and the read-your-writes pin, which is in the cache for users
+            if settings.DATABASE_REPLICAS:
+                request.replica_pinned = await replicas.apinned(request)
+            view.initial(request, *args, **kwargs)
+            handler = getattr(view, f"a{action}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        # rendered by Django's async handler, like any TemplateResponse
+        return view.finalize_response(request, response, *args, **kwargs)
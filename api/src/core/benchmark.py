@@ -0,0 +1,448 @@
+"""
+End-to-end API benchmark.
+
+`seed()` bulk-loads a throwaway dataset (users, live listings and
+investments, all tagged with one email prefix). `run()` then drives the
+real URLs either through django.test.Client from `concurrency` threads,
+each with its own client and database connection (WSGI), or through
+AsyncClient from `concurrency` tasks on one event loop (ASGI, with the
+async read views), and reports per scenario:
+
+    requests, errors, p50/p95/p99/mean/max latency (ms),
+    queries per request (mean/max) and throughput (requests/s)
+
+The WSGI threads release their connection after every request like a
+server does, so the report reflects connect-per-request (DB_POOL=0) or
+pool checkouts; with a pool it also has the pools' checkout counters.
+
+`compare()` diffs a report against a saved baseline report. Everything
+here is driven by `manage.py benchmark`.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections, connection
+from django.db.models import Count, DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import dbpool
+from investments import ledger
+from investments.models import Investment, LedgerEntry
+from listings import stats
+from listings.models import Listing
+
+User = get_user_model()
+
+PASSWORD = "bench-password-1"
+INVEST_AMOUNT = Decimal("1.00")
+BATCH_SIZE = 2000
+ASGI_URLCONF = "core.asgi_urls"
+
+# Relative regression allowed before compare() flags a metric
+DEFAULT_TOLERANCE = 0.2
+
+
+# --- dataset -------------------------------------------------------------
+
+
+def seed(users, listings, investments, prefix=None, rng=None):
+    """
+    Bulk-create `users` users (a tenth of them sellers), `listings` live
+    listings and `investments` investments spread over them, then bring the
+    listings' funding counters in line. Returns a dict describing the
+    dataset; pass it to run() and cleanup().
+    """
+    rng = rng or random.Random(0)
+    prefix = prefix or f"bench-{time.time_ns()}"
+    password = make_password(PASSWORD)  # hash once; PBKDF2 per row is slow
+
+    User.objects.bulk_create(
+        (
+            User(email=f"{prefix}-{i}@example.com", password=password)
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(
+        User.objects.filter(email__startswith=f"{prefix}-")
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    seller_ids = user_ids[: max(1, len(user_ids) // 10)]
+
+    Listing.objects.bulk_create(
+        (
+            Listing(
+                seller_id=seller_ids[i % len(seller_ids)],
+                title=f"Benchmark item {i}",
+                description=f"{prefix} seeded listing",
+                category=rng.choice(("cards", "watches", "art", "wine", "cars")),
+                # big enough that the invest scenario never exhausts it
+                target_amount=Decimal("1000000000.00"),
+                min_investment=INVEST_AMOUNT,
+                status=Listing.STATUS_LIVE,
+            )
+            for i in range(listings)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    listing_ids = list(
+        Listing.objects.filter(seller_id__in=seller_ids)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+    # bulk_create skips Investment.save(), so the counters and ledger
+    # entries are filled in below
+    created = Investment.objects.bulk_create(
+        (
+            Investment(
+                investor_id=rng.choice(user_ids),
+                listing_id=rng.choice(listing_ids),
+                amount=Decimal(rng.randrange(1, 500)),
+            )
+            for _ in range(investments if listing_ids else 0)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    LedgerEntry.objects.bulk_create(
+        (
+            LedgerEntry(
+                investor_id=inv.investor_id,
+                listing_id=inv.listing_id,
+                kind=LedgerEntry.KIND_INVEST,
+                amount=inv.amount,
+                investment_id=inv.pk,
+            )
+            for inv in created
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ledger.ensure_snapshots({(inv.investor_id, inv.listing_id) for inv in created})
+    _refresh_counters(listing_ids)
+    stats.listings_added(Listing.objects.filter(pk__in=listing_ids).iterator())
+
+    return {
+        "prefix": prefix,
+        "user_ids": user_ids,
+        "listing_ids": listing_ids,
+        "counts": {
+            "users": len(user_ids),
+            "listings": len(listing_ids),
+            "investments": investments if listing_ids else 0,
+        },
+    }
+
+
+def _refresh_counters(listing_ids):
+    per_listing = (
+        Investment.objects.filter(listing=OuterRef("pk")).order_by().values("listing")
+    )
+    Listing.objects.filter(pk__in=listing_ids).update(
+        total_invested=Coalesce(
+            Subquery(per_listing.annotate(t=Sum("amount")).values("t")),
+            Value(Decimal("0.00")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        investor_count=Coalesce(
+            Subquery(
+                per_listing.annotate(c=Count("investor", distinct=True)).values("c")
+            ),
+            Value(0),
+        ),
+    )
+
+
+def cleanup(dataset):
+    # Cascades to the seeded listings and every investment in them, once
+    # their (protected) ledger entries are gone
+    prefix = f"{dataset['prefix']}-"
+    LedgerEntry.objects.filter(listing__seller__email__startswith=prefix).purge()
+    User.objects.filter(email__startswith=prefix).delete()
+
+
+# --- scenarios -------------------------------------------------------------
+#
+# Each scenario is (needs_login, request). `request(client, dataset, rng)`
+# issues exactly one HTTP request and returns the response (an awaitable
+# one for AsyncClient).
+
+
+def _listing_list(client, dataset, rng):
+    return client.get("/api/listings/")
+
+
+def _listing_detail(client, dataset, rng):
+    return client.get(f"/api/listings/{rng.choice(dataset['listing_ids'])}/")
+
+
+def _investment_list(client, dataset, rng):
+    return client.get("/api/investments/")
+
+
+def _me(client, dataset, rng):
+    return client.get("/api/auth/me")
+
+
+def _login(client, dataset, rng):
+    i = rng.randrange(len(dataset["user_ids"]))
+    return client.post(
+        "/api/auth/login",
+        {"email": f"{dataset['prefix']}-{i}@example.com", "password": PASSWORD},
+        content_type="application/json",
+    )
+
+
+def _invest(client, dataset, rng):
+    return client.post(
+        "/api/investments/",
+        {"listing": rng.choice(dataset["listing_ids"]), "amount": str(INVEST_AMOUNT)},
+        content_type="application/json",
+    )
+
+
+SCENARIOS = {
+    "listing_list": (False, _listing_list),
+    "listing_detail": (False, _listing_detail),
+    "investment_list": (True, _investment_list),
+    "me": (True, _me),
+    "login": (False, _login),
+    "invest": (True, _invest),
+}
+
+
+# --- running ---------------------------------------------------------------
+
+
+def run_scenario(name, dataset, requests, concurrency, seed=0):
+    needs_login, request = SCENARIOS[name]
+    chunks = [range(w, requests, concurrency) for w in range(concurrency)]
+
+    # Log the clients in up front, outside the timed concurrent part
+    clients = []
+    for w in range(concurrency):
+        # Unhandled exceptions (e.g. lock timeouts under load) count as 500s
+        client = Client(raise_request_exception=False)
+        if needs_login:
+            user_id = dataset["user_ids"][w % len(dataset["user_ids"])]
+            client.force_login(User.objects.get(pk=user_id))
+        clients.append(client)
+    # don't hold a pooled connection the worker threads could use
+    connection.close()
+
+    def worker(w):
+        rng = random.Random(seed * 1000 + w)
+        client = clients[w]
+        samples = []
+        try:
+            for _ in chunks[w]:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = request(client, dataset, rng)
+                    elapsed = time.perf_counter() - started
+                samples.append((elapsed, len(queries), response.status_code))
+                # what request_finished does under a real server (the test
+                # client skips it): close, or return to the pool
+                close_old_connections()
+        finally:
+            connection.close()
+        return samples
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = [s for chunk in pool.map(worker, range(concurrency)) for s in chunk]
+    return summarize(samples, time.perf_counter() - started, concurrency)
+
+
+def run_scenario_asgi(name, dataset, requests, concurrency, seed=0):
+    """
+    run_scenario() through the ASGI handler and async read views: all
+    `concurrency` clients share one event loop, like an ASGI worker.
+
+    Async ORM queries from concurrent requests interleave on one
+    connection, so only the average query count per request is reported.
+    """
+    needs_login, request = SCENARIOS[name]
+    chunks = [range(w, requests, concurrency) for w in range(concurrency)]
+
+    clients = []
+    for w in range(concurrency):
+        client = AsyncClient(raise_request_exception=False)
+        if needs_login:
+            user_id = dataset["user_ids"][w % len(dataset["user_ids"])]
+            client.force_login(User.objects.get(pk=user_id))
+        clients.append(client)
+
+    async def worker(w):
+        rng = random.Random(seed * 1000 + w)
+        samples = []
+        for _ in chunks[w]:
+            started = time.perf_counter()
+            response = await request(clients[w], dataset, rng)
+            elapsed = time.perf_counter() - started
+            samples.append((elapsed, None, response.status_code))
+        return samples
+
+    async def run_all():
+        results = await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        return [s for chunk in results for s in chunk]
+
+    with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+        # async_to_sync runs the async ORM's sync work on this thread
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            samples = async_to_sync(run_all)()
+            elapsed = time.perf_counter() - started
+    stats = summarize(samples, elapsed, concurrency)
+    if samples:
+        stats["queries_per_request"] = _round(len(queries) / len(samples))
+    return stats
+
+
+def summarize(samples, wall_seconds, concurrency):
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[1] for s in samples if s[1] is not None]
+    return {
+        "requests": len(samples),
+        "concurrency": concurrency,
+        "errors": sum(1 for s in samples if s[2] >= 400),
+        "p50_ms": _round(percentile(latencies, 50)),
+        "p95_ms": _round(percentile(latencies, 95)),
+        "p99_ms": _round(percentile(latencies, 99)),
+        "mean_ms": _round(statistics.fmean(latencies) if latencies else None),
+        "max_ms": _round(latencies[-1] if latencies else None),
+        "queries_per_request": _round(statistics.fmean(queries) if queries else None),
+        "max_queries": max(queries, default=None),
+        "throughput_rps": _round(len(samples) / wall_seconds if wall_seconds else None),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+RUNNERS = {"wsgi": run_scenario, "asgi": run_scenario_asgi}
+
+
+def run(
+    dataset,
+    requests,
+    concurrency,
+    scenarios=None,
+    seed=0,
+    interface="wsgi",
+    jobs_backend=None,
+):
+    """
+    Run `scenarios` (default: all) through `interface`: "wsgi" (threads
+    through the sync handler, as under gunicorn's sync workers) or "asgi".
+    `jobs_backend` overrides JOBS_BACKEND, e.g. to compare the invest
+    scenario with its side effects inline ("sync") and queued ("redis").
+    """
+    names = scenarios or list(SCENARIOS)
+    runner = RUNNERS[interface]
+    jobs_backend = jobs_backend or settings.JOBS_BACKEND
+    pool_before = dbpool.stats()
+    with override_settings(JOBS_BACKEND=jobs_backend):
+        results = {
+            name: runner(name, dataset, requests, concurrency, seed)
+            for name in names
+        }
+    return {
+        "dataset": dataset["counts"],
+        "vendor": connection.vendor,
+        "interface": interface,
+        "jobs_backend": jobs_backend,
+        "db_pool": pool_report(pool_before, dbpool.stats()),
+        "scenarios": results,
+    }
+
+
+def pool_report(before, after):
+    """Pool settings and checkout counters over the run, or None unpooled."""
+    pool = after.get("default")
+    if pool is None:
+        return None
+    start = before.get("default", {})
+
+    def delta(stat):
+        return pool.get(stat, 0) - start.get(stat, 0)
+
+    return {
+        "min_size": pool["pool_min"],
+        "max_size": pool["pool_max"],
+        "checkouts": delta("requests_num"),
+        "exhausted": delta("requests_queued"),
+        "wait_ms": delta("requests_wait_ms"),
+        "timeouts": delta("requests_errors"),
+    }
+
+
+def throughput_ratio(report, other):
+    """report / other throughput per scenario both ran."""
+    ratios = {}
+    for name, stats in report["scenarios"].items():
+        theirs = other["scenarios"].get(name, {}).get("throughput_rps")
+        if stats["throughput_rps"] and theirs:
+            ratios[name] = _round(stats["throughput_rps"] / theirs)
+    return ratios
+
+
+# --- baselines -------------------------------------------------------------
+
+# metric -> True when a higher value is worse
+COMPARED_METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "p99_ms": True,
+    "queries_per_request": True,
+    "throughput_rps": False,
+}
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Metrics of `report` that regressed against `baseline` by more than
+    `tolerance` (a fraction). Query counts are deterministic, so any
+    increase there counts. Scenarios missing from either side are skipped.
+    """
+    regressions = []
+    for name, stats in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            old, new = before.get(metric), stats.get(metric)
+            if old is None or new is None:
+                continue
+            allowed = 0 if metric == "queries_per_request" else tolerance
+            if higher_is_worse:
+                regressed = new > old * (1 + allowed)
+            else:
+                regressed = new < old * (1 - allowed)
+            if regressed:
+                regressions.append(
+                    {"scenario": name, "metric": metric, "baseline": old, "current": new}
+                )
+    return regressions
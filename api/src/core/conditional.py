@@ -0,0 +1,166 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+class ConditionalGetMixin:
+    """
+    Strong ETag / Last-Modified support for list and retrieve.
+
+    Validators are built from a few cheap columns (`etag_fields`) of exactly
+    the rows in the response. Plain requests derive them from the rows that
+    were fetched anyway; requests carrying If-None-Match / If-Modified-Since
+    first run a narrow query for just those columns, so a match is answered
+    with a 304 before anything is serialized. A view whose `validators_for`
+    returns None sends no validators for that response.
+
+    Lists carry only the ETag. Their newest timestamp doesn't move when a
+    row is deleted or leaves the filter, so If-Modified-Since alone could
+    answer 304 for a list that lost rows. Every field in
+    `last_modified_fields` must also be in `etag_fields`; "a__b" paths
+    follow select_related relations.
+    """
+
+    etag_fields = ("updated_at",)
+    last_modified_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(self.get_list_validators)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        return self.set_validators(response, self.get_page_validators())
+
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(self.get_object_validators)
+        if not_modified is not None:
+            return not_modified
+        response = super().retrieve(request, *args, **kwargs)
+        return self.set_validators(response, self.validators_for([self._object]))
+
+    async def alist(self, request, *args, **kwargs):
+        # The async path has no early narrow query; the 304 check runs on
+        # the rows it fetched anyway.
+        response = await super().alist(request, *args, **kwargs)
+        return self.conditional_response(response, self.get_page_validators())
+
+    async def aretrieve(self, request, *args, **kwargs):
+        response = await super().aretrieve(request, *args, **kwargs)
+        return self.conditional_response(
+            response, self.validators_for([self._object])
+        )
+
+    def get_object(self):
+        self._object = super().get_object()
+        return self._object
+
+    async def aget_object(self):
+        self._object = await super().aget_object()
+        return self._object
+
+    def conditional_response(self, response, validators):
+        """A 304 if the client's copy matches `validators`, else `response`."""
+        if validators is None:
+            return response
+        not_modified = get_conditional_response(self.request, *validators)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(response, validators)
+
+    def check_not_modified(self, get_validators):
+        """A 304 response if the client's copy is current, else None."""
+        headers = self.request.headers
+        if "If-None-Match" not in headers and "If-Modified-Since" not in headers:
+            return None
+        validators = get_validators()
+        if validators is None:
+            return None
+        return get_conditional_response(self.request, *validators)
+
+    def set_validators(self, response, validators):
+        if validators is None:
+            return response
+        etag, last_modified = validators
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # always revalidate; no heuristic freshness from Last-Modified
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def get_list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(*self._validator_fields())
+        if self.pagination_class is None:
+            return self.list_validators_for(list(queryset))
+        # A private paginator, so self.paginator is untouched for the real
+        # response; whether there is a next page changes the body too.
+        paginator = self.pagination_class()
+        rows = paginator.paginate_queryset(queryset, self.request, view=self)
+        return self.list_validators_for(
+            rows, extra=getattr(paginator, "has_more", None)
+        )
+
+    def get_page_validators(self):
+        paginator = self.paginator
+        if paginator is None or not hasattr(paginator, "page"):
+            return self.get_list_validators()
+        return self.list_validators_for(
+            paginator.page, extra=getattr(paginator, "has_more", None)
+        )
+
+    def list_validators_for(self, rows, extra=None):
+        """validators_for() without the Last-Modified half (see above)."""
+        validators = self.validators_for(rows, extra)
+        return None if validators is None else (validators[0], None)
+
+    def get_object_validators(self):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            row = (
+                queryset.filter(**{self.lookup_field: self.kwargs[lookup]})
+                .values(*self._validator_fields())
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if row is None:
+            return None
+        return self.validators_for([row])
+
+    def validators_for(self, rows, extra=None):
+        digest = hashlib.sha256()
+        # The representation also depends on the query (filters, page size,
+        # sparse fieldsets...), so those are part of the tag.
+        digest.update(self.request.get_full_path().encode())
+        digest.update(repr(extra).encode())
+        stamps = []
+        for row in rows:
+            values = [_field(row, f) for f in ("id", *self.etag_fields)]
+            digest.update(repr(values).encode())
+            stamps.extend(_field(row, f) for f in self.last_modified_fields)
+        etag = f'"{digest.hexdigest()[:32]}"'
+
+        stamps = [s for s in stamps if s]
+        last_modified = int(max(stamps).timestamp()) if stamps else None
+        return etag, last_modified
+
+    def _validator_fields(self):
+        fields = {"id", *self.etag_fields}
+        default = getattr(self.pagination_class, "ordering", ())
+        ordering = getattr(self, "keyset_ordering", default)
+        fields.update(f.lstrip("-") for f in ordering)
+        return sorted(fields)
+
+
+def _field(row, path):
+    # `row` is either a .values() dict or a model instance
+    if isinstance(row, dict):
+        return row[path]
+    for name in path.split("__"):
+        row = getattr(row, name)
+    return row
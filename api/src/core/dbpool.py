@@ -0,0 +1,89 @@
+"""
+Pooled Postgres connections and their metrics.
+
+With DB_POOL=1 (the default on Postgres) every database alias gets a
+psycopg_pool ConnectionPool through Django's OPTIONS["pool"]. The pool
+belongs to the worker process: a request's thread checks a connection out
+on its first query and puts it back when the request finishes, instead of
+connecting and disconnecting every time. Sizing is per worker process
+(DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE, see settings.py). A connection is
+health-checked (CONN_HEALTH_CHECKS) as it's handed out, and idle
+connections are closed after DB_POOL_MAX_IDLE seconds.
+
+`exposition()` adds the pools' counters to /api/metrics (core/metrics.py).
+These are per process like the other metrics:
+
+  db_pool_checkouts_total          connections handed out
+  db_pool_exhausted_total          checkouts that found no idle connection
+                                   and had to wait for one
+  db_pool_wait_seconds_total       time spent waiting in those checkouts
+  db_pool_timeouts_total           checkouts that gave up after
+                                   DB_POOL_TIMEOUT seconds (a 500)
+  db_pool_bad_returns_total        connections returned broken and dropped
+  db_pool_size / db_pool_idle / db_pool_waiting   current gauges
+"""
+
+from django.db import connections
+
+# psycopg_pool stat -> (metric name, help, scale to the metric's unit)
+COUNTERS = {
+    "requests_num": ("checkouts_total", "Connections checked out of the pool.", 1),
+    "requests_queued": (
+        "exhausted_total",
+        "Checkouts that found no idle connection and waited.",
+        1,
+    ),
+    "requests_wait_ms": (
+        "wait_seconds_total",
+        "Time checkouts spent waiting for a connection.",
+        0.001,
+    ),
+    "requests_errors": ("timeouts_total", "Checkouts that timed out.", 1),
+    "returns_bad": ("bad_returns_total", "Connections returned broken.", 1),
+}
+GAUGES = {
+    "pool_size": ("size", "Connections open or being opened."),
+    "pool_available": ("idle", "Idle connections in the pool."),
+    "requests_waiting": ("waiting", "Checkouts currently waiting."),
+}
+
+
+def pools():
+    """{alias: ConnectionPool} for the aliases that use one."""
+    result = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            result[alias] = pool
+    return result
+
+
+def stats():
+    """{alias: psycopg_pool stats} for every pooled alias."""
+    return {alias: pool.get_stats() for alias, pool in pools().items()}
+
+
+def exposition():
+    """Prometheus lines for every pooled alias; none without pooling."""
+    current = stats()
+    if not current:
+        return []
+    lines = []
+    for stat, (name, description, scale) in COUNTERS.items():
+        lines += [
+            f"# HELP db_pool_{name} {description}",
+            f"# TYPE db_pool_{name} counter",
+        ]
+        for alias, values in sorted(current.items()):
+            value = values.get(stat, 0)
+            if scale != 1:
+                value = round(value * scale, 6)
+            lines.append(f'db_pool_{name}{{alias="{alias}"}} {value}')
+    for stat, (name, description) in GAUGES.items():
+        lines += [
+            f"# HELP db_pool_{name} {description}",
+            f"# TYPE db_pool_{name} gauge",
+        ]
+        for alias, values in sorted(current.items()):
+            lines.append(f'db_pool_{name}{{alias="{alias}"}} {values.get(stat, 0)}')
+    return lines
@@ -0,0 +1,151 @@
+"""
+Streaming CSV / NDJSON exports.
+
+`export_response()` turns a queryset into a StreamingHttpResponse that
+reads `.values_list()` rows through `QuerySet.iterator(chunk_size=...)`
+(a server-side cursor on PostgreSQL) and encodes them one line at a time,
+so memory stays flat no matter how many rows are exported. Filters are
+parsed and validated before the response starts, so bad parameters are
+still a normal 400.
+
+Under ASGI (core/asgi.py) Django would read a synchronous iterator into a
+list before sending any of it, so there the response gets an async
+generator instead. It advances the same row iterator one chunk at a time
+in sync_to_async and sends each chunk's lines as they are encoded.
+(`QuerySet.aiterator()` would be the obvious tool, but for values_list()
+querysets it starts the query on the event loop, which Django refuses.)
+"""
+
+import csv
+from datetime import datetime, time
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def filter_export(queryset, params, listing_field, status_field):
+    """
+    Apply the common export filters from the query string:
+
+        created_after   created_at >= this ISO date/datetime
+        created_before  created_at <  this ISO date/datetime
+        listing         listing id (repeatable)
+        status          listing status (repeatable)
+    """
+    after = _parse_bound(params, "created_after")
+    if after is not None:
+        queryset = queryset.filter(created_at__gte=after)
+    before = _parse_bound(params, "created_before")
+    if before is not None:
+        queryset = queryset.filter(created_at__lt=before)
+
+    listing_ids = params.getlist("listing")
+    if listing_ids:
+        try:
+            listing_ids = [int(v) for v in listing_ids]
+        except ValueError:
+            raise ValidationError({"listing": "Expected listing ids."})
+        queryset = queryset.filter(**{f"{listing_field}__in": listing_ids})
+
+    statuses = params.getlist("status")
+    if statuses:
+        queryset = queryset.filter(**{f"{status_field}__in": statuses})
+    return queryset
+
+
+def _parse_bound(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        value = parse_datetime(raw)
+        if value is None:
+            day = parse_date(raw)
+            value = day and datetime.combine(day, time.min)
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: "Expected an ISO 8601 date or datetime."})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def export_response(request, queryset, columns, fmt, filename):
+    """
+    Stream `columns` (a sequence of (header, ORM path) pairs) of every row
+    in `queryset` as `fmt` ("csv" or "ndjson").
+    """
+    if fmt not in CONTENT_TYPES:
+        raise NotFound(f"Unknown export format {fmt!r}.")
+    headers = [header for header, _ in columns]
+    rows = queryset.order_by("pk").values_list(*(path for _, path in columns))
+    encoder = _csv_encoder if fmt == "csv" else _ndjson_encoder
+    first, encode = encoder(headers)
+    rows = rows.iterator(chunk_size=CHUNK_SIZE)
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        lines = _alines(first, encode, rows)
+    else:
+        lines = _lines(first, encode, rows)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def _lines(first, encode, rows):
+    if first is not None:
+        yield first
+    for row in rows:
+        yield encode(row)
+
+
+async def _alines(first, encode, rows):
+    def next_chunk():
+        return [encode(row) for row in islice(rows, CHUNK_SIZE)]
+
+    if first is not None:
+        yield first
+    while chunk := await sync_to_async(next_chunk)():
+        yield "".join(chunk)
+
+
+class _Echo:
+    """csv.writer target that hands each encoded line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_encoder(headers):
+    # (header line, row -> line)
+    writer = csv.writer(_Echo())
+
+    def encode(row):
+        return writer.writerow(
+            v.isoformat() if isinstance(v, datetime) else v for v in row
+        )
+
+    return writer.writerow(headers), encode
+
+
+def _ndjson_encoder(headers):
+    # NDJSON has no header line
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+    def encode(row):
+        return encoder.encode(dict(zip(headers, row))) + "\n"
+
+    return None, encode
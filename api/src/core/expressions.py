@@ -0,0 +1,63 @@
+from django.db.models import DecimalField, Func, IntegerField, Subquery
+
+
+class Percent(Func):
+    """
+    `numerator / denominator * 100`, or 0 when the denominator isn't positive.
+
+    Multiplies by 100.0 rather than a Decimal so SQLite, which would CAST a
+    Decimal expression to NUMERIC and then do integer division, gets real
+    arithmetic; PostgreSQL stays in exact numeric.
+    """
+
+    arity = 2
+    output_field = DecimalField(max_digits=9, decimal_places=4)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        numerator, denominator = self.get_source_expressions()
+        num_sql, num_params = compiler.compile(numerator)
+        den_sql, den_params = compiler.compile(denominator)
+        sql = (
+            f"CASE WHEN {den_sql} > 0 "
+            f"THEN ({num_sql} * 100.0) / {den_sql} ELSE 0 END"
+        )
+        return sql, (*den_params, *num_params, *den_params)
+
+
+
+class CountAbove(Subquery):
+    """
+    How many rows of `queryset` have `column` above `threshold`, an
+    expression of the outer query. For counting a grouped queryset's
+    groups by their aggregate: a HAVING correlated with the outer query
+    would make Django group by the outer columns, which SQLite rejects.
+    """
+
+    template = (
+        "(SELECT COUNT(*) FROM (%(subquery)s) counted "
+        "WHERE counted.%(column)s > %(threshold)s)"
+    )
+    output_field = IntegerField()
+
+    def __init__(self, queryset, column, threshold):
+        super().__init__(queryset)
+        self.column = column
+        self.threshold = threshold
+
+    def get_source_expressions(self):
+        return [self.query, self.threshold]
+
+    def set_source_expressions(self, exprs):
+        self.query, self.threshold = exprs
+
+    def as_sql(self, compiler, connection, template=None, **extra_context):
+        threshold_sql, threshold_params = compiler.compile(self.threshold)
+        sql, params = super().as_sql(
+            compiler,
+            connection,
+            template,
+            column=connection.ops.quote_name(self.column),
+            threshold=threshold_sql,
+            **extra_context,
+        )
+        return sql, (*params, *threshold_params)
@@ -0,0 +1,317 @@
+"""
+A fast read-only path for list responses.
+
+DRF serializes a list by walking every field of every model instance:
+get_attribute(), to_representation() and an OrderedDict per row, on top
+of building the instances themselves. For a few hundred rows that is most
+of the request's CPU. `FastListMixin` produces the same output without
+instances: it compiles a `RowPlan` from the (sparse-trimmed) serializer
+once per request, fetches only the columns the plan reads with values(),
+and turns each row dict into the representation with the plan's
+precompiled accessors and formatters.
+
+The plan reproduces the serializer's output exactly or isn't used. Field
+types with a known representation (strings, integers, primary keys,
+choices, ISO datetimes, string decimals) get a direct formatter; other
+field types fall back to their own to_representation() on the column
+value. A field whose value is neither a column nor an annotation of the
+view's queryset (a property, a method field) has to be declared in the
+serializer's `row_sources` as a `Computed`; otherwise compile_plan()
+returns None and the view serializes the usual way. FAST_LIST_SERIALIZATION=0 turns the path off.
+
+`FastJSONRenderer` renders with orjson when it's installed. Its output is
+byte-for-byte what JSONRenderer produces for these responses: strings,
+ints, bools, None and the types DRF's encoder converts. (Floats aren't
+covered: orjson writes exponents differently. None of these responses
+contain any.)
+"""
+
+import decimal
+from datetime import datetime
+from decimal import Decimal
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import relations, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from core.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional; JSONRenderer's output without it
+    orjson = None
+
+
+class Computed:
+    """
+    A representation field computed from columns: `func(*values)` gives
+    the attribute value the serializer would read, before the field's own
+    formatting.
+    """
+
+    def __init__(self, columns, func):
+        self.columns = tuple(columns)
+        self.func = func
+
+
+class RowPlan:
+    """The compiled representation of one serializer over .values() rows."""
+
+    def __init__(self, columns, steps):
+        # the columns to pass to values()
+        self.columns = columns
+        # (field name, accessor(row), formatter(value) or None)
+        self.steps = steps
+
+    def rows(self, rows):
+        """The representations of .values() `rows`, as the serializer's data."""
+        steps = self.steps
+        with timed("serialize"):
+            return [
+                {
+                    name: (
+                        None
+                        if (value := get(row)) is None
+                        else value if fmt is None else fmt(value)
+                    )
+                    for name, get, fmt in steps
+                }
+                for row in rows
+            ]
+
+
+def compile_plan(serializer, annotations=()):
+    """
+    A RowPlan for `serializer`'s readable fields over a queryset with
+    `annotations`, or None if it needs instances.
+    """
+    model = serializer.Meta.model
+    sources = getattr(serializer, "row_sources", {})
+    columns = {}
+    steps = []
+    for field in serializer._readable_fields:
+        computed = sources.get(field.field_name)
+        if computed is not None:
+            columns.update(dict.fromkeys(computed.columns))
+            steps.append(
+                (field.field_name, _computed_getter(computed), _formatter(field))
+            )
+            continue
+        if field.source in annotations:
+            column = field.source
+        else:
+            column = _column(model, field)
+        if column is None:
+            return None
+        columns[column] = None
+        steps.append((field.field_name, itemgetter(column), _formatter(field)))
+    return RowPlan(tuple(columns), steps)
+
+
+def _computed_getter(computed):
+    func = computed.func
+    getters = [itemgetter(c) for c in computed.columns]
+    return lambda row: func(*[get(row) for get in getters])
+
+
+def _column(model, field):
+    """The values() path `field` reads, or None if it isn't a plain column."""
+    if field.source == "*" or not field.source_attrs:
+        return None
+    opts = model._meta
+    last = len(field.source_attrs) - 1
+    for i, attr in enumerate(field.source_attrs):
+        try:
+            model_field = opts.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if i < last:
+            # through a nullable relation DRF skips the field; values() can't
+            if not model_field.is_relation or model_field.null:
+                return None
+            opts = model_field.related_model._meta
+        elif model_field.is_relation:
+            # values() gives the key, so only a plain primary key field fits
+            if not isinstance(field, relations.PrimaryKeyRelatedField):
+                return None
+            if field.pk_field is not None:
+                return None
+    return "__".join(field.source_attrs)
+
+
+def _stock(field, base, *methods):
+    # whether `field` represents values the way `base` does
+    return isinstance(field, base) and all(
+        getattr(type(field), m) is getattr(base, m) for m in methods
+    )
+
+
+def _formatter(field):
+    """A function of a non-None column value giving the field's representation."""
+    if isinstance(field, serializers.SerializerMethodField):
+        return None  # computed already (row_sources)
+    if _stock(field, relations.PrimaryKeyRelatedField, "to_representation"):
+        return None
+    if _stock(field, serializers.ReadOnlyField, "to_representation"):
+        return None
+    if _stock(field, serializers.ChoiceField, "to_representation"):
+        return _choice_formatter(field)
+    if _stock(field, serializers.CharField, "to_representation"):
+        return lambda value: value if type(value) is str else str(value)
+    if _stock(field, serializers.IntegerField, "to_representation"):
+        return lambda value: value if type(value) is int else int(value)
+    if _stock(field, serializers.DecimalField, "to_representation", "quantize"):
+        return _decimal_formatter(field)
+    if _stock(
+        field, serializers.DateTimeField, "to_representation", "enforce_timezone"
+    ):
+        return _datetime_formatter(field)
+    return field.to_representation
+
+
+def _choice_formatter(field):
+    mapping = field.choice_strings_to_values
+
+    def fmt(value):
+        if type(value) is not str:
+            return field.to_representation(value)
+        if value == "":
+            return value
+        return mapping.get(value, value)
+
+    return fmt
+
+
+def _decimal_formatter(field):
+    coerce = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if (
+        not coerce
+        or field.localize
+        or field.normalize_output
+        or field.decimal_places is None
+    ):
+        return field.to_representation
+    # DecimalField.quantize(), with the context and exponent built once
+    exponent = Decimal(".1") ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def fmt(value):
+        if type(value) is not Decimal:
+            value = Decimal(str(value).strip())
+        return f"{value.quantize(exponent, rounding=rounding, context=context):f}"
+
+    return fmt
+
+
+def _datetime_formatter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None:
+        return field.to_representation
+
+    def fmt(value):
+        # naive values (and strings) take DRF's own route
+        if type(value) is not datetime or value.utcoffset() is None:
+            return field.to_representation(value)
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return fmt
+
+
+class FastListMixin:
+    """
+    Serve list / alist from .values() rows through a RowPlan (see the
+    module docs). Goes after the mixins that wrap list() (conditional
+    GET, caching, sparse fieldsets) and before AsyncReadMixin.
+    """
+
+    def get_row_plan(self, queryset):
+        if not settings.FAST_LIST_SERIALIZATION:
+            return None
+        serializer = self.get_serializer(many=True)
+        return compile_plan(
+            getattr(serializer, "child", serializer), queryset.query.annotations
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_row_plan(queryset)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.row_queryset(queryset, plan)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.rows(page))
+        return Response(plan.rows(queryset))
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_row_plan(queryset)
+        if plan is None:
+            return await super().alist(request, *args, **kwargs)
+        queryset = self.row_queryset(queryset, plan)
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(
+                queryset, request, view=self
+            )
+            return self.get_paginated_response(plan.rows(page))
+        return Response(plan.rows([row async for row in queryset]))
+
+    def row_queryset(self, queryset, plan):
+        # plus what pagination and the conditional-GET validators read
+        keys = ["id", *getattr(self, "etag_fields", ())]
+        default = getattr(self.pagination_class, "ordering", ())
+        keys += [f.lstrip("-") for f in getattr(self, "keyset_ordering", default)]
+        return queryset.values(*dict.fromkeys([*plan.columns, *keys]))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer's output, encoded by orjson when it can be."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self._default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except TypeError:  # includes orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these so the output is valid JavaScript
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+    def _default(self, obj):
+        value = self.encoder_class().default(obj)
+        if isinstance(value, float):
+            raise TypeError("float")  # see the module docs
+        return value
+
+
+# JSON through FastJSONRenderer; the other default renderers as they are
+FAST_RENDERER_CLASSES = [
+    FastJSONRenderer,
+    *(r for r in api_settings.DEFAULT_RENDERER_CLASSES if r is not JSONRenderer),
+]
@@ -0,0 +1,198 @@
+"""
+A small job queue for side effects that don't have to finish inside the
+request that caused them.
+
+    @jobs.handler("investments.notify_investor")
+    def notify_investor(investment_id): ...
+
+    jobs.enqueue("investments.notify_investor", investment_id=inv.pk)
+
+enqueue() hands the job over after the current transaction commits (and
+drops it on rollback). JOBS_BACKEND decides what happens then:
+
+  sync   the handler runs right away in the same process: tests and bare
+         runserver, and the default without REDIS_URL
+  redis  the job is pushed onto a Redis list and `manage.py run_jobs`
+         workers execute it
+
+Delivery is at-least-once: a job runs again after a failed attempt or a
+worker crash, so handlers must be idempotent. Failures are retried with
+exponential backoff up to JOBS_MAX_ATTEMPTS attempts, then the job is
+moved to a dead-letter list (`run_jobs --retry-dead` puts them back).
+
+Redis keys:
+
+  jobs:queue               ready jobs (LPUSH / BLMOVE from the right)
+  jobs:processing:<name>   jobs a worker has taken; requeued on restart
+  jobs:delayed             sorted set of retries, scored by due time
+  jobs:dead                jobs that ran out of attempts
+"""
+
+import json
+import logging
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "jobs:queue"
+DELAYED_KEY = "jobs:delayed"
+DEAD_KEY = "jobs:dead"
+PROCESSING_PREFIX = "jobs:processing:"
+MAX_BACKOFF = 300
+
+_handlers = {}
+
+
+def handler(name):
+    """Register the decorated function as the handler for `name`."""
+
+    def register(func):
+        if name in _handlers:
+            raise ValueError(f"Duplicate job handler {name!r}.")
+        _handlers[name] = func
+        return func
+
+    return register
+
+
+def enqueue(name, **payload):
+    """Run handler `name` with `payload` once the transaction commits."""
+    if name not in _handlers:
+        raise KeyError(f"No job handler {name!r}.")
+    job = {
+        "id": uuid.uuid4().hex,
+        "name": name,
+        "payload": payload,
+        "attempts": 0,
+        "enqueued_at": time.time(),
+    }
+    raw = json.dumps(job)  # fail here, not in the worker, on bad payloads
+    # robust: a failing side effect mustn't fail a committed request
+    if settings.JOBS_BACKEND == "redis":
+        transaction.on_commit(lambda: _push(job, raw), robust=True)
+    else:
+        transaction.on_commit(lambda: execute(job), robust=True)
+    return job["id"]
+
+
+def _push(job, raw):
+    try:
+        get_client().lpush(QUEUE_KEY, raw)
+    except Exception:
+        # The work it follows up on has committed: log the whole job so it
+        # can be pushed again by hand.
+        logger.exception(
+            "Could not enqueue job %s (%s): %s", job["id"], job["name"], raw
+        )
+
+
+def execute(job):
+    """Run one job's handler; exceptions propagate."""
+    func = _handlers[job["name"]]
+    return func(**job["payload"])
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts` (1-based), with jitter."""
+    delay = min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+    return delay * random.uniform(0.8, 1.2)
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import redis
+
+        _client = redis.Redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+class Worker:
+    """Executes jobs from the Redis queue; see `manage.py run_jobs`."""
+
+    def __init__(self, client=None, name=None):
+        self.client = client or get_client()
+        self.name = name or uuid.uuid4().hex
+        self.processing_key = f"{PROCESSING_PREFIX}{self.name}"
+        self.stats = {"succeeded": 0, "retried": 0, "dead": 0}
+
+    def recover(self):
+        """Requeue jobs this worker had taken when it last stopped."""
+        moved = 0
+        while self.client.rpoplpush(self.processing_key, QUEUE_KEY) is not None:
+            moved += 1
+        return moved
+
+    def promote_due(self, now=None):
+        """Move retries whose backoff has passed back onto the queue."""
+        now = time.time() if now is None else now
+        for raw in self.client.zrangebyscore(DELAYED_KEY, 0, now, start=0, num=100):
+            # ZREM decides which worker moves it when several race
+            if self.client.zrem(DELAYED_KEY, raw):
+                self.client.lpush(QUEUE_KEY, raw)
+
+    def run_once(self, timeout=1):
+        """Process one job; False if none arrived within `timeout` seconds."""
+        self.promote_due()
+        raw = self.client.blmove(
+            QUEUE_KEY, self.processing_key, timeout, "RIGHT", "LEFT"
+        )
+        if raw is None:
+            return False
+        job = json.loads(raw)
+        job["attempts"] += 1
+        close_old_connections()
+        try:
+            execute(job)
+        except Exception:
+            logger.exception("Job %s (%s) failed", job["id"], job["name"])
+            self._failed(job)
+        else:
+            self.stats["succeeded"] += 1
+        finally:
+            close_old_connections()
+            self.client.lrem(self.processing_key, 1, raw)
+        return True
+
+    def _failed(self, job):
+        raw = json.dumps(job)
+        if job["attempts"] >= settings.JOBS_MAX_ATTEMPTS:
+            self.client.lpush(DEAD_KEY, raw)
+            self.stats["dead"] += 1
+        else:
+            due = time.time() + backoff(job["attempts"])
+            self.client.zadd(DELAYED_KEY, {raw: due})
+            self.stats["retried"] += 1
+
+    def run(self, burst=False, max_jobs=None, timeout=1):
+        """
+        Work until stopped, or with `burst` until the queue and the
+        retries due are empty. Call recover() first.
+        """
+        done = 0
+        while max_jobs is None or done < max_jobs:
+            if self.run_once(timeout):
+                done += 1
+            elif burst and not self.client.zcount(DELAYED_KEY, 0, time.time()):
+                break
+        return done
+
+
+def retry_dead(client=None):
+    """Move every dead-lettered job back onto the queue with fresh attempts."""
+    client = client or get_client()
+    moved = 0
+    while (raw := client.rpop(DEAD_KEY)) is not None:
+        job = json.loads(raw)
+        job["attempts"] = 0
+        client.lpush(QUEUE_KEY, json.dumps(job))
+        moved += 1
+    return moved
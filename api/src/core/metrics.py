@@ -0,0 +1,290 @@
+"""
+Per-request performance instrumentation.
+
+`MetricsMiddleware` samples METRICS_SAMPLE_RATE of requests. For a sampled
+request it measures total time, database queries and database time (via
+an execute wrapper on every connection, so queries made from async views'
+worker threads count too), plus the phases code marks with `timed()`:
+"auth" (TimedSessionAuthentication) and "serialize" (TimedSerializerMixin).
+
+Each measurement is tagged with the resolved view, e.g.
+"ListingViewSet.list" or "me_view", and then
+
+  * sent back as a Server-Timing header (METRICS_SERVER_TIMING), and
+  * added to in-process histograms that `metrics_view` exposes in the
+    Prometheus text format. Each worker process exports its own counts.
+
+`metrics_view` also exports the connection pools' counters (core/dbpool.py).
+
+Unsampled requests only pay for the random() draw.
+"""
+
+import hmac
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.authentication import SessionAuthentication
+
+from core import dbpool
+
+PHASES = ("auth", "serialize")
+
+# Upper bounds in seconds / queries; +Inf is implied
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self._active = set()
+
+    def server_timing(self, total):
+        parts = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+        ]
+        parts += [
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.phases.items()
+            if seconds
+        ]
+        return ", ".join(parts)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to `phase` of the sampled request."""
+    timings = _current.get()
+    # nested blocks of the same phase (a serializer inside a serializer)
+    # only count once
+    if timings is None or phase in timings._active:
+        yield
+        return
+    timings._active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.phases[phase] += time.perf_counter() - started
+        timings._active.discard(phase)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - started
+        timings.queries += 1
+
+
+def install_db_wrapper(connection, **kwargs):
+    # The same hook connection.execute_wrapper() uses, but kept for the
+    # connection's lifetime; idempotent, since connections reconnect.
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+connection_created.connect(install_db_wrapper)
+
+
+class TimedSessionAuthentication(SessionAuthentication):
+    def authenticate(self, request):
+        with timed("auth"):
+            return super().authenticate(request)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+# --- aggregation -----------------------------------------------------------
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}  # view -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, view, value):
+        row = self.series.get(view)
+        if row is None:
+            row = self.series[view] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += 1
+        row[-1] += value
+
+    def exposition(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for view, row in sorted(self.series.items()):
+            label = f'view="{_escape(view)}"'
+            for bound, count in zip(self.buckets, row):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {row[-2]}')
+            lines.append(f"{self.name}_count{{{label}}} {row[-2]}")
+            lines.append(f"{self.name}_sum{{{label}}} {row[-1]:.6f}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {
+            "total": Histogram(
+                "api_request_duration_seconds",
+                "Request duration.",
+                DURATION_BUCKETS,
+            ),
+            "queries": Histogram(
+                "api_request_db_queries", "Database queries per request.", QUERY_BUCKETS
+            ),
+            "db": Histogram(
+                "api_request_db_duration_seconds",
+                "Database time per request.",
+                DURATION_BUCKETS,
+            ),
+            **{
+                phase: Histogram(
+                    f"api_request_{phase}_duration_seconds",
+                    f"Time spent in {phase} per request.",
+                    DURATION_BUCKETS,
+                )
+                for phase in PHASES
+            },
+        }
+
+    def record(self, view, total, timings):
+        values = {"total": total, "queries": timings.queries, "db": timings.db}
+        values.update(timings.phases)
+        with self._lock:
+            for key, value in values.items():
+                self.histograms[key].observe(view, value)
+
+    def exposition(self):
+        with self._lock:
+            lines = [line for h in self.histograms.values() for line in h.exposition()]
+        lines += dbpool.exposition()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# --- middleware / endpoint -------------------------------------------------
+
+
+def view_name(request):
+    """The resolved view as "ViewSet.action" or the view function's name."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    func = match.func
+    actions = getattr(func, "actions", None)
+    cls = getattr(func, "cls", None)
+    if cls is None:
+        return getattr(func, "__name__", match.view_name or "unknown")
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f"{cls.__name__}.{action}"
+    # APIViews; @api_view functions are wrapped in a class named after them
+    return cls.__name__
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        for alias in connections:
+            install_db_wrapper(connections[alias])
+        token = _current.set(RequestTimings())
+        try:
+            response = self.get_response(request)
+            return self._finish(request, response)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        token = _current.set(RequestTimings())
+        try:
+            response = await self.get_response(request)
+            return self._finish(request, response)
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def _sampled():
+        rate = settings.METRICS_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def _finish(self, request, response):
+        timings = _current.get()
+        # Streaming bodies are produced after this point; this is time to
+        # first byte for them.
+        total = time.perf_counter() - timings.started
+        registry.record(view_name(request), total, timings)
+        if settings.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = timings.server_timing(total)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition of the histograms. Staff sessions, or a scraper
+    sending "Authorization: Bearer <METRICS_TOKEN>" when one is configured.
+    """
+    token = settings.METRICS_TOKEN
+    # constant-time; bytes, since a str compare rejects non-ASCII headers
+    authorized = token and hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {token}".encode()
+    )
+    user = getattr(request, "user", None)
+    if not authorized and not (user and user.is_active and user.is_staff):
+        return HttpResponse("Forbidden\n", status=403, content_type="text/plain")
+    return HttpResponse(
+        registry.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
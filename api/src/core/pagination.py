@@ -0,0 +1,186 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination on a unique ordering, by default
+    (created_at, id) newest first.
+
+    Unlike DRF's CursorPagination this never falls back to OFFSET for
+    ties: the cursor stores the full key of the boundary row and the next
+    page is `WHERE (created_at, id) < (:created_at, :id)`, which the
+    composite indexes serve directly.
+
+    Views can override the key with a `keyset_ordering` attribute; the
+    last field must be unique.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for the async read path, via the async ORM."""
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        self.has_cursor = position is not None
+        self.reverse = reverse
+
+        ordering = self._flip(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        # one extra row tells us whether there is a next page
+        return queryset[: self.page_size + 1]
+
+    def _set_page(self, rows):
+        self.has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if self.reverse:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        raw = request.query_params.get(self.page_size_query_param)
+        if raw:
+            try:
+                size = int(raw)
+            except ValueError:
+                size = 0
+            if size > 0:
+                return min(size, self.max_page_size)
+        return self.page_size
+
+    def get_next_link(self):
+        # Going backwards there is always a next page: the one we came from
+        if not self.page or (not self.reverse and not self.has_more):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.page or not self.has_cursor:
+            return None
+        if self.reverse and not self.has_more:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    # --- cursors -------------------------------------------------------
+
+    def encode_cursor(self, row, reverse):
+        key = [
+            self._json_value(self._value(row, f.lstrip("-"))) for f in self.ordering
+        ]
+        payload = {"k": key}
+        if reverse:
+            payload["r"] = 1
+        token = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(",", ":")).encode()
+        ).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            key = payload["k"]
+            if len(key) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._python_value(model, f.lstrip("-"), v)
+                for f, v in zip(self.ordering, key)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get("r"))
+
+    @staticmethod
+    def _value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _json_value(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (int, float, str)) or value is None:
+            return value
+        return str(value)
+
+    @staticmethod
+    def _python_value(model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # annotation (e.g. a search rank); use the JSON value as is
+            return value
+        return field.to_python(value)
+
+    @staticmethod
+    def _flip(ordering):
+        return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        # (a, b, c) "after" (x, y, z) for the given directions, expanded as
+        # a <= x AND (a < x OR (a = x AND b < y) OR (a = x AND b = y AND c < z))
+        # The redundant leading bound gives the planner an index range on a.
+        clause = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip("-")
+            op = "lt" if field.startswith("-") else "gt"
+            term = Q(**{f"{name}__{op}": position[i]})
+            for prev_field, prev_value in zip(ordering[:i], position[:i]):
+                term &= Q(**{prev_field.lstrip("-"): prev_value})
+            clause |= term
+        first = ordering[0]
+        op = "lte" if first.startswith("-") else "gte"
+        return Q(**{f"{first.lstrip('-')}__{op}": position[0]}) & clause
@@ -0,0 +1,114 @@
+"""
+Helpers for asserting that hot queries are served by indexes.
+
+`plan_problems(sql)` runs EXPLAIN on a statement for the current database
+and returns the plan lines that indicate a full table scan or an explicit
+sort. SQLite (EXPLAIN QUERY PLAN) and PostgreSQL are supported; other
+backends report no problems.
+
+PostgreSQL plans by cost, and on the small tables tests can afford a
+sequential scan, or an index lookup followed by sorting a few rows, is
+the cheaper plan even where an index fits. So its statements are
+explained with sequential scans and sorts priced out (enable_seqscan /
+enable_sort off): the planner then uses an index wherever one can serve
+the statement, and any scan or sort left in the plan is one no index
+can avoid, which is what these checks are after.
+"""
+
+import re
+
+from django.db import connections
+
+# SQLite: "SCAN listings_listing" without "USING ... INDEX" is a table scan
+# (a "SCAN ... USING INDEX" walks an index in order, which is fine for a
+# LIMITed ORDER BY); temp b-trees are sorts.
+_BAD_PLAN_LINES = {
+    "sqlite": (
+        re.compile(r"\bSCAN (?!.*\bUSING\b.*\bINDEX\b)"),
+        re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)"),
+    ),
+    "postgresql": (
+        re.compile(r"\bSeq Scan\b"),
+        re.compile(r"(->|^)\s*(Incremental )?Sort\b"),
+    ),
+}
+
+# SQLite: a subquery in FROM is computed as a co-routine or materialized,
+# then scanned by its alias; that scan reads the subquery's result, not a
+# table.
+_DERIVED_TABLE = {
+    "sqlite": re.compile(r"\b(?:CO-ROUTINE|MATERIALIZE) (\S+)"),
+}
+
+_EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+_PLANNER_SETTINGS = {
+    "postgresql": ("enable_seqscan", "enable_sort"),
+}
+
+
+def explain(sql, using="default"):
+    """Plan for a raw SQL statement as a list of text lines."""
+    connection = connections[using]
+    settings = _PLANNER_SETTINGS.get(connection.vendor, ())
+    with connection.cursor() as cursor:
+        for name in settings:
+            cursor.execute(f"SET {name} = off")
+        try:
+            cursor.execute(_EXPLAIN_PREFIX[connection.vendor] + sql)
+            rows = cursor.fetchall()
+        finally:
+            for name in settings:
+                cursor.execute(f"RESET {name}")
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are (line,)
+    return [str(row[-1]) for row in rows]
+
+
+def plan_problems(sql, using="default"):
+    vendor = connections[using].vendor
+    patterns = _BAD_PLAN_LINES.get(vendor)
+    if not patterns:
+        return []
+    lines = [line.strip() for line in explain(sql, using)]
+    derived = _DERIVED_TABLE.get(vendor)
+    derived_scans = {
+        f"SCAN {match[1]}"
+        for line in lines
+        if derived and (match := derived.search(line))
+    }
+    return [
+        line
+        for line in lines
+        if line not in derived_scans and any(p.search(line) for p in patterns)
+    ]
+
+
+def captured_plan_problems(captured_queries, tables, using="default"):
+    """
+    EXPLAIN every captured SELECT/UPDATE/DELETE that touches one of
+    `tables` and map the offending SQL to its bad plan lines.
+    """
+    problems = {}
+    for query in captured_queries:
+        sql = query["sql"]
+        verb = sql.lstrip().split(" ", 1)[0].upper()
+        if verb not in ("SELECT", "UPDATE", "DELETE"):
+            continue
+        if not any(table in sql for table in tables):
+            continue
+        bad = plan_problems(sql, using)
+        if bad:
+            problems[sql] = bad
+    return problems
+
+
+def analyze(*models, using="default"):
+    """Refresh planner statistics after seeding test data."""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in models:
+            table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(f"ANALYZE {table}")
@@ -0,0 +1,266 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+`ReplicaReadsMixin` sends a viewset's safe requests (GET/HEAD/OPTIONS) to
+one of DATABASE_REPLICAS; everything else, and every write, stays on
+"default". initial() marks the request through a context variable (which
+sync_to_async carries into the async read path's ORM threads), and
+`ReplicaRouter` picks the replica on the request's first read, so the
+health check never runs on the event loop.
+
+A replica is skipped when it fails a health check or its replication lag
+is over REPLICA_MAX_LAG seconds. Each process checks at most every
+REPLICA_CHECK_INTERVAL seconds, per replica. With no healthy replica,
+reads go to the primary.
+
+Read-your-writes: after a successful unsafe request, `ReplicaPinMiddleware`
+keeps the writer's reads on the primary for REPLICA_PIN_SECONDS. A signed-in
+user is pinned by id in the cache, so the pin follows them to their other
+devices, at one cache lookup per replica-eligible read; an anonymous client
+gets a signed cookie instead.
+
+Anonymous listing reads are cached (listings/cache.py). Those cache
+builds read from the primary via `primary()`, so a lagging replica never
+fills the cache under a version that's newer than what it has seen.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework import permissions
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = "db_pin"
+PIN_SALT = "core.replicas.pin"
+
+# Seconds the replica is behind, per vendor. Postgres' replay timestamp is
+# that of the last replayed commit, so an idle primary would look lagging;
+# a replica that has replayed everything it received counts as current.
+LAG_SQL = {
+    "postgresql": """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(
+                EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+            )
+        END
+    """,
+}
+
+
+class ReplicaRead:
+    """The replica a request reads from, chosen on first use."""
+
+    def __init__(self):
+        self._alias = None
+        self._chosen = False
+
+    @property
+    def alias(self):
+        if not self._chosen:
+            self._alias = choose_replica()
+            self._chosen = True
+        return self._alias
+
+
+_replica_read = ContextVar("replica_read", default=None)
+
+
+class ReplicaRouter:
+    """Reads inside a replica-routed request go to its replica; writes to default."""
+
+    def db_for_read(self, model, **hints):
+        read = _replica_read.get()
+        return None if read is None else read.alias
+
+    def db_for_write(self, model, **hints):
+        # rows read from a replica are saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+@contextmanager
+def primary():
+    """Send the reads in the block to the primary."""
+    token = _replica_read.set(None)
+    try:
+        yield
+    finally:
+        _replica_read.reset(token)
+
+
+class ReplicaHealth:
+    """Per-process, rate-limited health and lag checks of the replicas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._state = {}  # alias -> (checked at, healthy)
+
+    def healthy(self, alias):
+        checked_at, healthy = self._state.get(alias, (None, False))
+        due = (
+            checked_at is None
+            or time.monotonic() - checked_at >= settings.REPLICA_CHECK_INTERVAL
+        )
+        # one thread re-checks; the others go with the last result meanwhile
+        if due and self._lock.acquire(blocking=checked_at is None):
+            try:
+                healthy = self.check(alias)
+                self._state[alias] = (time.monotonic(), healthy)
+            finally:
+                self._lock.release()
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(LAG_SQL.get(connection.vendor, "SELECT 0"))
+                lag = float(cursor.fetchone()[0] or 0)
+        except DatabaseError:
+            logger.warning("Replica %s failed its health check", alias, exc_info=True)
+            return False
+        if lag > settings.REPLICA_MAX_LAG:
+            logger.warning("Replica %s is %.1fs behind", alias, lag)
+            return False
+        return True
+
+
+health = ReplicaHealth()
+
+
+def choose_replica():
+    """A healthy replica's alias, or None for the primary."""
+    candidates = [
+        alias for alias in settings.DATABASE_REPLICAS if health.healthy(alias)
+    ]
+    return random.choice(candidates) if candidates else None
+
+
+def pin_key(user_id):
+    return f"replicas:pin:{user_id}"
+
+
+def pinned(request):
+    """Whether `request` comes from a user, or anonymous client, that wrote recently."""
+    if request.user.is_authenticated:
+        return cache.get(pin_key(request.user.pk)) is not None
+    return _cookie_pinned(request)
+
+
+async def apinned(request):
+    """pinned() for the async read path, with the user already resolved."""
+    if request.user.is_authenticated:
+        return await cache.aget(pin_key(request.user.pk)) is not None
+    return _cookie_pinned(request)
+
+
+def _cookie_pinned(request):
+    value = request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS
+    )
+    return value is not None
+
+
+class ReplicaReadsMixin:
+    """Serve the viewset's safe requests from a replica; see the module docs."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in permissions.SAFE_METHODS
+            and settings.DATABASE_REPLICAS
+            and not self._pinned(request)
+        ):
+            self._replica_token = _replica_read.set(ReplicaRead())
+
+    def _pinned(self, request):
+        # the async read path has looked it up already (AsyncReads.dispatch)
+        known = getattr(request, "replica_pinned", None)
+        return pinned(request) if known is None else known
+
+    def handle_exception(self, exc):
+        # finalize_response() isn't reached when the exception is re-raised,
+        # and a WSGI thread's context outlives the request
+        self._end_replica_read()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        self._end_replica_read()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def _end_replica_read(self):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _replica_read.reset(token)
+            self._replica_token = None
+
+
+class ReplicaPinMiddleware:
+    """Pin clients to the primary for a while after a successful write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.should_pin(request, response):
+            if request.user.is_authenticated:
+                cache.set(pin_key(request.user.pk), 1, settings.REPLICA_PIN_SECONDS)
+            else:
+                self.set_cookie(response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.should_pin(request, response):
+            user = await request.auser()
+            if user.is_authenticated:
+                await cache.aset(pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+            else:
+                self.set_cookie(response)
+        return response
+
+    @staticmethod
+    def should_pin(request, response):
+        return (
+            settings.DATABASE_REPLICAS
+            and request.method not in permissions.SAFE_METHODS
+            and response.status_code < 400
+        )
+
+    @staticmethod
+    def set_cookie(response):
+        response.set_signed_cookie(
+            PIN_COOKIE,
+            "1",
+            salt=PIN_SALT,
+            max_age=settings.REPLICA_PIN_SECONDS,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite="Lax",
+        )
@@ -54,28 +54,49 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its total covers the rest of the stack
+    "core.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # read-your-writes pin for core.replicas
+    "core.replicas.ReplicaPinMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.SessionAuthentication",
+        # SessionAuthentication that reports its time to core.metrics
+        "core.metrics.TimedSessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
     ],
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "20")),
 }
 
 AUTH_USER_MODEL = "users.User"
 
-ROOT_URLCONF = "core.urls"
+# Session auth without database reads when warm (users/auth.py): sessions
+# are written through to the database but read from the cache, and the
+# session's user is cached until it changes or logs out. ModelBackend stays
+# listed so sessions that recorded it at login remain valid.
+AUTHENTICATION_BACKENDS = [
+    "users.auth.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+SESSION_ENGINE = os.getenv(
+    "SESSION_ENGINE", "django.contrib.sessions.backends.cached_db"
+)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", "300"))
+
+# core/asgi.py switches this to core.asgi_urls (async read views)
+ROOT_URLCONF = os.getenv("DJANGO_ROOT_URLCONF", "core.urls")
 
 TEMPLATES = [
     {
@@ -109,6 +130,132 @@ DATABASES = {
     }
 }
 
+# Connection pooling (core/dbpool.py). Each worker process keeps its own
+# psycopg_pool pool per alias instead of connecting on every request.
+# Size DB_POOL_MAX_SIZE to the requests one worker serves at once:
+# --threads for gthread, the thread pool for ASGI. The default of 4 suits
+# a few threads; set it to 1 for gunicorn sync workers. Keep
+# workers * DB_POOL_MAX_SIZE under Postgres' max_connections.
+# Connections are health-checked when checked out and closed after
+# DB_POOL_MAX_IDLE idle seconds; a checkout waits up to DB_POOL_TIMEOUT.
+# DB_POOL=0 goes back to one connection per request.
+if os.getenv("DB_POOL", "1") == "1":
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "4")),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+        }
+    }
+
+# DJANGO_DB=sqlite runs against a local SQLite file instead (tests, quick
+# local runs without the compose stack).
+if os.getenv("DJANGO_DB", "postgres") == "sqlite":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_PATH", str(BASE_DIR / "db.sqlite3")),
+    }
+
+# Read replicas (core/replicas.py). POSTGRES_REPLICA_HOSTS adds a
+# "replicaN" alias per host, sharing the primary's credentials and pool
+# settings; tests mirror them onto the primary. With DJANGO_DB=sqlite a
+# second file stands in for a replica as "replica", routed to only when
+# SQLITE_REPLICA_PATH is set (the tests give it its own database).
+# Safe ListingViewSet / InvestmentViewSet reads go to DATABASE_REPLICAS
+# when they're up and at most REPLICA_MAX_LAG seconds behind (checked every
+# REPLICA_CHECK_INTERVAL seconds); a user (or anonymous client) that writes
+# reads from the primary for REPLICA_PIN_SECONDS afterwards (keep that above
+# the lag a replica can reach before a check catches it, MAX_LAG +
+# CHECK_INTERVAL).
+DATABASE_REPLICAS = []
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    for number, host in enumerate(
+        filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")), 1
+    ):
+        alias = f"replica{number}"
+        DATABASES[alias] = {
+            **DATABASES["default"],
+            "HOST": host.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+        DATABASE_REPLICAS.append(alias)
+else:
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.getenv("SQLITE_REPLICA_PATH", str(BASE_DIR / "db.replica.sqlite3")),
+    }
+    if os.getenv("SQLITE_REPLICA_PATH"):
+        DATABASE_REPLICAS.append("replica")
+
+DATABASE_ROUTERS = ["core.replicas.ReplicaRouter"]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "15"))
+
+# Cache
+# Redis when REDIS_URL is set (docker-compose), otherwise per-process
+# local memory, which is what tests and bare `runserver` use.
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds an anonymous listing list/detail response may be served from cache
+# (entries are also invalidated explicitly on writes).
+LISTING_CACHE_TIMEOUT = int(os.getenv("LISTING_CACHE_TIMEOUT", "300"))
+
+# Marketplace stats (/api/stats/) are served from cache for this long.
+STATS_CACHE_TIMEOUT = int(os.getenv("STATS_CACHE_TIMEOUT", "60"))
+
+# Per-user portfolio cache. Dropped whenever the user invests; the TTL bounds
+# how stale other investors' effect on percent_funded can get.
+PORTFOLIO_CACHE_TIMEOUT = int(os.getenv("PORTFOLIO_CACHE_TIMEOUT", "60"))
+
+# Serve listing / investment lists from .values() rows instead of model
+# instances and serializers (core/fastlist.py); same output, less CPU.
+FAST_LIST_SERIALIZATION = os.getenv("FAST_LIST_SERIALIZATION", "1") == "1"
+
+# Request instrumentation (core/metrics.py): the fraction of requests
+# measured, whether they get a Server-Timing header, and an optional bearer
+# token for scraping /api/metrics without a staff session.
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "1") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Background jobs (core/jobs.py): "sync" runs them in-process right after
+# commit, "redis" queues them for `manage.py run_jobs` workers. Failed jobs
+# are retried after JOBS_RETRY_BACKOFF * 2^n seconds, then dead-lettered.
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "redis" if REDIS_URL else "sync")
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+JOBS_RETRY_BACKOFF = float(os.getenv("JOBS_RETRY_BACKOFF", "2"))
+
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "no-reply@localhost")
+
+# Live funding streams (listings/live.py, ASGI only): seconds between
+# keepalive comments, seconds before a stream is closed for the client to
+# reconnect, and how many listings one multiplexed stream may follow.
+FUNDING_STREAM_HEARTBEAT = float(os.getenv("FUNDING_STREAM_HEARTBEAT", "15"))
+FUNDING_STREAM_MAX_AGE = float(os.getenv("FUNDING_STREAM_MAX_AGE", "300"))
+FUNDING_STREAM_MAX_LISTINGS = int(os.getenv("FUNDING_STREAM_MAX_LISTINGS", "50"))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
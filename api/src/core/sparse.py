@@ -0,0 +1,90 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+SPARSE_ACTIONS = ("list", "retrieve")
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets for list / retrieve.
+
+    `?fields=a,b` keeps only those fields of the full serializer and
+    `?omit=c` drops fields from whichever representation is used. Lists use
+    `summary_serializer_class` unless `?fields=` asks for something else.
+
+    `narrow_queryset()` then restricts the queryset with only() to the
+    columns the remaining fields read (plus `etag_fields` and the keyset
+    ordering), and joins only the relations they traverse. Fields whose
+    source isn't a model field (properties, method fields) need an entry
+    in `field_columns`, or the queryset is left alone.
+    """
+
+    summary_serializer_class = None
+    # representation field -> model columns it reads
+    field_columns = {}
+
+    def get_serializer_class(self):
+        if (
+            self.action == "list"
+            and self.summary_serializer_class is not None
+            and not self._field_param("fields")
+        ):
+            return self.summary_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.action in SPARSE_ACTIONS:
+            target = getattr(serializer, "child", serializer)
+            keep = self.selected_fields(target)
+            for name in list(target.fields):
+                if name not in keep:
+                    target.fields.pop(name)
+        return serializer
+
+    def selected_fields(self, serializer):
+        available = list(serializer.fields)
+        wanted = self._field_param("fields") or available
+        omitted = self._field_param("omit")
+        unknown = set(wanted) - set(available)
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Unknown field(s): {', '.join(sorted(unknown))}."}
+            )
+        return [name for name in wanted if name not in omitted]
+
+    def narrow_queryset(self, queryset):
+        if self.action not in SPARSE_ACTIONS:
+            return queryset
+        serializer_class = self.get_serializer_class()
+        serializer = serializer_class(context=self.get_serializer_context())
+        columns = {"id", *getattr(self, "etag_fields", ())}
+        columns.update(f.lstrip("-") for f in getattr(self, "keyset_ordering", ()))
+        columns.discard("search_rank")  # annotation, not a column
+        for name in self.selected_fields(serializer):
+            read = self._columns(queryset.model, name, serializer.fields[name])
+            if read is None:
+                return queryset
+            columns.update(read)
+        queryset = queryset.select_related(None).only(*columns)
+        relations = {c.split("__")[0] for c in columns if "__" in c}
+        if relations:
+            # (no arguments would mean "follow every foreign key")
+            queryset = queryset.select_related(*relations)
+        return queryset
+
+    def _columns(self, model, name, field):
+        if name in self.field_columns:
+            return self.field_columns[name]
+        if field.source == "*":
+            return None
+        path = field.source.replace(".", "__")
+        try:
+            model._meta.get_field(path.split("__")[0])
+        except FieldDoesNotExist:
+            return None
+        return [path]
+
+    def _field_param(self, name):
+        raw = self.request.query_params.get(name, "")
+        return [f.strip() for f in raw.split(",") if f.strip()]
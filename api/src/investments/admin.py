@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Investment
+from .models import Investment, LedgerEntry, Order, Trade
 
 
 @admin.register(Investment)
@@ -7,3 +7,78 @@ class InvestmentAdmin(admin.ModelAdmin):
     list_display = ("id", "investor", "listing", "amount", "created_at")
     list_filter = ("created_at", "listing")
     search_fields = ("investor__email", "listing__title")
+
+    def get_readonly_fields(self, request, obj=None):
+        # changing these would bypass the capacity claim, ledger and stats
+        if obj is not None:
+            return ("investor", "listing", "amount")
+        return ()
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "investor", "listing", "amount", "created_at")
+    list_filter = ("kind",)
+    search_fields = ("investor__email", "listing__title")
+    list_select_related = ("investor", "listing")
+
+    # append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "listing",
+        "investor",
+        "side",
+        "kind",
+        "price",
+        "remaining",
+        "status",
+    )
+    list_filter = ("status", "side", "kind")
+    search_fields = ("investor__email", "listing__title")
+    list_select_related = ("investor", "listing")
+
+    # the book's command log; changed only through investments/trading.py
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Trade)
+class TradeAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "listing",
+        "buyer",
+        "seller",
+        "price",
+        "quantity",
+        "created_at",
+    )
+    search_fields = ("buyer__email", "seller__email", "listing__title")
+    list_select_related = ("listing", "buyer", "seller")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class InvestmentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "investments"
+
+    def ready(self):
+        from . import jobs, signals  # noqa: F401
@@ -0,0 +1,267 @@
+"""
+Capacity reservation for listings.
+
+Every investment claims its amount with a single conditional UPDATE, so
+concurrent requests can't oversubscribe a listing and nobody has to
+read-then-write under a lock. Normal listings claim on the listing row:
+
+    UPDATE listing SET total_invested = total_invested + :amount
+    WHERE id = :id AND total_invested <= target_amount - :amount
+
+For very hot listings that single conditional UPDATE becomes the point
+every transaction queues on, so capacity can be split into N CapacityShard
+rows (`shard_capacity`). A claim then decrements one randomly chosen
+shard and never touches the listing row: the funding counter deltas are
+written to that same shard row (pending_invested / pending_investors),
+and once the investing transaction commits `fold()` moves them onto the
+listing in a short transaction of its own. Until then the listing's
+counters lag by what is pending; nothing is lost if a fold fails, since
+the deltas stay on the shards for the next fold. `remaining()` is always
+exact.
+
+The marketplace stats (listings/stats.py) follow the listing's counters:
+each change to them applies its stats delta in the same transaction,
+keyed on the category / status / target read under the listing's row
+lock, so a concurrent status change can't leave the delta in the wrong
+row.
+
+Whether a listing is sharded is read from its row when claiming, never
+from the Listing instance passed in, which may predate shard_capacity().
+Shard rows are locked before the listing row everywhere, so resharding a
+live listing can't deadlock with claims or folds.
+"""
+
+import random
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest, Now
+
+from listings import stats
+from listings.models import STATS_FIELDS, Listing
+from .models import CapacityShard
+
+
+class CapacityExhausted(Exception):
+    def __init__(self, remaining):
+        self.remaining = max(remaining, Decimal("0.00"))
+        super().__init__(f"Only {self.remaining} remaining in this offering.")
+
+
+def claim(listing, amount, new_investor=False):
+    """
+    Take `amount` out of the listing's remaining capacity.
+
+    Must run inside the transaction that inserts the Investment, so a failed
+    insert gives the capacity back. Raises CapacityExhausted if there is
+    not enough left.
+    """
+    counters = {
+        "total_invested": F("total_invested") + amount,
+        "investor_count": F("investor_count") + int(new_investor),
+        **_funding_changed(),
+    }
+    while True:
+        # Matches only while the listing is unsharded, which the UPDATE
+        # checks under the row lock
+        if Listing.objects.filter(
+            pk=listing.pk,
+            capacity_shards=0,
+            total_invested__lte=F("target_amount") - amount,
+        ).update(**counters):
+            listing.capacity_shards = 0
+            _stats_changed(listing.pk, amount)
+            return
+        listing.capacity_shards = _shards(listing)
+        if not listing.capacity_shards:
+            raise CapacityExhausted(remaining(listing))
+        pending = {
+            "pending_invested": F("pending_invested") + amount,
+            "pending_investors": F("pending_investors") + int(new_investor),
+        }
+        if _claim_one_shard(listing, amount, pending) or _claim_across_shards(
+            listing, amount, pending
+        ):
+            _fold_on_commit(listing.pk)
+            return
+        # resharded since _shards() read the count; try again
+
+
+def release(listing, amount, last_investor=False):
+    """Give `amount` back to the listing, e.g. when an investment is deleted."""
+    counters = {
+        "total_invested": F("total_invested") - amount,
+        "investor_count": Greatest(F("investor_count") - int(last_investor), 0),
+        **_funding_changed(),
+    }
+    while True:
+        if Listing.objects.filter(pk=listing.pk, capacity_shards=0).update(
+            **counters
+        ):
+            listing.capacity_shards = 0
+            _stats_changed(listing.pk, -amount)
+            return
+        # no row to update if the shards were replaced meanwhile; try again
+        listing.capacity_shards = _shards(listing)
+        slot = random.randrange(listing.capacity_shards or 1)
+        if CapacityShard.objects.filter(listing_id=listing.pk, slot=slot).update(
+            remaining=F("remaining") + amount,
+            pending_invested=F("pending_invested") - amount,
+            pending_investors=F("pending_investors") - int(last_investor),
+        ):
+            _fold_on_commit(listing.pk)
+            return
+
+
+def fold(listing_id):
+    """
+    Move the shards' pending funding deltas onto the listing's counters.
+    Shards locked by a claim still in flight are skipped; that claim folds
+    them when it commits.
+    """
+    with transaction.atomic():
+        rows = list(
+            CapacityShard.objects.select_for_update(skip_locked=True)
+            .filter(listing_id=listing_id)
+            .exclude(pending_invested=0, pending_investors=0)
+            .order_by("slot")
+        )
+        _fold_rows(listing_id, rows)
+
+
+def remaining(listing) -> Decimal:
+    """Current remaining capacity, read fresh from the database."""
+    if listing.capacity_shards:
+        agg = CapacityShard.objects.filter(listing_id=listing.pk).aggregate(
+            left=Sum("remaining")
+        )
+        return agg["left"] or Decimal("0.00")
+    target, invested = Listing.objects.values_list(
+        "target_amount", "total_invested"
+    ).get(pk=listing.pk)
+    return target - invested
+
+
+def shard_capacity(listing, shards):
+    """
+    Split the listing's remaining capacity evenly over `shards` rows.
+    `shards=0` folds everything back onto the listing row.
+    """
+    with transaction.atomic():
+        # the shards first, in the order claims lock them
+        rows = list(
+            CapacityShard.objects.select_for_update()
+            .filter(listing_id=listing.pk)
+            .order_by("slot")
+        )
+        # their pending deltas go with them
+        _fold_rows(listing.pk, rows)
+        locked = Listing.objects.select_for_update().get(pk=listing.pk)
+        if locked.capacity_shards:
+            left = sum((row.remaining for row in rows), Decimal("0.00"))
+        else:
+            left = locked.target_amount - locked.total_invested
+        left = max(left, Decimal("0.00"))
+
+        CapacityShard.objects.filter(listing_id=locked.pk).delete()
+        if shards:
+            share = (left / shards).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+            CapacityShard.objects.bulk_create(
+                CapacityShard(
+                    listing_id=locked.pk,
+                    slot=slot,
+                    # slot 0 absorbs the rounding remainder
+                    remaining=share + (left - share * shards if slot == 0 else 0),
+                )
+                for slot in range(shards)
+            )
+
+        Listing.objects.filter(pk=locked.pk).update(capacity_shards=shards)
+        listing.capacity_shards = shards
+
+
+def _funding_changed():
+    # Counter updates bypass Listing.save(), so move the conditional-GET
+    # validators (updated_at / funding_version) along by hand.
+    return {"funding_version": F("funding_version") + 1, "updated_at": Now()}
+
+
+def _fold_rows(listing_id, rows):
+    # `rows` are locked CapacityShard rows
+    rows = [row for row in rows if row.pending_invested or row.pending_investors]
+    if not rows:
+        return
+    invested = sum((row.pending_invested for row in rows), Decimal("0.00"))
+    investors = sum(row.pending_investors for row in rows)
+    CapacityShard.objects.filter(pk__in=[row.pk for row in rows]).update(
+        pending_invested=0, pending_investors=0
+    )
+    Listing.objects.filter(pk=listing_id).update(
+        total_invested=F("total_invested") + invested,
+        investor_count=Greatest(F("investor_count") + investors, 0),
+        **_funding_changed(),
+    )
+    _stats_changed(listing_id, invested)
+
+
+def _stats_changed(listing_id, amount):
+    # Runs after an UPDATE of the listing row in this transaction, so the
+    # row is locked and a status change has either committed or waits.
+    if amount:
+        stats.funding_changed(
+            Listing.objects.only(*STATS_FIELDS).get(pk=listing_id), amount
+        )
+
+
+def _fold_on_commit(listing_id):
+    # Registered before the investment's own on_commit hooks (cache
+    # invalidation, funding jobs), so those see the folded counters.
+    # Robust: a failed fold leaves the deltas pending, not lost.
+    transaction.on_commit(lambda: fold(listing_id), robust=True)
+
+
+def _shards(listing):
+    return Listing.objects.values_list("capacity_shards", flat=True).get(
+        pk=listing.pk
+    )
+
+
+def _claim_one_shard(listing, amount, pending) -> bool:
+    slots = list(range(listing.capacity_shards))
+    start = random.randrange(len(slots))
+    for slot in slots[start:] + slots[:start]:
+        if CapacityShard.objects.filter(
+            listing_id=listing.pk, slot=slot, remaining__gte=amount
+        ).update(remaining=F("remaining") - amount, **pending):
+            return True
+    return False
+
+
+def _claim_across_shards(listing, amount, pending) -> bool:
+    # No single shard had room; lock them all (in slot order, so two of
+    # these can't deadlock) and drain as many as it takes. False if the
+    # shards have been folded back onto the listing meanwhile.
+    rows = list(
+        CapacityShard.objects.select_for_update()
+        .filter(listing_id=listing.pk)
+        .order_by("slot")
+    )
+    if not rows:
+        return False
+    left = sum((row.remaining for row in rows), Decimal("0.00"))
+    if left < amount:
+        raise CapacityExhausted(left)
+
+    needed = amount
+    for row in rows:
+        take = min(row.remaining, needed)
+        if take:
+            CapacityShard.objects.filter(pk=row.pk).update(
+                remaining=F("remaining") - take
+            )
+            needed -= take
+        if not needed:
+            # the deltas ride on the last shard drawn from
+            CapacityShard.objects.filter(pk=row.pk).update(**pending)
+            return True
@@ -0,0 +1,80 @@
+"""
+Side effects of an investment that run after it commits (see core/jobs.py).
+Each handler is idempotent: it may run more than once for the same job.
+
+Cache invalidation stays inline in signals.py, so the investor's next read
+already shows their investment.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import send_mail
+from django.db import transaction
+
+from core import jobs
+from listings import live
+from listings.models import Listing
+from .models import Investment
+
+# "already sent" markers, so a retried job doesn't email twice
+SENT_TIMEOUT = 7 * 24 * 3600
+
+
+@jobs.handler("investments.publish_funding")
+def publish_funding(listing_id, delta):
+    # streams drop messages they've already seen (by funding_version)
+    live.publish_funding(listing_id, delta)
+
+
+@jobs.handler("investments.close_funded_listing")
+def close_funded_listing(listing_id):
+    """Move a live listing that reached its target to funded."""
+    with transaction.atomic():
+        listing = (
+            Listing.objects.select_for_update()
+            .filter(pk=listing_id, status=Listing.STATUS_LIVE)
+            .first()
+        )
+        if listing is None or listing.total_invested < listing.target_amount:
+            return
+        listing.status = Listing.STATUS_FUNDED
+        listing.save()
+        jobs.enqueue("investments.notify_seller_funded", listing_id=listing_id)
+
+
+@jobs.handler("investments.notify_investor")
+def notify_investor(investment_id):
+    investment = (
+        Investment.objects.select_related("investor", "listing")
+        .filter(pk=investment_id)
+        .first()
+    )
+    if investment is None:
+        return
+    _send_once(
+        f"jobs:sent:investment:{investment_id}",
+        f"Your investment in {investment.listing.title}",
+        f"We received your investment of {investment.amount} in "
+        f"{investment.listing.title}.",
+        investment.investor.email,
+    )
+
+
+@jobs.handler("investments.notify_seller_funded")
+def notify_seller_funded(listing_id):
+    listing = Listing.objects.select_related("seller").filter(pk=listing_id).first()
+    if listing is None:
+        return
+    _send_once(
+        f"jobs:sent:funded:{listing_id}",
+        f"{listing.title} is fully funded",
+        f"{listing.title} reached its target of {listing.target_amount}.",
+        listing.seller.email,
+    )
+
+
+def _send_once(key, subject, body, recipient):
+    if cache.get(key):
+        return
+    send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient])
+    cache.set(key, True, SENT_TIMEOUT)
@@ -0,0 +1,353 @@
+"""
+The investment ledger: every change to a position (investor, listing) is
+an immutable LedgerEntry with a signed amount, so a position is the sum of
+its entries and refunds and transfers are ordinary entries.
+
+Summing a long history on every read is what the ledger replaces, so each
+position also has a PositionSnapshot: its balance through some entry id.
+Reads add the entries after that id ("snapshot plus tail").
+`take_snapshots()` rolls snapshots forward periodically, and
+`rebuild_snapshots()` (the `rebuild_positions` command) recomputes them
+from the entries alone.
+
+Entry ids are allocated at insert but become visible at commit, so a
+snapshot only covers entries older than SETTLE: a transaction still open
+that long could otherwise commit an entry below a snapshot's through_id.
+
+A position gets its snapshot row (possibly empty, through entry 0) with
+its first entry, so `holdings()` can find every position, with its
+current amount, from the snapshot table alone.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
+
+from .models import LedgerEntry, PositionSnapshot
+
+ZERO = Value(
+    Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2)
+)
+SETTLE = timedelta(minutes=5)
+BATCH_SIZE = 1000
+
+
+class InsufficientPosition(Exception):
+    def __init__(self, held):
+        self.held = held
+        super().__init__(f"Only {held} held in this listing.")
+
+
+def record(investment, kind, amount):
+    """Append an entry for `investment` (its invest or refund)."""
+    return LedgerEntry.objects.create(
+        investor_id=investment.investor_id,
+        listing_id=investment.listing_id,
+        kind=kind,
+        amount=amount,
+        investment_id=investment.pk,
+    )
+
+
+def lock(investor_id, listing_id):
+    """
+    Lock the position (investor, listing) until the transaction ends. Its
+    snapshot row doubles as the lock; a position without one gets an empty
+    snapshot (through entry 0), which reads the same as none. Statements
+    after this see whatever the previous holder of the lock committed.
+    """
+    while True:
+        snapshot = _snapshot_row(investor_id, listing_id)
+        locked = PositionSnapshot.objects.select_for_update().filter(pk=snapshot.pk)
+        # None if the row was deleted while we waited for it; that locks
+        # nothing, so get (or create) the row again
+        if locked.first() is not None:
+            return
+
+
+def _snapshot_row(investor_id, listing_id):
+    snapshot, _ = PositionSnapshot.objects.get_or_create(
+        investor_id=investor_id,
+        listing_id=listing_id,
+        defaults={"amount": Decimal("0.00"), "through_id": 0},
+    )
+    return snapshot
+
+
+def ensure_snapshots(keys):
+    """
+    Give each (investor id, listing id) position in `keys` a snapshot row,
+    for entries inserted other than through record() / transfer().
+    """
+    PositionSnapshot.objects.bulk_create(
+        [
+            PositionSnapshot(
+                investor_id=investor_id,
+                listing_id=listing_id,
+                amount=Decimal("0.00"),
+                through_id=0,
+            )
+            for investor_id, listing_id in keys
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def transfer(listing_id, sender_id, recipient_id, amount):
+    """
+    Move `amount` of the sender's position in the listing to the recipient.
+    Raises InsufficientPosition if the sender holds less.
+    """
+    if amount <= 0:
+        raise ValueError("Transfer amount must be positive.")
+    if sender_id == recipient_id:
+        raise ValueError("Cannot transfer to the same investor.")
+    with transaction.atomic():
+        # so two transfers can't both spend the same balance
+        lock(sender_id, listing_id)
+        held = position(sender_id, listing_id)
+        if held < amount:
+            raise InsufficientPosition(held)
+        _snapshot_row(recipient_id, listing_id)
+        return LedgerEntry.objects.bulk_create(
+            [
+                LedgerEntry(
+                    investor_id=sender_id,
+                    listing_id=listing_id,
+                    kind=LedgerEntry.KIND_TRANSFER,
+                    amount=-amount,
+                    counterparty_id=recipient_id,
+                ),
+                LedgerEntry(
+                    investor_id=recipient_id,
+                    listing_id=listing_id,
+                    kind=LedgerEntry.KIND_TRANSFER,
+                    amount=amount,
+                    counterparty_id=sender_id,
+                ),
+            ]
+        )
+
+
+# --- reads -----------------------------------------------------------------
+
+
+def _entries_of_snapshot():
+    # the entries of the outer snapshot's position
+    return LedgerEntry.objects.filter(
+        investor_id=OuterRef("investor_id"), listing_id=OuterRef("listing_id")
+    )
+
+
+def _snapshot_of_entry():
+    # the snapshot of the outer entry's position
+    return PositionSnapshot.objects.filter(
+        investor_id=OuterRef("investor_id"), listing_id=OuterRef("listing_id")
+    )
+
+
+def _tail():
+    """Entries not yet covered by their position's snapshot."""
+    through = Subquery(_snapshot_of_entry().values("through_id")[:1])
+    return LedgerEntry.objects.filter(id__gt=Coalesce(through, 0)).order_by()
+
+
+def position(investor_id, listing_id) -> Decimal:
+    """The investor's current holding in the listing, in one query."""
+    base = PositionSnapshot.objects.filter(
+        investor_id=investor_id, listing_id=listing_id
+    ).values("amount")[:1]
+    row = (
+        _tail()
+        .filter(investor_id=investor_id, listing_id=listing_id)
+        .aggregate(total=Coalesce(Sum("amount"), ZERO) + Coalesce(Subquery(base), ZERO))
+    )
+    return row["total"]
+
+
+def listing_total(listing_id) -> Decimal:
+    """The sum of every position in the listing, in one query."""
+    base = (
+        PositionSnapshot.objects.filter(listing_id=listing_id)
+        .order_by()
+        .values("listing_id")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    row = (
+        _tail()
+        .filter(listing_id=listing_id)
+        .aggregate(total=Coalesce(Sum("amount"), ZERO) + Coalesce(Subquery(base), ZERO))
+    )
+    return row["total"]
+
+
+def holdings():
+    """
+    Every position's PositionSnapshot, annotated with `held`: its current
+    amount (snapshot plus tail), for filtering, ordering and aggregating
+    positions in SQL.
+    """
+    tail = (
+        LedgerEntry.objects.filter(
+            investor_id=OuterRef("investor_id"),
+            listing_id=OuterRef("listing_id"),
+            id__gt=OuterRef("through_id"),
+        )
+        .order_by()
+        .values("investor_id")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    # rounded to the cent, as SQLite sums decimals as floats
+    return PositionSnapshot.objects.annotate(
+        held=Round(F("amount") + Coalesce(Subquery(tail), ZERO), 2)
+    )
+
+
+def positions(investor_id) -> dict:
+    """{listing id: holding} for every listing the investor has entries in."""
+    held = dict(
+        PositionSnapshot.objects.filter(investor_id=investor_id).values_list(
+            "listing_id", "amount"
+        )
+    )
+    tail = (
+        _tail()
+        .filter(investor_id=investor_id)
+        .values("listing_id")
+        .annotate(total=Sum("amount"))
+        .values_list("listing_id", "total")
+    )
+    for listing_id, total in tail:
+        held[listing_id] = held.get(listing_id, Decimal("0.00")) + total
+    return held
+
+
+# --- snapshots -------------------------------------------------------------
+
+
+def settled_through(settle=SETTLE):
+    """The newest entry id old enough to snapshot, or None."""
+    return (
+        LedgerEntry.objects.filter(created_at__lte=timezone.now() - settle)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def take_snapshots(settle=SETTLE) -> int:
+    """
+    Fold each position's settled tail into its snapshot. Only positions
+    with new entries are written. Returns how many were.
+
+    Each batch of positions locks its snapshots before summing their
+    tails, so a run that overlaps another sums from whatever through_id
+    the other committed and never folds an entry in twice.
+    """
+    cutoff = settled_through(settle)
+    if cutoff is None:
+        return 0
+    pending = (
+        _tail()
+        .filter(id__lte=cutoff)
+        .values_list("investor_id", "listing_id")
+        .distinct()
+        .order_by("investor_id", "listing_id")
+    )
+    written = 0
+    with transaction.atomic():
+        batch = []
+        for key in pending.iterator():
+            batch.append(key)
+            if len(batch) == BATCH_SIZE:
+                written += _roll_forward(batch, cutoff)
+                batch = []
+        written += _roll_forward(batch, cutoff)
+    return written
+
+
+def _roll_forward(keys, cutoff):
+    if not keys:
+        return 0
+    # Every position gets a row to lock; one created meanwhile wins
+    ensure_snapshots(keys)
+    investors = {investor_id for investor_id, _ in keys}
+    wanted = set(keys)
+    locked = {
+        (s.investor_id, s.listing_id): s
+        for s in PositionSnapshot.objects.select_for_update()
+        .filter(investor_id__in=investors)
+        .order_by("investor_id", "listing_id")
+        if (s.investor_id, s.listing_id) in wanted
+    }
+    # A new statement: the tails start after the through_ids just locked
+    deltas = (
+        _tail()
+        .filter(id__lte=cutoff, investor_id__in=investors)
+        .values("investor_id", "listing_id")
+        .annotate(delta=Sum("amount"))
+        .values_list("investor_id", "listing_id", "delta")
+    )
+    now = timezone.now()
+    changed = []
+    for investor_id, listing_id, delta in deltas:
+        snapshot = locked.get((investor_id, listing_id))
+        if snapshot is None:
+            continue  # another batch's position
+        snapshot.amount += delta
+        snapshot.through_id = cutoff
+        snapshot.taken_at = now
+        changed.append(snapshot)
+    PositionSnapshot.objects.bulk_update(
+        changed, ["amount", "through_id", "taken_at"], batch_size=BATCH_SIZE
+    )
+    return len(changed)
+
+
+def rebuild_snapshots(settle=SETTLE) -> int:
+    """
+    Recompute every snapshot from the settled entries. Returns the number
+    of positions.
+
+    The rows are updated in place (upserted), never deleted: they are the
+    positions' locks, and lock() may be holding or waiting for any of them.
+    """
+    cutoff = settled_through(settle) or 0
+    now = timezone.now()
+    with transaction.atomic():
+        # every position, including those with no settled entries yet
+        totals = (
+            LedgerEntry.objects.order_by()
+            .values("investor_id", "listing_id")
+            .annotate(total=Coalesce(Sum("amount", filter=Q(id__lte=cutoff)), ZERO))
+            .values_list("investor_id", "listing_id", "total")
+        )
+        snapshots = [
+            PositionSnapshot(
+                investor_id=investor_id,
+                listing_id=listing_id,
+                amount=total,
+                through_id=cutoff,
+                taken_at=now,
+            )
+            for investor_id, listing_id, total in totals.iterator()
+        ]
+        PositionSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["investor", "listing"],
+            update_fields=["amount", "through_id", "taken_at"],
+        )
+        # rows whose entries are gone (purged benchmark data) hold nothing
+        PositionSnapshot.objects.exclude(Exists(_entries_of_snapshot())).update(
+            amount=Decimal("0.00"), through_id=cutoff, taken_at=now
+        )
+    return len(snapshots)
@@ -0,0 +1,119 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and benchmark the hot API endpoints "
+        "(latency percentiles, queries per request, throughput) as JSON. "
+        "Run against a dev database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--listings", type=int, default=5000)
+        parser.add_argument("--investments", type=int, default=50000)
+        parser.add_argument(
+            "--requests", type=int, default=500, help="Requests per scenario."
+        )
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            choices=sorted(benchmark.SCENARIOS),
+            help="Only run this scenario (can be repeated).",
+        )
+        parser.add_argument(
+            "--interface",
+            choices=("wsgi", "asgi", "both"),
+            default="wsgi",
+            help="Serve requests through the sync (WSGI) or async (ASGI) "
+            "handler; 'both' runs each and reports the throughput ratio.",
+        )
+        parser.add_argument(
+            "--jobs-backend",
+            choices=("sync", "redis"),
+            help="Override JOBS_BACKEND: run post-investment side effects "
+            "inline (sync) or queue them (redis) while measuring.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the report to this file.")
+        parser.add_argument(
+            "--baseline",
+            help="Saved report to compare against; exits non-zero on regressions.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=benchmark.DEFAULT_TOLERANCE,
+            help="Allowed relative slowdown vs. the baseline (default 0.2).",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Don't delete the seeded data."
+        )
+
+    def handle(self, *args, **opts):
+        baseline = None
+        if opts["baseline"]:
+            with open(opts["baseline"]) as f:
+                baseline = json.load(f)
+
+        dataset = benchmark.seed(
+            opts["users"],
+            opts["listings"],
+            opts["investments"],
+            rng=random.Random(opts["seed"]),
+        )
+        interfaces = ("wsgi", "asgi") if opts["interface"] == "both" else None
+        try:
+            reports = {
+                interface: benchmark.run(
+                    dataset,
+                    opts["requests"],
+                    opts["concurrency"],
+                    scenarios=opts["scenarios"],
+                    seed=opts["seed"],
+                    interface=interface,
+                    jobs_backend=opts["jobs_backend"],
+                )
+                for interface in interfaces or (opts["interface"],)
+            }
+        finally:
+            if not opts["keep"]:
+                benchmark.cleanup(dataset)
+
+        if baseline is not None:
+            for interface, report in reports.items():
+                # a "both" baseline holds one report per interface
+                report["regressions"] = benchmark.compare(
+                    report, baseline.get(interface, baseline), opts["tolerance"]
+                )
+
+        regressions = [
+            r for rep in reports.values() for r in rep.get("regressions", [])
+        ]
+        if interfaces:
+            report = {
+                **reports,
+                "asgi_vs_wsgi_throughput": benchmark.throughput_ratio(
+                    reports["asgi"], reports["wsgi"]
+                ),
+            }
+        else:
+            report = reports[opts["interface"]]
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(output + "\n")
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} metric(s) regressed against {opts['baseline']}."
+            )
@@ -0,0 +1,170 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+
+from investments import capacity
+from investments.models import Investment, LedgerEntry
+from listings.models import Listing
+
+User = get_user_model()
+
+# How long an attempt keeps retrying lock failures before it counts as an
+# error. SQLite (the tests) reports a locked table at once rather than
+# waiting for it, so this is what lets contended claims queue there.
+RETRY_SECONDS = 10
+
+
+def rush(listing, investors, amount, attempts, workers):
+    """
+    Fire `attempts` investments of `amount` at `listing` from `workers`
+    threads and report what happened. Each attempt goes through the same
+    Investment.save() path the API uses.
+    """
+
+    def attempt(i):
+        # Lock timeouts / serialization failures are retried like a client
+        # would; only persistent failures count as errors.
+        deadline = time.monotonic() + RETRY_SECONDS
+        retry = 0
+        while time.monotonic() < deadline:
+            try:
+                Investment.objects.create(
+                    investor=investors[i % len(investors)],
+                    listing=listing,
+                    amount=amount,
+                )
+                return "accepted"
+            except capacity.CapacityExhausted:
+                return "rejected"
+            except DatabaseError:
+                time.sleep(min(0.001 * 2**retry, 0.05))
+                retry += 1
+        return "errors"
+
+    def worker(indexes):
+        try:
+            return [attempt(i) for i in indexes]
+        finally:
+            connection.close()
+
+    chunks = [range(w, attempts, workers) for w in range(workers)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = [o for chunk in pool.map(worker, chunks) for o in chunk]
+    elapsed = time.perf_counter() - started
+
+    # a rolled-back attempt can leave a committed claim's deltas pending
+    capacity.fold(listing.pk)
+    listing.refresh_from_db()
+    invested = (
+        Investment.objects.filter(listing=listing).aggregate(t=Sum("amount"))["t"]
+        or Decimal("0.00")
+    )
+    return {
+        "listing": listing.pk,
+        "attempts": attempts,
+        "workers": workers,
+        "shards": listing.capacity_shards,
+        "accepted": outcomes.count("accepted"),
+        "rejected": outcomes.count("rejected"),
+        "errors": outcomes.count("errors"),
+        "seconds": round(elapsed, 3),
+        "attempts_per_second": round(attempts / elapsed, 1) if elapsed else None,
+        "target_amount": str(listing.target_amount),
+        "invested": str(invested.quantize(Decimal("0.01"))),
+        "oversubscribed": invested > listing.target_amount,
+        "counters_match": listing.total_invested == invested,
+    }
+
+
+def compare(make_listing, investors, amount, attempts, workers, shards):
+    """
+    rush() the same investments at an unsharded listing and at one split
+    into `shards`, each made by `make_listing()`, and report both with the
+    sharded throughput relative to the unsharded one.
+    """
+    report = {}
+    for name, count in (("unsharded", 0), ("sharded", shards)):
+        listing = make_listing()
+        if count:
+            capacity.shard_capacity(listing, count)
+        report[name] = rush(listing, investors, amount, attempts, workers)
+    before = report["unsharded"]["attempts_per_second"]
+    after = report["sharded"]["attempts_per_second"]
+    report["speedup"] = round(after / before, 2) if before and after else None
+    return report
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test capacity reservation: fire many parallel investments at a "
+        "throwaway live listing, unsharded and then sharded, and report the "
+        "throughput of each. Run against a dev database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attempts", type=int, default=2000)
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument("--investors", type=int, default=200)
+        parser.add_argument("--amount", type=Decimal, default=Decimal("100.00"))
+        parser.add_argument(
+            "--target",
+            type=Decimal,
+            default=Decimal("150000.00"),
+            help="Listing capacity; keep it below attempts * amount to oversubscribe.",
+        )
+        parser.add_argument(
+            "--shards",
+            type=int,
+            default=8,
+            help="Shards for the sharded run (0 runs only the unsharded one).",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Don't delete the test data."
+        )
+
+    def handle(self, *args, **opts):
+        stamp = int(time.time())
+        seller = User.objects.create_user(f"rush-seller-{stamp}@example.com")
+        investors = User.objects.bulk_create(
+            User(email=f"rush-{stamp}-{i}@example.com", password="!")
+            for i in range(opts["investors"])
+        )
+        if not all(u.pk for u in investors):
+            investors = list(User.objects.filter(email__startswith=f"rush-{stamp}-"))
+
+        def make_listing():
+            return Listing.objects.create(
+                seller=seller,
+                title=f"Capacity rush {stamp}",
+                description="capacity_rush test listing",
+                target_amount=opts["target"],
+                asset_value=None,
+                min_investment=Decimal("0.00"),
+                status=Listing.STATUS_LIVE,
+            )
+
+        args = (investors, opts["amount"], opts["attempts"], opts["workers"])
+        try:
+            if opts["shards"]:
+                report = compare(make_listing, *args, opts["shards"])
+            else:
+                report = rush(make_listing(), *args)
+        finally:
+            if not opts["keep"]:
+                listings = Listing.objects.filter(seller=seller)
+                LedgerEntry.objects.filter(listing__in=listings).purge()
+                listings.delete()
+                User.objects.filter(email__startswith=f"rush-{stamp}-").delete()
+                seller.delete()
+
+        self.stdout.write(json.dumps(report, indent=2))
+        runs = [report["unsharded"], report["sharded"]] if opts["shards"] else [report]
+        if any(run["oversubscribed"] for run in runs):
+            self.stderr.write(self.style.ERROR("Listing was oversubscribed!"))
@@ -0,0 +1,159 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from investments import ledger, orderbook, trading
+from investments.models import Investment, LedgerEntry, Order
+from listings.models import Listing
+
+User = get_user_model()
+
+MARKET_SHARE = 0.1
+
+
+def order_flow(rng, count, investors, mid=10000, spread=200, max_quantity=5000):
+    """
+    `count` random orders as (investor index, side, price in cents or None
+    for market, quantity in cents), limit prices within `spread` of `mid`.
+    """
+    for _ in range(count):
+        side = orderbook.BUY if rng.random() < 0.5 else orderbook.SELL
+        price = None
+        if rng.random() >= MARKET_SHARE:
+            price = mid + rng.randint(-spread, spread)
+        yield rng.randrange(investors), side, price, rng.randint(1, max_quantity)
+
+
+def engine_benchmark(count, investors, seed=0):
+    """Orders per second through the matching engine alone."""
+    flow = list(order_flow(random.Random(seed), count, investors))
+    book = orderbook.OrderBook()
+    trades = 0
+    started = time.perf_counter()
+    for order_id, (investor, side, price, quantity) in enumerate(flow, 1):
+        fills, _ = book.submit(
+            orderbook.BookOrder(order_id, investor, side, price, quantity)
+        )
+        trades += len(fills)
+    elapsed = time.perf_counter() - started
+    return {
+        "orders": count,
+        "trades": trades,
+        "resting": len(book.orders),
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(count / elapsed, 1) if elapsed else None,
+    }
+
+
+def persisted_benchmark(listing, investors, count, seed=0):
+    """
+    Orders per second through trading.place_order(): matching, saving the
+    order and trades and the ledger transfers. Sell orders beyond what an
+    investor holds are rejected and counted.
+    """
+    flow = list(order_flow(random.Random(seed), count, len(investors)))
+    accepted = rejected = trades = 0
+    started = time.perf_counter()
+    for investor, side, price, quantity in flow:
+        try:
+            _, made = trading.place_order(
+                investors[investor].pk,
+                listing.pk,
+                side,
+                Order.KIND_MARKET if price is None else Order.KIND_LIMIT,
+                Decimal(quantity).scaleb(-2),
+                None if price is None else Decimal(price).scaleb(-2),
+            )
+        except ledger.InsufficientPosition:
+            rejected += 1
+            continue
+        accepted += 1
+        trades += len(made)
+    elapsed = time.perf_counter() - started
+    return {
+        "orders": count,
+        "accepted": accepted,
+        "rejected": rejected,
+        "trades": trades,
+        "seconds": round(elapsed, 3),
+        "orders_per_second": round(count / elapsed, 1) if elapsed else None,
+        "replay_matches": not trading.verify(listing.pk),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the secondary-market order book in orders per second: the "
+        "in-memory matching engine alone, then (on a throwaway listing) "
+        "with orders, trades and transfers persisted. Run against a dev "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orders", type=int, default=200000, help="Orders for the engine run."
+        )
+        parser.add_argument(
+            "--persisted",
+            type=int,
+            default=2000,
+            help="Orders for the persisted run (0 skips it).",
+        )
+        parser.add_argument("--investors", type=int, default=50)
+        parser.add_argument(
+            "--holding",
+            type=Decimal,
+            default=Decimal("1000.00"),
+            help="Each investor's position before trading starts.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--keep", action="store_true", help="Don't delete the test data."
+        )
+
+    def handle(self, *args, **opts):
+        report = {
+            "engine": engine_benchmark(opts["orders"], opts["investors"], opts["seed"])
+        }
+        if opts["persisted"]:
+            report["persisted"] = self.persisted(opts)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def persisted(self, opts):
+        stamp = int(time.time())
+        seller = User.objects.create_user(f"book-seller-{stamp}@example.com")
+        investors = User.objects.bulk_create(
+            User(email=f"book-{stamp}-{i}@example.com", password="!")
+            for i in range(opts["investors"])
+        )
+        if not all(u.pk for u in investors):
+            investors = list(
+                User.objects.filter(email__startswith=f"book-{stamp}-").order_by("pk")
+            )
+        listing = Listing.objects.create(
+            seller=seller,
+            title=f"Order book benchmark {stamp}",
+            description="order_book_benchmark test listing",
+            target_amount=opts["holding"] * len(investors),
+            asset_value=None,
+            min_investment=Decimal("0.00"),
+            status=Listing.STATUS_LIVE,
+        )
+        try:
+            for investor in investors:
+                Investment.objects.create(
+                    investor=investor, listing=listing, amount=opts["holding"]
+                )
+            return persisted_benchmark(
+                listing, investors, opts["persisted"], opts["seed"]
+            )
+        finally:
+            if not opts["keep"]:
+                LedgerEntry.objects.filter(listing=listing).purge()
+                listing.delete()
+                User.objects.filter(email__startswith=f"book-{stamp}-").delete()
+                seller.delete()
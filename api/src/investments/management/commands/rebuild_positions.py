@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from investments import ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every position snapshot from the investment ledger. "
+        "With --incremental, only fold new entries into the existing "
+        "snapshots (the periodic job)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Roll snapshots forward instead of rebuilding them.",
+        )
+        parser.add_argument(
+            "--settle",
+            type=float,
+            default=ledger.SETTLE.total_seconds(),
+            help="Leave entries younger than this many seconds in the tail "
+            "(default 300).",
+        )
+
+    def handle(self, *args, incremental, settle, **options):
+        if settle < 0:
+            raise CommandError("--settle must be >= 0")
+        settle = timedelta(seconds=settle)
+        if incremental:
+            count = ledger.take_snapshots(settle)
+            self.stdout.write(self.style.SUCCESS(f"{count} snapshot(s) rolled forward"))
+        else:
+            count = ledger.rebuild_snapshots(settle)
+            self.stdout.write(self.style.SUCCESS(f"{count} snapshot(s) rebuilt"))
@@ -0,0 +1,57 @@
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a background job worker against the Redis queue "
+        "(JOBS_BACKEND=redis). Start as many as you like."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue and the retries due are empty.",
+        )
+        parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs.")
+        parser.add_argument(
+            "--name",
+            help="Unique, stable worker name, so a restart requeues the jobs "
+            "it held (default: the host name).",
+        )
+        parser.add_argument(
+            "--retry-dead",
+            action="store_true",
+            help="Move dead-lettered jobs back onto the queue and exit.",
+        )
+
+    def handle(self, *args, burst, max_jobs, name, retry_dead, **options):
+        if settings.JOBS_BACKEND != "redis":
+            raise CommandError(
+                f"JOBS_BACKEND is {settings.JOBS_BACKEND!r}; jobs already run "
+                "in-process. Set REDIS_URL or JOBS_BACKEND=redis."
+            )
+        if retry_dead:
+            moved = jobs.retry_dead()
+            self.stdout.write(self.style.SUCCESS(f"Requeued {moved} dead job(s)."))
+            return
+
+        worker = jobs.Worker(name=name or socket.gethostname())
+        recovered = worker.recover()
+        if recovered:
+            self.stdout.write(f"Requeued {recovered} job(s) from a previous run.")
+        try:
+            worker.run(burst=burst, max_jobs=max_jobs)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Jobs: {succeeded} succeeded, {retried} retried, "
+                "{dead} dead-lettered.".format(**worker.stats)
+            )
+        )
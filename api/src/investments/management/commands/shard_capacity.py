@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from investments import capacity
+from listings.models import Listing
+
+
+class Command(BaseCommand):
+    help = (
+        "Split a hot listing's remaining capacity over N shard rows "
+        "(0 folds it back onto the listing row)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("listing_id", type=int)
+        parser.add_argument("shards", type=int)
+
+    def handle(self, *args, listing_id, shards, **options):
+        if shards < 0:
+            raise CommandError("shards must be >= 0")
+        try:
+            listing = Listing.objects.get(pk=listing_id)
+        except Listing.DoesNotExist:
+            raise CommandError(f"Listing {listing_id} does not exist")
+
+        capacity.shard_capacity(listing, shards)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Listing {listing_id}: {shards} shard(s), "
+                f"{capacity.remaining(listing)} remaining"
+            )
+        )
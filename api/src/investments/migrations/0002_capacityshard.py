@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0001_initial"),
+        ("listings", "0004_listing_capacity_shards"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CapacityShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("slot", models.PositiveSmallIntegerField()),
+                ("remaining", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("listing", "slot"), name="uniq_capacity_shard_slot"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0003_keyset_pagination_indexes"),
+        ("listings", "0005_keyset_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="investment",
+            index=models.Index(
+                fields=["investor", "listing", "amount"],
+                name="inv_investor_listing_idx",
+            ),
+        ),
+    ]
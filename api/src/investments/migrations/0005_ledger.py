@@ -0,0 +1,164 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 1000
+
+
+def backfill_ledger(apps, schema_editor):
+    # One invest entry per existing investment, in creation order
+    Investment = apps.get_model("investments", "Investment")
+    LedgerEntry = apps.get_model("investments", "LedgerEntry")
+    rows = (
+        Investment.objects.order_by("created_at", "id")
+        .values_list("id", "investor_id", "listing_id", "amount")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+    for pk, investor_id, listing_id, amount in rows:
+        batch.append(
+            LedgerEntry(
+                investor_id=investor_id,
+                listing_id=listing_id,
+                kind="invest",
+                amount=amount,
+                investment_id=pk,
+            )
+        )
+        if len(batch) == BATCH_SIZE:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.bulk_create(batch)
+    # auto_now_add stamped them with the migration time
+    LedgerEntry.objects.update(
+        created_at=Subquery(
+            Investment.objects.filter(pk=OuterRef("investment_id")).values(
+                "created_at"
+            )[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0004_investor_listing_index"),
+        ("listings", "0007_listing_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("invest", "Invest"),
+                            ("refund", "Refund"),
+                            ("transfer", "Transfer"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "counterparty",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "investment",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="ledger_entries",
+                        to="investments.investment",
+                    ),
+                ),
+                (
+                    "investor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["investor", "listing", "id"], name="ledger_position_idx"
+                    ),
+                    models.Index(fields=["listing", "id"], name="ledger_listing_idx"),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PositionSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("through_id", models.BigIntegerField()),
+                ("taken_at", models.DateTimeField(auto_now=True)),
+                (
+                    "investor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="position_snapshots",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="position_snapshots",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["listing"], name="snapshot_listing_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("investor", "listing"), name="uniq_position_snapshot"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0005_ledger"),
+        ("listings", "0008_category_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="investment",
+            index=models.Index(
+                fields=["listing", "investor", "amount"],
+                name="inv_listing_investor_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0006_listing_investor_index"),
+        ("listings", "0008_category_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ledgerentry",
+            index=models.Index(
+                fields=["listing", "created_at"], name="ledger_listing_time_idx"
+            ),
+        ),
+    ]
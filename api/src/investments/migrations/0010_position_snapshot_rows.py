@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:12
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def add_snapshot_rows(apps, schema_editor):
+    # Every position now has a snapshot row from its first entry; give the
+    # older ones (transfer recipients, mostly) an empty row to roll from
+    LedgerEntry = apps.get_model("investments", "LedgerEntry")
+    PositionSnapshot = apps.get_model("investments", "PositionSnapshot")
+    positions = (
+        LedgerEntry.objects.order_by()
+        .values_list("investor_id", "listing_id")
+        .distinct()
+    )
+    PositionSnapshot.objects.bulk_create(
+        [
+            PositionSnapshot(
+                investor_id=investor_id,
+                listing_id=listing_id,
+                amount=0,
+                through_id=0,
+            )
+            for investor_id, listing_id in positions
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0009_ledger_protect"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_snapshot_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("investments", "0010_position_snapshot_rows"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="capacityshard",
+            name="pending_invested",
+            field=models.DecimalField(
+                decimal_places=2, default=Decimal("0.00"), max_digits=12
+            ),
+        ),
+        migrations.AddField(
+            model_name="capacityshard",
+            name="pending_investors",
+            field=models.IntegerField(default=0),
+        ),
+    ]
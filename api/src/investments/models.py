@@ -1,6 +1,6 @@
 from decimal import Decimal
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from listings.models import Listing
 
 
@@ -20,6 +20,357 @@ class Investment(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Keyset pagination of an investor's own investments
+            models.Index(
+                fields=["investor", "created_at", "id"], name="inv_investor_created_idx"
+            ),
+            # Per-listing positions of one investor (GROUP BY listing), and
+            # the "has this investor already invested here" check
+            models.Index(
+                fields=["investor", "listing", "amount"],
+                name="inv_investor_listing_idx",
+            ),
+            # A listing's investors and their totals, for investor_rank
+            # (investments/portfolio.py)
+            models.Index(
+                fields=["listing", "investor", "amount"],
+                name="inv_listing_investor_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.investor.email} → {self.listing.title}: {self.amount}"
+
+    def _has_sibling(self) -> bool:
+        # Does this investor hold any other investment in the same listing?
+        return (
+            Investment.objects.filter(
+                listing_id=self.listing_id, investor_id=self.investor_id
+            )
+            .exclude(pk=self.pk)
+            .exists()
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        from . import capacity, ledger
+
+        # Claim capacity and insert the row atomically: if the insert fails
+        # the claim rolls back, and if the claim fails nothing is inserted.
+        with transaction.atomic():
+            # Holding the position's lock, a concurrent first investment by
+            # the same investor is either finished (a sibling) or waiting,
+            # so investor_count counts the investor once.
+            ledger.lock(self.investor_id, self.listing_id)
+            capacity.claim(
+                self.listing, self.amount, new_investor=not self._has_sibling()
+            )
+            super().save(*args, **kwargs)
+            ledger.record(self, LedgerEntry.KIND_INVEST, self.amount)
+
+    def delete(self, *args, **kwargs):
+        from . import capacity, ledger
+
+        with transaction.atomic():
+            # Part of the position may have been sold since; only what is
+            # still held can be refunded. Raises InsufficientPosition.
+            ledger.lock(self.investor_id, self.listing_id)
+            held = ledger.position(self.investor_id, self.listing_id)
+            if held < self.amount:
+                raise ledger.InsufficientPosition(held)
+            last_for_investor = not self._has_sibling()
+            ledger.record(self, LedgerEntry.KIND_REFUND, -self.amount)
+            result = super().delete(*args, **kwargs)
+            capacity.release(
+                self.listing, self.amount, last_investor=last_for_investor
+            )
+        return result
+
+
+class LedgerQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError("Ledger entries are append-only.")
+
+    def delete(self):
+        raise TypeError("Ledger entries are append-only.")
+
+    def purge(self):
+        """Delete the entries for good: only for throwaway benchmark data."""
+        return super().delete()
+
+
+class LedgerEntry(models.Model):
+    """
+    One movement of a position (investor, listing), never changed or
+    removed: the position is the sum of its entries' signed amounts. See
+    investments/ledger.py.
+    """
+
+    KIND_INVEST = "invest"
+    KIND_REFUND = "refund"
+    KIND_TRANSFER = "transfer"
+    KIND_CHOICES = [
+        (KIND_INVEST, "Invest"),
+        (KIND_REFUND, "Refund"),
+        (KIND_TRANSFER, "Transfer"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    # PROTECT: an investor or listing with history can't be deleted, which
+    # would otherwise take its entries with it
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        related_name="ledger_entries",
+    )
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.PROTECT,
+        related_name="ledger_entries",
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # signed: positive grows the position, negative shrinks it
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # The Investment an invest / refund entry records, and the other side
+    # of a transfer. Unconstrained so deleting either never rewrites history.
+    investment = models.ForeignKey(
+        Investment,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="ledger_entries",
+    )
+    counterparty = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LedgerQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # A position's tail after its snapshot
+            models.Index(
+                fields=["investor", "listing", "id"], name="ledger_position_idx"
+            ),
+            # A listing's tail
+            models.Index(fields=["listing", "id"], name="ledger_listing_idx"),
+            # A listing's recent entries, for its funding history's open
+            # buckets (listings/history.py)
+            models.Index(
+                fields=["listing", "created_at"], name="ledger_listing_time_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.kind} {self.investor_id}/{self.listing_id}: {self.amount}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("Ledger entries are append-only.")
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Ledger entries are append-only.")
+
+
+class PositionSnapshot(models.Model):
+    """
+    A position's balance as of ledger entry `through_id` (inclusive), so
+    reads only sum the entries after it. Rolled forward by
+    `ledger.take_snapshots()` and rebuilt by `rebuild_positions`.
+    """
+
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="position_snapshots",
+    )
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name="position_snapshots",
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    through_id = models.BigIntegerField()
+    taken_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["investor", "listing"], name="uniq_position_snapshot"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["listing"], name="snapshot_listing_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.investor_id}/{self.listing_id}: {self.amount} @{self.through_id}"
+
+
+class CapacityShard(models.Model):
+    """
+    One slice of a hot listing's remaining capacity, and the funding its
+    claims and releases haven't folded into the listing's counters yet.
+    """
+
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name="shards",
+    )
+    slot = models.PositiveSmallIntegerField()
+    remaining = models.DecimalField(max_digits=12, decimal_places=2)
+    # Deltas for Listing.total_invested / investor_count (capacity.fold())
+    pending_invested = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    pending_investors = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["listing", "slot"], name="uniq_capacity_shard_slot"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.listing_id}#{self.slot}: {self.remaining}"
+
+
+class BookSequence(models.Model):
+    """
+    A listing's order-book command counter (investments/trading.py). The
+    row is locked while a command runs, so a listing's orders are matched
+    one at a time across processes.
+    """
+
+    listing = models.OneToOneField(
+        Listing,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="book_sequence",
+    )
+    sequence = models.BigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.listing_id}: {self.sequence}"
+
+
+class Order(models.Model):
+    """An order to buy or sell part of a position on the secondary market."""
+
+    SIDE_BUY = "buy"
+    SIDE_SELL = "sell"
+    SIDE_CHOICES = [(SIDE_BUY, "Buy"), (SIDE_SELL, "Sell")]
+
+    KIND_LIMIT = "limit"
+    KIND_MARKET = "market"
+    KIND_CHOICES = [(KIND_LIMIT, "Limit"), (KIND_MARKET, "Market")]
+
+    STATUS_OPEN = "open"
+    STATUS_FILLED = "filled"
+    STATUS_CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (STATUS_OPEN, "Open"),
+        (STATUS_FILLED, "Filled"),
+        (STATUS_CANCELLED, "Cancelled"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name="orders",
+    )
+    investor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="orders",
+    )
+    side = models.CharField(max_length=4, choices=SIDE_CHOICES)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    # per unit of position; NULL for market orders
+    price = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    # of the position, in the ledger's units
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    remaining = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_OPEN
+    )
+    # The book commands that placed and (explicitly) cancelled the order;
+    # replaying them in sequence order rebuilds the book.
+    sequence = models.BigIntegerField()
+    cancel_sequence = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["listing", "sequence"], name="uniq_order_sequence"
+            ),
+        ]
+        indexes = [
+            # A listing's resting orders, for recovery and depth
+            models.Index(
+                fields=["listing", "status", "sequence"], name="order_open_idx"
+            ),
+            # Keyset pagination of an investor's own orders
+            models.Index(
+                fields=["investor", "created_at", "id"],
+                name="order_investor_created_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        price = "market" if self.price is None else self.price
+        return f"#{self.pk} {self.side} {self.remaining}/{self.quantity} @ {price}"
+
+
+class Trade(models.Model):
+    """A fill between two orders; its quantity moved by a ledger transfer."""
+
+    id = models.BigAutoField(primary_key=True)
+    listing = models.ForeignKey(
+        Listing,
+        on_delete=models.CASCADE,
+        related_name="trades",
+    )
+    buy_order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="buy_trades"
+    )
+    sell_order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="sell_trades"
+    )
+    buyer = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+"
+    )
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    # the book command (the taker's placement) that made it
+    sequence = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["listing", "id"], name="trade_listing_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.quantity} @ {self.price} ({self.listing_id})"
@@ -0,0 +1,191 @@
+"""
+An in-memory price-time-priority order book for one listing.
+
+This is only the matching: no database, no clock, no randomness, so the
+same commands in the same order always give the same trades and the same
+book. investments/trading.py persists orders and trades around it and
+rebuilds a book after a restart or when another process has moved the
+listing's book on.
+
+Prices and quantities are plain numbers that compare exactly; trading.py
+passes integer cents. An incoming order matches the best opposite price
+first and, within a price, the oldest order first; trades happen at the
+resting (maker) order's price. A limit order's unmatched remainder rests
+in the book; a market order's is dropped. An order never trades with the
+same investor's resting orders: those are cancelled as they are reached
+(cancel-resting self-trade prevention).
+"""
+
+from bisect import insort
+
+BUY = "buy"
+SELL = "sell"
+
+
+class BookOrder:
+    """An order as the engine sees it; `price` is None for market orders."""
+
+    __slots__ = ("id", "investor_id", "side", "price", "remaining")
+
+    def __init__(self, id, investor_id, side, price, remaining):
+        self.id = id
+        self.investor_id = investor_id
+        self.side = side
+        self.price = price
+        self.remaining = remaining
+
+    def __repr__(self):
+        return (
+            f"BookOrder({self.id}, {self.investor_id}, {self.side!r}, "
+            f"{self.price!r}, {self.remaining!r})"
+        )
+
+
+class Fill:
+    """`quantity` of the resting order `maker_id` traded at `price`."""
+
+    __slots__ = ("maker_id", "maker_investor_id", "price", "quantity")
+
+    def __init__(self, maker_id, maker_investor_id, price, quantity):
+        self.maker_id = maker_id
+        self.maker_investor_id = maker_investor_id
+        self.price = price
+        self.quantity = quantity
+
+    def __eq__(self, other):
+        return isinstance(other, Fill) and self.key() == other.key()
+
+    def key(self):
+        return (self.maker_id, self.maker_investor_id, self.price, self.quantity)
+
+    def __repr__(self):
+        return f"Fill{self.key()!r}"
+
+
+class _Side:
+    # The resting orders on one side: {price: {order id: order}} (dicts
+    # keep insertion order, which is time priority) and the prices as
+    # sorted keys whose last element is the best price: the price itself
+    # for bids, its negation for asks.
+
+    __slots__ = ("levels", "keys", "sign")
+
+    def __init__(self, sign):
+        self.levels = {}
+        self.keys = []
+        self.sign = sign
+
+    def add(self, order):
+        level = self.levels.get(order.price)
+        if level is None:
+            level = self.levels[order.price] = {}
+            insort(self.keys, self.sign * order.price)
+        level[order.id] = order
+
+    def remove(self, order):
+        level = self.levels[order.price]
+        del level[order.id]
+        if not level:
+            del self.levels[order.price]
+            self.keys.remove(self.sign * order.price)
+
+
+class OrderBook:
+    """One listing's resting orders and the matching of incoming ones."""
+
+    def __init__(self):
+        self.bids = _Side(1)
+        self.asks = _Side(-1)
+        self.orders = {}  # resting orders by id
+
+    def submit(self, order):
+        """
+        Match `order` against the book, then rest a limit order's remainder.
+        Returns (fills, ids of resting orders cancelled as self-trades).
+        `order.remaining` and the makers' are updated in place.
+        """
+        if order.id in self.orders:
+            raise ValueError(f"Order {order.id} is already in the book.")
+        opposite = self.asks if order.side == BUY else self.bids
+        fills = []
+        cancelled = []
+        keys = opposite.keys
+        # a limit crosses while the best opposite key is >= its own key
+        limit = None if order.price is None else opposite.sign * order.price
+        while order.remaining and keys:
+            key = keys[-1]
+            if limit is not None and key < limit:
+                break
+            price = opposite.sign * key
+            level = opposite.levels[price]
+            for maker in list(level.values()):
+                if maker.investor_id == order.investor_id:
+                    del level[maker.id]
+                    del self.orders[maker.id]
+                    cancelled.append(maker.id)
+                    continue
+                quantity = min(order.remaining, maker.remaining)
+                fills.append(Fill(maker.id, maker.investor_id, price, quantity))
+                order.remaining -= quantity
+                maker.remaining -= quantity
+                if not maker.remaining:
+                    del level[maker.id]
+                    del self.orders[maker.id]
+                if not order.remaining:
+                    break
+            if not level:
+                del opposite.levels[price]
+                keys.pop()
+        if order.remaining and order.price is not None:
+            self.rest(order)
+        return fills, cancelled
+
+    def rest(self, order):
+        """Put `order` in the book without matching (recovery)."""
+        if order.id in self.orders:
+            raise ValueError(f"Order {order.id} is already in the book.")
+        (self.bids if order.side == BUY else self.asks).add(order)
+        self.orders[order.id] = order
+
+    def cancel(self, order_id):
+        """Remove a resting order; returns it, or None if it isn't resting."""
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            (self.bids if order.side == BUY else self.asks).remove(order)
+        return order
+
+    def best_bid(self):
+        return self.bids.keys[-1] if self.bids.keys else None
+
+    def best_ask(self):
+        return -self.asks.keys[-1] if self.asks.keys else None
+
+    def snapshot(self):
+        """
+        The resting orders as (id, investor, side, price, remaining), each
+        side in priority order: equal books have equal snapshots.
+        """
+        return [
+            (o.id, o.investor_id, o.side, o.price, o.remaining)
+            for side in (self.bids, self.asks)
+            for key in reversed(side.keys)
+            for o in side.levels[side.sign * key].values()
+        ]
+
+
+def replay(commands):
+    """
+    Run ("place", BookOrder) / ("cancel", order id) commands through a new
+    book. Returns (book, [(taker id, fills, self-trade cancellations)]).
+    """
+    book = OrderBook()
+    results = []
+    for command, arg in commands:
+        if command == "place":
+            fills, cancelled = book.submit(arg)
+            results.append((arg.id, fills, cancelled))
+        elif command == "cancel":
+            book.cancel(arg)
+        else:
+            raise ValueError(f"Unknown command {command!r}.")
+    return book, results
@@ -0,0 +1,183 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Round
+
+from core.expressions import CountAbove, Percent
+from . import ledger
+from .models import Investment
+
+CENT = Decimal("0.01")
+# the investor's totals, repeated on every row of annotate_investments()
+SUMMARY_FIELDS = ("summary_total_invested", "summary_listings")
+
+
+def cache_key(user_id):
+    return f"portfolio:{user_id}"
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+def holdings(user):
+    """The user's positions with their current amount, `held` (ledger.holdings())."""
+    return ledger.holdings().filter(investor=user)
+
+
+def positions_queryset(user):
+    """
+    One row per listing the user holds, in a single query. Holdings come
+    from the ledger, so they include what was bought and sold on the
+    secondary market; `investments` counts the user's own investments.
+    """
+    per_position = (
+        Investment.objects.filter(
+            investor_id=OuterRef("investor_id"), listing_id=OuterRef("listing_id")
+        )
+        .order_by()
+        .values("investor_id")
+    )
+    return (
+        holdings(user)
+        .filter(held__gt=0)
+        .values(
+            "listing_id",
+            "listing__title",
+            "listing__status",
+            "listing__asset_value",
+            "listing__target_amount",
+            "listing__total_invested",
+            "held",
+        )
+        .annotate(
+            investments=Coalesce(
+                Subquery(per_position.annotate(n=Count("id")).values("n")), 0
+            ),
+            last_invested_at=Subquery(
+                per_position.annotate(at=Max("created_at")).values("at")
+            ),
+            ownership_percent=Percent("held", "listing__asset_value"),
+            percent_funded=Percent(
+                "listing__total_invested", "listing__target_amount"
+            ),
+        )
+        .order_by(F("last_invested_at").desc(nulls_last=True), "-listing_id")
+    )
+
+
+def investor_rank(held):
+    """
+    Where the row's investor stands among the listing's investors by what
+    they hold in it (`held`, the row's position): 1 + how many hold more
+    (ties share a rank).
+    """
+    # Counts the listing's positions, through snapshot_listing_idx, whose
+    # holding is above the row investor's
+    others = ledger.holdings().filter(listing_id=OuterRef("listing_id"))
+    return CountAbove(others.values("held"), "held", held) + 1
+
+
+def annotate_investments(queryset, user):
+    """
+    `user`'s investments with ownership_percent, listing_percent_funded and
+    investor_rank computed by the database, plus the SUMMARY_FIELDS totals
+    as uncorrelated subqueries, which the database evaluates once per query
+    however many rows the page has. Ownership and rank are by the
+    investor's position in the listing, from the ledger.
+    """
+    held = Subquery(
+        ledger.holdings()
+        .filter(investor_id=OuterRef("investor_id"), listing_id=OuterRef("listing_id"))
+        .values("held")
+    )
+    mine = holdings(user).values("investor")
+    totals = summary_aggregates()
+    return queryset.annotate(
+        ownership_percent=_percent(held, "listing__asset_value"),
+        listing_percent_funded=_percent(
+            "listing__total_invested", "listing__target_amount"
+        ),
+        investor_rank=investor_rank(held),
+        **{
+            name: Subquery(mine.annotate(value=totals[name]).values("value"))
+            for name in SUMMARY_FIELDS
+        },
+    )
+
+
+def summary(row):
+    """
+    The summary block from a row with the SUMMARY_FIELDS (a dict or an
+    instance), or from summary_aggregates(); None when there are no rows.
+    """
+    if row is None:
+        return {"total_invested": _money(None), "listings": 0}
+    if not isinstance(row, dict):
+        row = {f: getattr(row, f) for f in SUMMARY_FIELDS}
+    return {
+        "total_invested": _money(row["summary_total_invested"]),
+        "listings": row["summary_listings"],
+    }
+
+
+def summary_aggregates():
+    """The SUMMARY_FIELDS as aggregate() arguments over holdings(user)."""
+    return {
+        "summary_total_invested": Sum("held"),
+        "summary_listings": Count("pk", filter=Q(held__gt=0)),
+    }
+
+
+def build_portfolio(user):
+    positions = []
+    total = Decimal("0.00")
+    investments = 0
+    for row in positions_queryset(user):
+        total += row["held"]
+        investments += row["investments"]
+        positions.append(
+            {
+                "listing": row["listing_id"],
+                "listing_title": row["listing__title"],
+                "listing_status": row["listing__status"],
+                "total_invested": _money(row["held"]),
+                "investments": row["investments"],
+                "ownership_percent": _money(row["ownership_percent"]),
+                "percent_funded": _money(row["percent_funded"]),
+                "last_invested_at": row["last_invested_at"],
+            }
+        )
+    return {
+        "positions": positions,
+        "totals": {
+            "total_invested": _money(total),
+            "listings": len(positions),
+            "investments": investments,
+        },
+    }
+
+
+def get_portfolio(user):
+    key = cache_key(user.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_portfolio(user)
+        cache.set(key, data, settings.PORTFOLIO_CACHE_TIMEOUT)
+    return data
+
+
+def _money(value):
+    return f"{Decimal(value or 0).quantize(CENT)}"
+
+
+def _percent(numerator, denominator):
+    # Rounded to the cent in SQL, so SQLite's float result is rounded once,
+    # the way the Decimal arithmetic this replaced did, and like PostgreSQL
+    return Round(
+        Percent(numerator, denominator),
+        2,
+        output_field=DecimalField(max_digits=9, decimal_places=2),
+    )
@@ -1,9 +1,12 @@
-from decimal import Decimal
 from rest_framework import serializers
-from .models import Investment
+from core.metrics import TimedSerializerMixin
+from . import trading
+from .capacity import CapacityExhausted
+from .ledger import InsufficientPosition
+from .models import Investment, Order, Trade
 
 
-class InvestmentSerializer(serializers.ModelSerializer):
+class InvestmentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     listing_title = serializers.CharField(source="listing.title", read_only=True)
     listing_asset_value = serializers.DecimalField(
         source="listing.asset_value", max_digits=12, decimal_places=2, read_only=True
@@ -12,7 +15,14 @@ class InvestmentSerializer(serializers.ModelSerializer):
         source="listing.target_amount", max_digits=12, decimal_places=2, read_only=True
     )
 
-    ownership_percent = serializers.SerializerMethodField()
+    # annotations from portfolio.annotate_investments() (see InvestmentViewSet)
+    ownership_percent = serializers.DecimalField(
+        max_digits=None, decimal_places=2, read_only=True
+    )
+    listing_percent_funded = serializers.DecimalField(
+        max_digits=None, decimal_places=2, read_only=True
+    )
+    investor_rank = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Investment
@@ -23,8 +33,10 @@ class InvestmentSerializer(serializers.ModelSerializer):
             "listing_title",
             "listing_asset_value",
             "listing_target_amount",
+            "listing_percent_funded",
             "amount",
             "ownership_percent",
+            "investor_rank",
             "created_at",
         ]
         read_only_fields = [
@@ -33,17 +45,12 @@ class InvestmentSerializer(serializers.ModelSerializer):
             "listing_title",
             "listing_asset_value",
             "listing_target_amount",
+            "listing_percent_funded",
             "ownership_percent",
+            "investor_rank",
             "created_at",
         ]
 
-    def get_ownership_percent(self, obj) -> str:
-        asset_value = obj.listing.asset_value
-        if not asset_value or asset_value == 0:
-            return "0.00"
-        pct = (obj.amount / asset_value) * Decimal("100.00")
-        return f"{pct.quantize(Decimal('0.01'))}"
-
     def validate(self, attrs):
         request = self.context.get("request")
         listing = attrs.get("listing")
@@ -63,7 +70,8 @@ class InvestmentSerializer(serializers.ModelSerializer):
                 f"Minimum investment is {listing.min_investment}."
             )
 
-        # Capacity check
+        # Early capacity check against the cached counter; the authoritative
+        # check is the atomic claim in Investment.save().
         already = listing.total_invested
         if already + amount > listing.target_amount:
             remaining = listing.target_amount - already
@@ -79,4 +87,68 @@ class InvestmentSerializer(serializers.ModelSerializer):
         request = self.context.get("request")
         if request and request.user and request.user.is_authenticated:
             validated_data["investor"] = request.user
-        return super().create(validated_data)
+        try:
+            return super().create(validated_data)
+        except CapacityExhausted as exc:
+            if exc.remaining <= 0:
+                raise serializers.ValidationError("This listing is fully funded.")
+            raise serializers.ValidationError(str(exc))
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = [
+            "id",
+            "listing",
+            "side",
+            "kind",
+            "price",
+            "quantity",
+            "remaining",
+            "status",
+            "created_at",
+        ]
+        read_only_fields = ["id", "remaining", "status", "created_at"]
+
+    def validate(self, attrs):
+        listing = attrs["listing"]
+        if listing.status not in (listing.STATUS_LIVE, listing.STATUS_FUNDED):
+            raise serializers.ValidationError(
+                "Only live and funded listings can be traded."
+            )
+        if attrs["quantity"] <= 0:
+            raise serializers.ValidationError("Order quantity must be positive.")
+        price = attrs.get("price")
+        if attrs["kind"] == Order.KIND_LIMIT:
+            if price is None or price <= 0:
+                raise serializers.ValidationError(
+                    "Limit orders need a positive price."
+                )
+        elif price is not None:
+            raise serializers.ValidationError("Market orders take no price.")
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            order, trades = trading.place_order(
+                validated_data["investor"].pk,
+                validated_data["listing"].pk,
+                validated_data["side"],
+                validated_data["kind"],
+                validated_data["quantity"],
+                validated_data.get("price"),
+            )
+        except InsufficientPosition as exc:
+            raise serializers.ValidationError(
+                f"Only {exc.held} of this position is available to sell."
+            )
+        order.new_trades = trades
+        return order
+
+
+class TradeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Trade
+        fields = ["id", "buy_order", "sell_order", "price", "quantity", "created_at"]
+        read_only_fields = fields
@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import jobs
+from listings.signals import invalidate_on_commit
+from . import portfolio
+from .models import Investment
+
+
+def _portfolio_changed(investor_id):
+    transaction.on_commit(lambda: portfolio.invalidate(investor_id))
+
+
+def _publish_funding(listing_id, delta):
+    # Runs on commit; capacity.claim()/release() moved the listing's
+    # counters in the same transaction, so the totals include this investment.
+    jobs.enqueue(
+        "investments.publish_funding", listing_id=listing_id, delta=str(delta)
+    )
+
+
+@receiver(post_save, sender=Investment)
+def investment_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_on_commit(instance.listing_id)
+        _portfolio_changed(instance.investor_id)
+        _publish_funding(instance.listing_id, instance.amount)
+        jobs.enqueue(
+            "investments.close_funded_listing", listing_id=instance.listing_id
+        )
+        jobs.enqueue("investments.notify_investor", investment_id=instance.pk)
+
+
+@receiver(post_delete, sender=Investment)
+def investment_deleted(sender, instance, **kwargs):
+    invalidate_on_commit(instance.listing_id)
+    _portfolio_changed(instance.investor_id)
+    _publish_funding(instance.listing_id, -instance.amount)
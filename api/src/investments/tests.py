@@ -1,3 +1,1275 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import ProtectedError, Sum
+from django.conf import settings
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from core import benchmark, jobs, replicas
+from core.fastlist import FastJSONRenderer, compile_plan
+from core.queryplans import analyze, captured_plan_problems
+from listings.models import Listing
+from . import capacity, ledger, orderbook, portfolio, trading
+from .management.commands.capacity_rush import compare, rush
+from .management.commands.order_book_benchmark import (
+    engine_benchmark,
+    order_flow,
+    persisted_benchmark,
+)
+from .models import (
+    BookSequence,
+    Investment,
+    LedgerEntry,
+    Order,
+    PositionSnapshot,
+    Trade,
+)
+from .orderbook import BUY, SELL, BookOrder, Fill
+from .serializers import InvestmentSerializer
+
+User = get_user_model()
+
+
+def make_listing(seller, target="1000.00", **extra):
+    return Listing.objects.create(
+        seller=seller,
+        title="PSA 10 Charizard",
+        description="1st edition base set",
+        category="cards",
+        target_amount=Decimal(target),
+        min_investment=Decimal("10.00"),
+        status=Listing.STATUS_LIVE,
+        **extra,
+    )
+
+
+class CapacityClaimTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("investor@example.com")
+        self.listing = make_listing(self.seller)
+
+    def invest(self, amount):
+        return Investment.objects.create(
+            investor=self.investor, listing=self.listing, amount=Decimal(amount)
+        )
+
+    def test_claim_stops_at_target(self):
+        self.invest("600.00")
+        with self.assertRaises(capacity.CapacityExhausted) as ctx:
+            self.invest("500.00")
+        self.assertEqual(ctx.exception.remaining, Decimal("400.00"))
+        self.invest("400.00")
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("1000.00"))
+        self.assertEqual(Investment.objects.count(), 2)
+
+    def test_sharded_claims_spill_across_shards(self):
+        capacity.shard_capacity(self.listing, 4)
+        self.assertEqual(self.listing.shards.count(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invest("100.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            # larger than any single 250.00 shard once one has been drawn down
+            self.invest("600.00")
+        with self.assertRaises(capacity.CapacityExhausted):
+            self.invest("301.00")
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("700.00"))
+        self.assertEqual(capacity.remaining(self.listing), Decimal("300.00"))
+
+        capacity.shard_capacity(self.listing, 0)
+        self.assertEqual(capacity.remaining(self.listing), Decimal("300.00"))
+
+    def test_claims_follow_sharding_done_elsewhere(self):
+        stale = Listing.objects.get(pk=self.listing.pk)
+        capacity.shard_capacity(self.listing, 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            investment = Investment.objects.create(
+                investor=self.investor, listing=stale, amount=Decimal("600.00")
+            )
+        self.assertEqual(capacity.remaining(self.listing), Decimal("400.00"))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("600.00"))
+        self.assertEqual(self.listing.investor_count, 1)
+
+        # and releases follow unsharding: `stale` still says 4 shards
+        capacity.shard_capacity(self.listing, 0)
+        investment.delete()
+        self.assertEqual(capacity.remaining(self.listing), Decimal("1000.00"))
+
+    def test_sharded_claims_leave_the_listing_row_to_the_fold(self):
+        capacity.shard_capacity(self.listing, 4)
+        version = Listing.objects.get(pk=self.listing.pk).funding_version
+        with self.captureOnCommitCallbacks() as callbacks:
+            first = self.invest("100.00")
+            self.invest("50.00")
+        # the claims only wrote their shards
+        listing = Listing.objects.get(pk=self.listing.pk)
+        self.assertEqual(
+            (listing.total_invested, listing.investor_count, listing.funding_version),
+            (Decimal("0.00"), 0, version),
+        )
+        pending = self.listing.shards.aggregate(
+            invested=Sum("pending_invested"), investors=Sum("pending_investors")
+        )
+        self.assertEqual(pending, {"invested": Decimal("150.00"), "investors": 1})
+
+        callbacks[0]()
+        listing.refresh_from_db()
+        self.assertEqual(
+            (listing.total_invested, listing.investor_count), (Decimal("150.00"), 1)
+        )
+        self.assertGreater(listing.funding_version, version)
+        self.assertFalse(
+            self.listing.shards.exclude(pending_invested=0, pending_investors=0)
+        )
+
+        # a refund before the fold, then resharding, which folds what's left
+        first.delete()
+        capacity.shard_capacity(self.listing, 0)
+        listing.refresh_from_db()
+        self.assertEqual(
+            (listing.total_invested, listing.investor_count), (Decimal("50.00"), 1)
+        )
+        self.assertEqual(capacity.remaining(self.listing), Decimal("950.00"))
+
+    def test_reconcile_counts_pending_shard_deltas(self):
+        capacity.shard_capacity(self.listing, 4)
+        self.invest("100.00")  # not folded: no commit in this test
+        out = StringIO()
+        call_command("reconcile_funding", "--dry-run", stdout=out)
+        self.assertIn("found 0 drifted", out.getvalue())
+
+        Listing.objects.filter(pk=self.listing.pk).update(total_invested=5)
+        call_command("reconcile_funding", stdout=StringIO())
+        capacity.fold(self.listing.pk)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("100.00"))
+        self.assertEqual(self.listing.investor_count, 1)
+
+    def test_investments_cannot_be_updated(self):
+        investment = self.invest("100.00")
+        client = APIClient()
+        client.force_authenticate(self.investor)
+        url = f"/api/investments/{investment.pk}/"
+        for method in (client.patch, client.put):
+            res = method(url, {"listing": self.listing.pk, "amount": "900.00"})
+            self.assertEqual(res.status_code, 405)
+        self.assertEqual(client.patch(url, {}).status_code, 405)
+
+        investment.refresh_from_db()
+        self.listing.refresh_from_db()
+        self.assertEqual(investment.amount, Decimal("100.00"))
+        self.assertEqual(self.listing.total_invested, Decimal("100.00"))
+
+    def test_api_reports_exhausted_capacity(self):
+        client = APIClient()
+        client.force_authenticate(self.investor)
+        self.invest("950.00")
+
+        res = client.post(
+            "/api/investments/", {"listing": self.listing.pk, "amount": "100.00"}
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Only 50.00 remaining", str(res.data))
+
+
+class CapacityRushTests(TransactionTestCase):
+    def test_compare_reports_both_runs(self):
+        seller = User.objects.create_user("seller@example.com")
+        investors = [
+            User.objects.create_user(f"inv{i}@example.com") for i in range(5)
+        ]
+        report = compare(
+            lambda: make_listing(seller, target="2000.00"),
+            investors,
+            Decimal("100.00"),
+            40,
+            4,
+            shards=4,
+        )
+        self.assertEqual(report["unsharded"]["shards"], 0)
+        self.assertEqual(report["sharded"]["shards"], 4)
+        for run in (report["unsharded"], report["sharded"]):
+            self.assertEqual((run["accepted"], run["errors"]), (20, 0), run)
+            self.assertTrue(run["counters_match"], run)
+        self.assertIsNotNone(report["speedup"])
+
+    def test_parallel_investments_never_oversubscribe(self):
+        seller = User.objects.create_user("seller@example.com")
+        investors = [
+            User.objects.create_user(f"inv{i}@example.com") for i in range(20)
+        ]
+        for shards in (0, 4):
+            listing = make_listing(seller, target="5000.00")
+            if shards:
+                capacity.shard_capacity(listing, shards)
+
+            report = rush(listing, investors, Decimal("100.00"), 300, 8)
+
+            invested = Decimal(report["invested"])
+            self.assertFalse(report["oversubscribed"], report)
+            self.assertEqual(report["errors"], 0, report)
+            self.assertEqual(report["accepted"], 50)
+            self.assertEqual(report["rejected"], 250)
+            self.assertEqual(invested, report["accepted"] * Decimal("100.00"))
+            self.assertEqual(
+                invested + capacity.remaining(listing), listing.target_amount
+            )
+            listing.refresh_from_db()
+            self.assertEqual(listing.total_invested, invested)
+
+    def test_concurrent_first_investments_count_one_investor(self):
+        seller = User.objects.create_user("seller@example.com")
+        investor = User.objects.create_user("investor@example.com")
+        for shards in (0, 4):
+            listing = make_listing(seller, target="5000.00")
+            if shards:
+                capacity.shard_capacity(listing, shards)
+
+            report = rush(listing, [investor], Decimal("100.00"), 16, 8)
+
+            self.assertEqual(report["accepted"], 16, report)
+            listing.refresh_from_db()
+            self.assertEqual(listing.investor_count, 1)
+
+
+class BenchmarkTests(TransactionTestCase):
+    def test_seed_run_and_compare(self):
+        dataset = benchmark.seed(30, 20, 200)
+        self.assertEqual(
+            dataset["counts"], {"users": 30, "listings": 20, "investments": 200}
+        )
+        self.assertEqual(
+            Listing.objects.aggregate(t=Sum("total_invested"))["t"],
+            Investment.objects.aggregate(t=Sum("amount"))["t"],
+        )
+
+        reads = ["listing_list", "listing_detail", "investment_list", "me"]
+        report = benchmark.run(dataset, requests=12, concurrency=3, scenarios=reads)
+        # SQLite's shared-cache test database can't take concurrent writers
+        writes = benchmark.run(
+            dataset, requests=12, concurrency=1, scenarios=["login", "invest"]
+        )
+        report["scenarios"].update(writes["scenarios"])
+        self.assertEqual(set(report["scenarios"]), set(benchmark.SCENARIOS))
+        for name, stats in report["scenarios"].items():
+            self.assertEqual(stats["requests"], 12, name)
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertLessEqual(stats["p50_ms"], stats["p95_ms"])
+            self.assertLessEqual(stats["p95_ms"], stats["p99_ms"])
+            self.assertGreater(stats["queries_per_request"], 0, name)
+        self.assertEqual(Investment.objects.count(), 212)
+
+        asgi = benchmark.run(
+            dataset, requests=12, concurrency=3, scenarios=reads, interface="asgi"
+        )
+        for name, stats in asgi["scenarios"].items():
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertGreater(stats["queries_per_request"], 0, name)
+        self.assertEqual(set(benchmark.throughput_ratio(asgi, report)), set(reads))
+
+        self.assertEqual(benchmark.compare(report, report), [])
+        slower = {
+            "scenarios": {
+                "listing_detail": {
+                    **report["scenarios"]["listing_detail"],
+                    "p95_ms": report["scenarios"]["listing_detail"]["p95_ms"] * 2,
+                    "queries_per_request": 1000,
+                }
+            }
+        }
+        self.assertEqual(
+            {r["metric"] for r in benchmark.compare(slower, report)},
+            {"p95_ms", "queries_per_request"},
+        )
+
+        benchmark.cleanup(dataset)
+        self.assertFalse(Listing.objects.exists())
+
+    def test_pool_report(self):
+        self.assertIsNone(benchmark.pool_report({}, {}))
+        before = {"default": {"pool_min": 1, "pool_max": 4, "requests_num": 10}}
+        after = {
+            "default": {
+                "pool_min": 1,
+                "pool_max": 4,
+                "requests_num": 60,
+                "requests_queued": 3,
+                "requests_wait_ms": 42,
+            }
+        }
+        self.assertEqual(
+            benchmark.pool_report(before, after),
+            {
+                "min_size": 1,
+                "max_size": 4,
+                "checkouts": 50,
+                "exhausted": 3,
+                "wait_ms": 42,
+                "timeouts": 0,
+            },
+        )
+
+    def test_percentile(self):
+        values = [float(v) for v in range(1, 101)]
+        self.assertEqual(benchmark.percentile(values, 50), 50.5)
+        self.assertAlmostEqual(benchmark.percentile(values, 99), 99.01)
+        self.assertIsNone(benchmark.percentile([], 50))
+
+
+class InvestmentQueryPlanTests(TestCase):
+    """Hot investment reads/writes must stay on indexes on large tables."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(email=f"user{i}@example.com", password="!") for i in range(200)
+        )
+        listings = Listing.objects.bulk_create(
+            Listing(
+                seller=users[i % 20],
+                title=f"Item {i}",
+                description="",
+                target_amount=Decimal("1000000.00"),
+                min_investment=Decimal("1.00"),
+                status=Listing.STATUS_LIVE,
+            )
+            for i in range(300)
+        )
+        # bulk_create skips Investment.save(), i.e. the capacity claim
+        Investment.objects.bulk_create(
+            Investment(
+                investor=users[i % len(users)],
+                listing=listings[(i * 7) % len(listings)],
+                amount=Decimal("10.00"),
+            )
+            for i in range(8000)
+        )
+        analyze(User, Listing, Investment)
+        cls.investor = users[3]
+        cls.listing = listings[5]
+
+    def captured_problems(self, ctx):
+        return captured_plan_problems(
+            ctx.captured_queries, ["investments_investment", "listings_listing"]
+        )
+
+    def test_investor_reads_use_indexes(self):
+        client = APIClient()
+        client.force_authenticate(self.investor)
+        with CaptureQueriesContext(connection) as ctx:
+            res = client.get("/api/investments/")
+            client.get(res.data["next"])
+            # per-listing positions, as used for the portfolio view
+            list(
+                Investment.objects.filter(investor=self.investor)
+                .values("listing")
+                .annotate(total=Sum("amount"))
+                .order_by()
+            )
+        self.assertEqual(self.captured_problems(ctx), {})
+
+    def test_invest_path_uses_indexes(self):
+        client = APIClient()
+        client.force_authenticate(self.investor)
+        with CaptureQueriesContext(connection) as ctx:
+            res = client.post(
+                "/api/investments/", {"listing": self.listing.pk, "amount": "25.00"}
+            )
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(self.captured_problems(ctx), {})
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("investor@example.com")
+        self.live = make_listing(self.seller)
+        self.other = make_listing(self.seller)
+        self.first = Investment.objects.create(
+            investor=self.investor, listing=self.live, amount=Decimal("10.00")
+        )
+        self.second = Investment.objects.create(
+            investor=self.investor, listing=self.other, amount=Decimal("20.00")
+        )
+        Investment.objects.filter(pk=self.first.pk).update(
+            created_at=datetime(2026, 1, 15, 12, tzinfo=timezone.utc)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_superuser("staff@example.com", "pw-123456")
+        )
+
+    def export(self, fmt, **params):
+        res = self.client.get(f"/api/investments/export.{fmt}", params)
+        self.assertEqual(res.status_code, 200)
+        return b"".join(res.streaming_content).decode()
+
+    def test_csv_and_ndjson(self):
+        rows = list(csv.reader(io.StringIO(self.export("csv"))))
+        self.assertEqual(rows[0][:3], ["id", "investor_id", "investor_email"])
+        self.assertEqual(
+            [r[0] for r in rows[1:]], [str(self.first.pk), str(self.second.pk)]
+        )
+        self.assertEqual(rows[1][6:], ["10.00", "2026-01-15T12:00:00+00:00"])
+
+        lines = self.export("ndjson").splitlines()
+        self.assertEqual(json.loads(lines[1])["amount"], "20.00")
+        self.assertEqual(json.loads(lines[1])["listing_id"], self.other.pk)
+
+    def test_filters(self):
+        def ids(**params):
+            lines = self.export("ndjson", **params).splitlines()
+            return [json.loads(line)["id"] for line in lines]
+
+        self.assertEqual(ids(created_before="2026-02-01"), [self.first.pk])
+        self.assertEqual(ids(created_after="2026-02-01"), [self.second.pk])
+        self.assertEqual(ids(listing=self.other.pk), [self.second.pk])
+        self.assertEqual(ids(status=Listing.STATUS_DRAFT), [])
+        res = self.client.get("/api/investments/export.csv", {"created_after": "soon"})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client.get("/api/investments/export.xml").status_code, 404)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.investor)
+        res = self.client.get("/api/investments/export.csv")
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(ROOT_URLCONF="core.asgi_urls")
+    def test_streams_asynchronously_under_asgi(self):
+        client = AsyncClient()
+        client.force_login(User.objects.get(email="staff@example.com"))
+
+        async def export():
+            res = await client.get("/api/investments/export.ndjson")
+            self.assertTrue(res.is_async)
+            return b"".join([chunk async for chunk in res.streaming_content])
+
+        lines = async_to_sync(export)().decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [self.first.pk, self.second.pk],
+        )
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user("seller@example.com")
+        self.alice = User.objects.create_user("alice@example.com")
+        self.bob = User.objects.create_user("bob@example.com")
+        self.listing = make_listing(seller, target="5000.00")
+
+    def invest(self, investor, amount):
+        return Investment.objects.create(
+            investor=investor, listing=self.listing, amount=Decimal(amount)
+        )
+
+    def holdings(self):
+        return (
+            ledger.position(self.alice.pk, self.listing.pk),
+            ledger.position(self.bob.pk, self.listing.pk),
+            ledger.listing_total(self.listing.pk),
+            ledger.positions(self.alice.pk),
+        )
+
+    def test_investments_and_refunds_are_entries(self):
+        first = self.invest(self.alice, "100")
+        first_pk = first.pk
+        self.invest(self.alice, "50")
+        first.delete()
+        self.assertEqual(
+            list(LedgerEntry.objects.values_list("kind", "amount")),
+            [
+                (LedgerEntry.KIND_INVEST, Decimal("100.00")),
+                (LedgerEntry.KIND_INVEST, Decimal("50.00")),
+                (LedgerEntry.KIND_REFUND, Decimal("-100.00")),
+            ],
+        )
+        self.assertEqual(ledger.position(self.alice.pk, self.listing.pk), 50)
+
+        entry = LedgerEntry.objects.first()
+        self.assertEqual(entry.investment_id, first_pk)  # kept after the refund
+        for write in (
+            entry.save,
+            entry.delete,
+            lambda: LedgerEntry.objects.update(amount=0),
+            lambda: LedgerEntry.objects.all().delete(),
+        ):
+            with self.assertRaises(TypeError):
+                write()
+
+    def test_transfers(self):
+        self.invest(self.alice, "300")
+        ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("120"))
+        self.assertEqual(self.holdings(), (180, 120, 300, {self.listing.pk: 180}))
+        self.assertEqual(
+            LedgerEntry.objects.filter(kind=LedgerEntry.KIND_TRANSFER).count(), 2
+        )
+
+        with self.assertRaises(ledger.InsufficientPosition) as ctx:
+            ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("181"))
+        self.assertEqual(ctx.exception.held, Decimal("180.00"))
+        with self.assertRaises(ValueError):
+            ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("0"))
+
+    def test_snapshot_plus_tail(self):
+        self.invest(self.alice, "100")
+        self.invest(self.bob, "200")
+        ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("40"))
+        self.assertEqual(ledger.take_snapshots(settle=timedelta(0)), 2)
+        self.invest(self.alice, "10")
+        self.invest(self.bob, "5")
+
+        expected = (70, 245, 315, {self.listing.pk: 70})
+        self.assertEqual(self.holdings(), expected)
+        with self.assertNumQueries(1):
+            ledger.position(self.alice.pk, self.listing.pk)
+        with self.assertNumQueries(1):
+            ledger.listing_total(self.listing.pk)
+
+        self.assertEqual(ledger.take_snapshots(settle=timedelta(0)), 2)
+        self.assertEqual(self.holdings(), expected)
+        # nothing new; and fresh entries stay in the tail until they settle
+        self.assertEqual(ledger.take_snapshots(settle=timedelta(0)), 0)
+        self.invest(self.alice, "1")
+        self.assertEqual(ledger.take_snapshots(), 0)
+
+        snapshots = list(
+            PositionSnapshot.objects.order_by("investor_id").values_list(
+                "amount", "through_id"
+            )
+        )
+        call_command("rebuild_positions", settle=0, stdout=StringIO())
+        self.assertEqual(self.holdings(), (71, 245, 316, {self.listing.pk: 71}))
+        last = LedgerEntry.objects.last().pk
+        self.assertEqual(
+            list(
+                PositionSnapshot.objects.order_by("investor_id").values_list(
+                    "amount", "through_id"
+                )
+            ),
+            [(Decimal("71.00"), last), (Decimal("245.00"), last)],
+        )
+        self.assertEqual(snapshots[1], (Decimal("245.00"), last - 1))
+
+    def test_overlapping_snapshot_runs_fold_entries_once(self):
+        self.invest(self.alice, "100")
+        ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("40"))
+        cutoff = ledger.settled_through(timedelta(0))
+        keys = [(self.alice.pk, self.listing.pk), (self.bob.pk, self.listing.pk)]
+        # two runs that found the same pending positions, one after the other
+        self.assertEqual(ledger._roll_forward(keys, cutoff), 2)
+        self.assertEqual(ledger._roll_forward(keys, cutoff), 0)
+        self.assertEqual(self.holdings(), (60, 40, 100, {self.listing.pk: 60}))
+        self.assertEqual(
+            PositionSnapshot.objects.get(investor=self.bob).amount, Decimal("40.00")
+        )
+
+    def test_rebuild_keeps_the_snapshot_rows(self):
+        self.invest(self.alice, "100")
+        ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("40"))
+        other = make_listing(self.listing.seller, target="500.00")
+        Investment.objects.create(investor=self.bob, listing=other, amount=50)
+        LedgerEntry.objects.filter(listing=other).purge()
+        rows = dict(PositionSnapshot.objects.values_list("pk", "listing_id"))
+
+        self.assertEqual(ledger.rebuild_snapshots(settle=timedelta(0)), 2)
+        # the same rows (the positions' locks), recomputed
+        self.assertEqual(
+            dict(PositionSnapshot.objects.values_list("pk", "listing_id")), rows
+        )
+        self.assertEqual(self.holdings(), (60, 40, 100, {self.listing.pk: 60}))
+        self.assertEqual(
+            PositionSnapshot.objects.get(listing=other).amount, Decimal("0.00")
+        )
+
+    def test_lock_takes_a_new_row_if_its_row_was_deleted(self):
+        self.invest(self.alice, "100")
+        gone = PositionSnapshot.objects.get(investor=self.alice)
+        PositionSnapshot.objects.filter(pk=gone.pk).delete()
+        # the row was fetched, then deleted while lock() waited for it
+        rows = [gone, ledger._snapshot_row(self.alice.pk, self.listing.pk)]
+        with mock.patch.object(
+            ledger, "_snapshot_row", side_effect=rows
+        ) as snapshot_row:
+            ledger.lock(self.alice.pk, self.listing.pk)
+        self.assertEqual(snapshot_row.call_count, 2)
+        self.assertEqual(ledger.position(self.alice.pk, self.listing.pk), 100)
+
+    def test_history_is_protected(self):
+        self.invest(self.alice, "100")
+        with self.assertRaises(ProtectedError):
+            self.alice.delete()
+        with self.assertRaises(ProtectedError):
+            self.listing.delete()
+
+
+class PostInvestmentJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("investor@example.com")
+        self.listing = make_listing(self.seller)
+
+    def invest(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Investment.objects.create(
+                investor=self.investor, listing=self.listing, amount=Decimal(amount)
+            )
+
+    def test_side_effects_run_after_commit(self):
+        self.invest("400.00")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, Listing.STATUS_LIVE)
+        self.assertEqual([m.to for m in mail.outbox], [["investor@example.com"]])
+
+        self.invest("600.00")
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.status, Listing.STATUS_FUNDED)
+        self.assertEqual(
+            [m.to for m in mail.outbox][1:],
+            [["investor@example.com"], ["seller@example.com"]],
+        )
+
+    def test_handlers_are_idempotent(self):
+        investment = self.invest("1000.00")
+        sent = len(mail.outbox)
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, payload in [
+                ("investments.notify_investor", {"investment_id": investment.pk}),
+                ("investments.close_funded_listing", {"listing_id": self.listing.pk}),
+                ("investments.notify_seller_funded", {"listing_id": self.listing.pk}),
+            ]:
+                jobs.execute({"name": name, "payload": payload})
+        self.assertEqual(len(mail.outbox), sent)
+
+    def test_rolled_back_work_enqueues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(capacity.CapacityExhausted):
+                Investment.objects.create(
+                    investor=self.investor,
+                    listing=self.listing,
+                    amount=Decimal("1001.00"),
+                )
+        self.assertEqual(callbacks, [])
+        with self.assertRaises(KeyError):
+            jobs.enqueue("investments.no_such_job")
+
+
+_flaky_calls = []
+
+
+@jobs.handler("tests.flaky")
+def _flaky(fail_times):
+    _flaky_calls.append(fail_times)
+    if len(_flaky_calls) <= fail_times:
+        raise RuntimeError("transient")
+
+
+class UnreachableRedisTests(TestCase):
+    def setUp(self):
+        import redis
+
+        self.addCleanup(setattr, jobs, "_client", jobs._client)
+        jobs._client = redis.Redis(port=1, socket_connect_timeout=0.1)
+
+    @override_settings(JOBS_BACKEND="redis")
+    def test_enqueue_failure_is_logged_not_raised(self):
+        with self.assertLogs("core.jobs", "ERROR") as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                job_id = jobs.enqueue("tests.flaky", fail_times=0)
+        self.assertIn(f"Could not enqueue job {job_id} (tests.flaky)", logs.output[0])
+        self.assertIn('"fail_times": 0', logs.output[0])
+
+
+@unittest.skipUnless(settings.REDIS_URL, "needs a Redis server (REDIS_URL)")
+@override_settings(JOBS_BACKEND="redis", JOBS_RETRY_BACKOFF=0, JOBS_MAX_ATTEMPTS=3)
+class RedisWorkerTests(TestCase):
+    def setUp(self):
+        self.client = jobs.get_client()
+        self.client.delete(jobs.QUEUE_KEY, jobs.DELAYED_KEY, jobs.DEAD_KEY)
+        _flaky_calls.clear()
+        self.worker = jobs.Worker(name="test-worker")
+
+    def test_retries_then_dead_letters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue("tests.flaky", fail_times=2)
+        self.assertEqual(self.worker.run(burst=True, timeout=0.1), 3)
+        self.assertEqual(self.worker.stats, {"succeeded": 1, "retried": 2, "dead": 0})
+
+        _flaky_calls.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue("tests.flaky", fail_times=5)
+        self.worker.run(burst=True, timeout=0.1)
+        self.assertEqual(self.client.llen(jobs.DEAD_KEY), 1)
+        self.assertEqual(jobs.retry_dead(), 1)
+        self.worker.run(burst=True, timeout=0.1)
+        self.assertEqual(len(_flaky_calls), 6)
+
+    def test_recovers_jobs_held_by_a_crashed_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue("tests.flaky", fail_times=0)
+        self.client.lmove(jobs.QUEUE_KEY, self.worker.processing_key)
+        self.assertEqual(self.worker.recover(), 1)
+        self.assertEqual(self.worker.run(burst=True, timeout=0.1), 1)
+
+
+class InvestmentAnnotationTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user("seller@example.com")
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(f"{name}@example.com")
+            for name in ("alice", "bob", "carol")
+        )
+        self.a = make_listing(
+            seller, asset_value=Decimal("1000.00"), seller_retain_percent=Decimal("0")
+        )
+        self.b = make_listing(
+            seller, asset_value=Decimal("3000.00"), seller_retain_percent=Decimal("0")
+        )
+        for investor, listing, amount in [
+            (self.alice, self.a, "100.00"),
+            (self.bob, self.a, "200.00"),
+            (self.carol, self.a, "150.00"),
+            (self.alice, self.a, "50.00"),
+            (self.alice, self.b, "30.00"),
+        ]:
+            Investment.objects.create(
+                investor=investor, listing=listing, amount=Decimal(amount)
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_computed_fields_and_summary(self):
+        data = self.client.get("/api/investments/").data
+        self.assertEqual(
+            [
+                (
+                    row["listing"],
+                    row["ownership_percent"],
+                    row["listing_percent_funded"],
+                    row["investor_rank"],
+                )
+                for row in data["results"]
+            ],
+            [
+                # by alice's position in the listing: 100 + 50 in a
+                (self.b.pk, "1.00", "1.00", 1),
+                (self.a.pk, "15.00", "50.00", 2),  # bob ahead, tied with carol
+                (self.a.pk, "15.00", "50.00", 2),
+            ],
+        )
+        self.assertEqual(data["summary"], {"total_invested": "180.00", "listings": 2})
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        counts = []
+        for page_size in (1, 3):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get("/api/investments/", {"page_size": page_size})
+            self.assertEqual(len(res.data["results"]), page_size)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+        # later pages carry the same summary; past the end it's queried
+        res = self.client.get("/api/investments/", {"page_size": 2})
+        nxt = self.client.get(res.data["next"])
+        self.assertEqual(nxt.data["summary"], res.data["summary"])
+        Investment.objects.filter(pk=nxt.data["results"][0]["id"]).get().delete()
+        res = self.client.get(res.data["next"])
+        self.assertEqual(res.data["results"], [])
+        self.assertEqual(res.data["summary"], {"total_invested": "80.00", "listings": 2})
+
+    def test_summary_is_part_of_the_etag(self):
+        etag = self.client.get("/api/investments/", {"page_size": 1})["ETag"]
+        # an older investment goes away: the page is the same, the totals not
+        Investment.objects.filter(investor=self.alice).order_by("pk").first().delete()
+        res = self.client.get(
+            "/api/investments/", {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["summary"]["total_invested"], "80.00")
+
+    def test_create_returns_the_computed_fields(self):
+        res = self.client.post(
+            "/api/investments/", {"listing": self.a.pk, "amount": "100.00"}
+        )
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(res.data["ownership_percent"], "25.00")
+        self.assertEqual(res.data["listing_percent_funded"], "60.00")
+        self.assertEqual(res.data["investor_rank"], 1)
+
+
+class FastListTests(TestCase):
+    """core.fastlist must render exactly what InvestmentSerializer does."""
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("investor@example.com")
+        valued = make_listing(
+            seller,
+            asset_value=Decimal("3000.00"),
+            seller_retain_percent=Decimal("0.00"),
+        )
+        Listing.objects.filter(pk=valued.pk).update(title='Odd \u2028 "title"')
+        unvalued = make_listing(seller)  # no asset_value
+        for listing, amount in [
+            (valued, "10.00"),
+            (valued, "33.33"),
+            (valued, "1000.01"),
+            (unvalued, "12.50"),
+        ]:
+            Investment.objects.create(
+                investor=self.investor, listing=listing, amount=Decimal(amount)
+            )
+
+    def test_rows_match_serializer(self):
+        queryset = portfolio.annotate_investments(
+            Investment.objects.filter(investor=self.investor)
+            .select_related("listing")
+            .order_by("pk"),
+            self.investor,
+        )
+        slow = InvestmentSerializer(queryset, many=True).data
+        plan = compile_plan(InvestmentSerializer(), queryset.query.annotations)
+        fast = plan.rows(queryset.values(*plan.columns))
+        self.assertEqual(
+            [list(row.items()) for row in fast], [list(row.items()) for row in slow]
+        )
+        self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(slow))
+
+    def test_responses_match_serializer(self):
+        client = APIClient()
+        client.force_login(self.investor)
+        for params in ({}, {"page_size": 3}):
+            with self.subTest(params=params):
+                with override_settings(FAST_LIST_SERIALIZATION=True):
+                    fast = client.get("/api/investments/", params)
+                with override_settings(FAST_LIST_SERIALIZATION=False):
+                    slow = client.get("/api/investments/", params)
+                self.assertIs(type(fast.data["results"]), list)
+                self.assertEqual(fast["ETag"], slow["ETag"])
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast.content, JSONRenderer().render(slow.data))
+
+
+@unittest.skipUnless("replica" in settings.DATABASES, "needs DJANGO_DB=sqlite")
+@override_settings(DATABASE_REPLICAS=["replica"], REPLICA_CHECK_INTERVAL=60)
+class ReadReplicaTests(TestCase):
+    # (the runner sets up every declared database, even for skipped tests)
+    databases = {"default", "replica"} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        replicas.health.reset()
+        self.seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("investor@example.com")
+        self.listing = make_listing(self.seller)
+        self.invest("100.00")
+        # the replica has everything up to here; the next write lags behind
+        for model in (User, Listing, Investment):
+            model.objects.using("replica").bulk_create(model.objects.all())
+        self.invest("50.00")
+
+    def invest(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(
+                investor=self.investor, listing=self.listing, amount=Decimal(amount)
+            )
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_login(user)
+        return client
+
+    def test_safe_reads_use_the_replica(self):
+        client = self.client_for(self.investor)
+        self.assertEqual(len(client.get("/api/investments/").json()["results"]), 1)
+        res = client.get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.json()["total_invested"], "100.00")
+        self.assertNotIn(replicas.PIN_COOKIE, res.cookies)
+
+    def test_async_reads_use_the_replica(self):
+        client = AsyncClient()
+        client.force_login(self.investor)
+        with override_settings(ROOT_URLCONF="core.asgi_urls"):
+            res = async_to_sync(client.get)("/api/investments/")
+        self.assertEqual(len(res.json()["results"]), 1)
+
+    def test_writers_read_their_writes(self):
+        client = self.client_for(self.investor)
+        res = client.post(
+            "/api/investments/", {"listing": self.listing.pk, "amount": "25.00"}
+        )
+        self.assertEqual(res.status_code, 201)
+        self.assertNotIn(replicas.PIN_COOKIE, res.cookies)
+        self.assertEqual(len(client.get("/api/investments/").json()["results"]), 3)
+        res = client.get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.json()["total_invested"], "175.00")
+
+        # the pin is the user's: their other devices read from the primary
+        # too, on both paths, while other users still read from the replica
+        other_device = self.client_for(self.investor)
+        res = other_device.get("/api/investments/")
+        self.assertEqual(len(res.json()["results"]), 3)
+        async_device = AsyncClient()
+        async_device.force_login(self.investor)
+        with override_settings(ROOT_URLCONF="core.asgi_urls"):
+            res = async_to_sync(async_device.get)("/api/investments/")
+        self.assertEqual(len(res.json()["results"]), 3)
+        other_user = self.client_for(self.seller)
+        res = other_user.get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.json()["total_invested"], "100.00")
+
+        # a failed write doesn't pin
+        res = other_user.post(
+            "/api/investments/", {"listing": self.listing.pk, "amount": "1.00"}
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertIsNone(cache.get(replicas.pin_key(self.seller.pk)))
+
+    def test_anonymous_writers_are_pinned_by_cookie(self):
+        res = APIClient().post("/api/auth/logout")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(replicas.PIN_COOKIE, res.cookies)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        client = self.client_for(self.investor)
+        with override_settings(REPLICA_MAX_LAG=-1):
+            self.assertEqual(
+                len(client.get("/api/investments/").json()["results"]), 2
+            )
+            # the verdict holds until the next check is due
+        self.assertEqual(len(client.get("/api/investments/").json()["results"]), 2)
+        with override_settings(REPLICA_CHECK_INTERVAL=0):
+            self.assertEqual(
+                len(client.get("/api/investments/").json()["results"]), 1
+            )
+
+    def test_uncaught_errors_end_the_replica_read(self):
+        class Failing(replicas.ReplicaReadsMixin, APIView):
+            def get(self, request):
+                raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            Failing.as_view()(APIRequestFactory().get("/"))
+        self.assertIsNone(replicas._replica_read.get())
+
+    def test_anonymous_cache_is_built_from_the_primary(self):
+        res = APIClient().get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.json()["total_invested"], "150.00")
+
+
+class OrderBookTests(TestCase):
+    def test_price_time_priority_and_partial_fills(self):
+        book = orderbook.OrderBook()
+        for order in (
+            BookOrder(1, "a", SELL, 101, 5),
+            BookOrder(2, "b", SELL, 100, 3),
+            BookOrder(3, "c", SELL, 100, 4),
+        ):
+            self.assertEqual(book.submit(order), ([], []))
+
+        taker = BookOrder(4, "d", BUY, 100, 5)
+        fills, _ = book.submit(taker)
+        self.assertEqual(fills, [Fill(2, "b", 100, 3), Fill(3, "c", 100, 2)])
+        self.assertEqual(taker.remaining, 0)
+        self.assertEqual(
+            book.snapshot(), [(3, "c", SELL, 100, 2), (1, "a", SELL, 101, 5)]
+        )
+
+        # sweeps both levels at the makers' prices, then rests the rest
+        fills, _ = book.submit(BookOrder(5, "d", BUY, 102, 10))
+        self.assertEqual(fills, [Fill(3, "c", 100, 2), Fill(1, "a", 101, 5)])
+        self.assertEqual(book.snapshot(), [(5, "d", BUY, 102, 3)])
+        self.assertEqual((book.best_bid(), book.best_ask()), (102, None))
+
+    def test_market_orders_and_self_trades(self):
+        book = orderbook.OrderBook()
+        book.submit(BookOrder(1, "a", BUY, 99, 5))
+        book.submit(BookOrder(2, "b", BUY, 98, 5))
+        book.submit(BookOrder(3, "a", BUY, 98, 1))
+
+        taker = BookOrder(4, "b", SELL, None, 20)
+        fills, cancelled = book.submit(taker)
+        self.assertEqual(fills, [Fill(1, "a", 99, 5), Fill(3, "a", 98, 1)])
+        self.assertEqual(cancelled, [2])  # b's own bid
+        self.assertEqual(taker.remaining, 14)  # dropped, not rested
+        self.assertEqual(book.snapshot(), [])
+        self.assertIsNone(book.cancel(4))
+
+    def test_replay_is_deterministic(self):
+        def commands(count, first_id=1):
+            rng = random.Random(7)
+            result = []
+            flow = order_flow(rng, count, 10, spread=20, max_quantity=50)
+            for order_id, (investor, side, price, quantity) in enumerate(
+                flow, first_id
+            ):
+                result.append(
+                    ("place", BookOrder(order_id, investor, side, price, quantity))
+                )
+                if order_id % 10 == 0:
+                    result.append(("cancel", rng.randint(first_id, order_id)))
+            return result
+
+        def outcome(results):
+            return [
+                (taker, [fill.key() for fill in fills], cancelled)
+                for taker, fills, cancelled in results
+            ]
+
+        book, results = orderbook.replay(commands(2000))
+        again, results_again = orderbook.replay(commands(2000))
+        self.assertEqual(outcome(results), outcome(results_again))
+        self.assertEqual(book.snapshot(), again.snapshot())
+        self.assertTrue(any(fills for _, fills, _ in results))
+
+        # a book rebuilt from the resting orders alone carries on the same
+        recovered = orderbook.OrderBook()
+        for order_id, investor, side, price, remaining in sorted(book.snapshot()):
+            recovered.rest(BookOrder(order_id, investor, side, price, remaining))
+        self.assertEqual(recovered.snapshot(), book.snapshot())
+        for (_, order), (_, copy) in zip(commands(500, 5001), commands(500, 5001)):
+            if isinstance(order, BookOrder):
+                self.assertEqual(
+                    outcome([(order.id, *book.submit(order))]),
+                    outcome([(copy.id, *recovered.submit(copy))]),
+                )
+        self.assertEqual(recovered.snapshot(), book.snapshot())
+
+    def test_engine_benchmark(self):
+        report = engine_benchmark(2000, 10)
+        self.assertEqual(report["orders"], 2000)
+        self.assertGreater(report["trades"], 0)
+        self.assertGreater(report["orders_per_second"], 0)
+
+
+class TradingTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user("seller@example.com")
+        self.alice = User.objects.create_user("alice@example.com")
+        self.bob = User.objects.create_user("bob@example.com")
+        self.carol = User.objects.create_user("carol@example.com")
+        self.listing = make_listing(seller)
+        Investment.objects.create(
+            investor=self.alice, listing=self.listing, amount=Decimal("300.00")
+        )
+        self.bobs = Investment.objects.create(
+            investor=self.bob, listing=self.listing, amount=Decimal("200.00")
+        )
+
+    def place(self, investor, side, kind, quantity, price=None):
+        return trading.place_order(
+            investor.pk,
+            self.listing.pk,
+            side,
+            kind,
+            Decimal(quantity),
+            None if price is None else Decimal(price),
+        )
+
+    def position(self, investor):
+        return ledger.position(investor.pk, self.listing.pk)
+
+    def test_trades_transfer_ownership(self):
+        sell, _ = self.place(
+            self.alice, Order.SIDE_SELL, Order.KIND_LIMIT, "100", "1.10"
+        )
+        buy, trades = self.place(self.carol, Order.SIDE_BUY, Order.KIND_MARKET, "60")
+
+        self.assertEqual(
+            [(t.seller_id, t.buyer_id, t.price, t.quantity) for t in trades],
+            [(self.alice.pk, self.carol.pk, Decimal("1.10"), Decimal("60.00"))],
+        )
+        self.assertEqual(self.position(self.alice), Decimal("240.00"))
+        self.assertEqual(self.position(self.carol), Decimal("60.00"))
+        sell.refresh_from_db()
+        self.assertEqual((sell.status, sell.remaining), ("open", Decimal("40.00")))
+        self.assertEqual((buy.status, buy.remaining), ("filled", Decimal("0.00")))
+
+        # 240 held, 40 of it already offered
+        with self.assertRaises(ledger.InsufficientPosition) as ctx:
+            self.place(self.alice, Order.SIDE_SELL, Order.KIND_LIMIT, "250", "1.00")
+        self.assertEqual(ctx.exception.held, Decimal("200.00"))
+
+        # a market order's unmatched remainder is cancelled
+        buy, trades = self.place(self.carol, Order.SIDE_BUY, Order.KIND_MARKET, "100")
+        self.assertEqual([t.quantity for t in trades], [Decimal("40.00")])
+        self.assertEqual((buy.status, buy.remaining), ("cancelled", Decimal("60.00")))
+        self.assertEqual(trading.verify(self.listing.pk), [])
+
+    def test_persisted_orders_replay_to_the_same_book(self):
+        investors = [self.alice, self.bob, self.carol]
+        rng = random.Random(3)
+        flow = order_flow(rng, 80, len(investors), mid=100, spread=5, max_quantity=4000)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, (investor, side, price, quantity) in enumerate(flow):
+                try:
+                    order, _ = self.place(
+                        investors[investor],
+                        side,
+                        Order.KIND_MARKET if price is None else Order.KIND_LIMIT,
+                        Decimal(quantity).scaleb(-2),
+                        None if price is None else Decimal(price).scaleb(-2),
+                    )
+                except ledger.InsufficientPosition:
+                    continue
+                if i % 7 == 0:
+                    trading.cancel_order(order.pk)
+
+        self.assertTrue(Trade.objects.exists())
+        self.assertEqual(trading.verify(self.listing.pk), [])
+        # the book this process kept matches the recovered one
+        sequence, book = trading._books[self.listing.pk]
+        self.assertEqual(sequence, BookSequence.objects.get().sequence)
+        self.assertEqual(book.snapshot(), trading.recover(self.listing.pk).snapshot())
+        # and ownership only moved
+        total = sum(self.position(i) for i in investors)
+        self.assertEqual(total, Decimal("500.00"))
+
+    def test_short_seller_is_cancelled(self):
+        sell, _ = self.place(self.bob, Order.SIDE_SELL, Order.KIND_LIMIT, "150", "1")
+        self.bobs.delete()  # refunded: bob holds nothing now
+
+        buy, trades = self.place(
+            self.carol, Order.SIDE_BUY, Order.KIND_LIMIT, "50", "1.00"
+        )
+        self.assertEqual(trades, [])
+        self.assertEqual((buy.status, buy.remaining), ("open", Decimal("50.00")))
+        sell.refresh_from_db()
+        self.assertEqual(sell.status, "cancelled")
+        self.assertEqual((sell.cancel_sequence, buy.sequence), (2, 3))
+        self.assertEqual(trading.verify(self.listing.pk), [])
+
+    def test_refunds_are_limited_to_what_is_held(self):
+        self.place(self.bob, Order.SIDE_SELL, Order.KIND_LIMIT, "150", "1")
+        self.place(self.carol, Order.SIDE_BUY, Order.KIND_MARKET, "150")
+        with self.assertRaises(ledger.InsufficientPosition) as ctx:
+            self.bobs.delete()
+        self.assertEqual(ctx.exception.held, Decimal("50.00"))
+
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        res = client.delete(f"/api/investments/{self.bobs.pk}/")
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Only 50.00 ", res.data["detail"])
+        self.assertTrue(Investment.objects.filter(pk=self.bobs.pk).exists())
+        self.assertEqual(self.position(self.bob), Decimal("50.00"))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("500.00"))
+
+    def test_trades_show_in_ownership_reads(self):
+        self.listing.asset_value = Decimal("1000.00")
+        self.listing.save()
+        alice, carol = APIClient(), APIClient()
+        alice.force_authenticate(self.alice)
+        carol.force_authenticate(self.carol)
+        res = alice.get("/api/investments/")
+        etag = res["ETag"]
+        self.assertEqual(
+            (res.data["results"][0]["ownership_percent"], res.data["summary"]),
+            ("30.00", {"total_invested": "300.00", "listings": 1}),
+        )
+        self.assertEqual(res.data["results"][0]["investor_rank"], 1)
+        alice.get("/api/auth/portfolio")  # cached
+        carol.get("/api/auth/portfolio")
+        # an empty page can't be revalidated: its summary isn't in its rows
+        self.assertNotIn("ETag", carol.get("/api/investments/"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place(self.alice, Order.SIDE_SELL, Order.KIND_LIMIT, "150", "1")
+            self.place(self.carol, Order.SIDE_BUY, Order.KIND_MARKET, "150")
+
+        res = alice.get("/api/investments/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        row = res.data["results"][0]
+        self.assertEqual((row["ownership_percent"], row["investor_rank"]), ("15.00", 2))
+        self.assertEqual(
+            res.data["summary"], {"total_invested": "150.00", "listings": 1}
+        )
+        portfolio = alice.get("/api/auth/portfolio").data
+        self.assertEqual(portfolio["totals"]["total_invested"], "150.00")
+
+        # the buyer holds a position without having invested
+        self.assertEqual(
+            carol.get("/api/investments/").data["summary"],
+            {"total_invested": "150.00", "listings": 1},
+        )
+        position = carol.get("/api/auth/portfolio").data["positions"][0]
+        self.assertEqual(
+            (
+                position["total_invested"],
+                position["ownership_percent"],
+                position["investments"],
+            ),
+            ("150.00", "15.00", 0),
+        )
+
+    def test_persisted_benchmark(self):
+        report = persisted_benchmark(self.listing, [self.alice, self.bob], 40)
+        self.assertEqual(report["accepted"] + report["rejected"], 40)
+        self.assertTrue(report["replay_matches"])
+
+    def test_orders_api(self):
+        alice, carol = APIClient(), APIClient()
+        alice.force_authenticate(self.alice)
+        carol.force_authenticate(self.carol)
+        order = {"listing": self.listing.pk, "side": "sell", "kind": "limit"}
+
+        res = alice.post("/api/orders/", {**order, "price": "1.25", "quantity": "50"})
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual((res.data["status"], res.data["trades"]), ("open", []))
+        sell_id = res.data["id"]
+
+        market_buy = {"side": "buy", "kind": "market", "quantity": "20"}
+        res = carol.post("/api/orders/", {**order, **market_buy})
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(res.data["status"], "filled")
+        self.assertEqual(
+            [(t["price"], t["quantity"]) for t in res.data["trades"]],
+            [("1.25", "20.00")],
+        )
+
+        res = carol.get("/api/orders/book/", {"listing": self.listing.pk})
+        self.assertEqual(
+            res.json()["asks"], [{"price": "1.25", "quantity": "30.00", "orders": 1}]
+        )
+        self.assertEqual(res.json()["bids"], [])
+
+        bad = [
+            {**order, "kind": "market", "price": "1.00", "quantity": "5"},
+            {**order, "price": "0", "quantity": "5"},
+            {**order, "price": "1.00", "quantity": "500"},  # holds 300
+        ]
+        for data in bad:
+            self.assertEqual(alice.post("/api/orders/", data).status_code, 400)
+
+        self.assertEqual(carol.delete(f"/api/orders/{sell_id}/").status_code, 404)
+        self.assertEqual(alice.delete(f"/api/orders/{sell_id}/").status_code, 204)
+        self.assertEqual(alice.delete(f"/api/orders/{sell_id}/").status_code, 400)
+        self.assertEqual(len(alice.get("/api/orders/").json()["results"]), 1)
 
-# Create your tests here.
@@ -0,0 +1,293 @@
+"""
+The secondary market: investors trade parts of their positions through a
+per-listing order book (investments/orderbook.py).
+
+Every command on a listing's book, placing or cancelling an order, takes
+the next number from its BookSequence row while holding that row's lock,
+so commands run one at a time per listing across processes. The order
+and its trades are saved, and each trade is published as a ledger
+transfer from seller to buyer (ledger.transfer), in the same transaction.
+Both parties' cached portfolios are dropped when it commits; their
+investment lists read positions from the ledger, ETags included.
+Prices and quantities are cents to the engine.
+
+The matching itself runs in memory. A process keeps each listing's book
+with the sequence number it is current through, and uses it only if that
+is still the row's number; otherwise (after a restart, or after another
+process ran a command) it recovers the book by replaying the listing's
+resting orders in sequence order. A book is handed back for reuse when
+its command commits, so a rolled-back command can't leave it ahead of
+the database. `replay()` re-runs every command from the start; it gives
+the same trades and the same book, which is what `verify()` checks.
+
+A sell order can only offer what the investor holds beyond their other
+open sell orders. If a resting seller's position shrinks anyway (a
+refund), the trade's transfer fails: that order is cancelled, as its own
+command, and the incoming order is matched again. Payment for trades is
+settled outside this app.
+"""
+
+from decimal import Decimal
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from . import ledger, orderbook, portfolio
+from .models import BookSequence, Order, Trade
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+# listing id -> (sequence, OrderBook), for this process
+_books = {}
+
+
+class _MakerShort(Exception):
+    def __init__(self, order_id):
+        self.order_id = order_id
+        super().__init__(f"Order {order_id} sells more than its investor holds.")
+
+
+def _cents(amount):
+    return None if amount is None else int(amount * 100)
+
+
+def _amount(cents):
+    return Decimal(cents).scaleb(-2).quantize(CENT)
+
+
+def _book_order(order, remaining=None):
+    return orderbook.BookOrder(
+        order.pk,
+        order.investor_id,
+        order.side,
+        _cents(order.price),
+        _cents(order.remaining if remaining is None else remaining),
+    )
+
+
+def _lock(listing_id):
+    """The listing's BookSequence row, locked for the transaction."""
+    BookSequence.objects.get_or_create(listing_id=listing_id)
+    return BookSequence.objects.select_for_update().get(listing_id=listing_id)
+
+
+def _take_book(listing_id, sequence):
+    # Taken out of _books for the command; put back on commit
+    cached = _books.pop(listing_id, None)
+    if cached is not None and cached[0] == sequence:
+        return cached[1]
+    return recover(listing_id)
+
+
+def _advance(state, book):
+    state.sequence += 1
+    state.save(update_fields=["sequence"])
+    listing_id, sequence = state.listing_id, state.sequence
+    transaction.on_commit(lambda: _books.__setitem__(listing_id, (sequence, book)))
+    return sequence
+
+
+def available(investor_id, listing_id):
+    """What the investor can still offer: held, less their open sell orders."""
+    offered = Order.objects.filter(
+        investor_id=investor_id,
+        listing_id=listing_id,
+        side=Order.SIDE_SELL,
+        status=Order.STATUS_OPEN,
+    ).aggregate(total=Sum("remaining"))["total"]
+    return ledger.position(investor_id, listing_id) - (offered or 0)
+
+
+def place_order(investor_id, listing_id, side, kind, quantity, price=None):
+    """
+    Place an order and match it. Returns (order, [Trade]); raises
+    ledger.InsufficientPosition if a sell order offers more than is
+    available.
+    """
+    while True:
+        try:
+            return _place(investor_id, listing_id, side, kind, quantity, price)
+        except _MakerShort as short:
+            cancel_order(short.order_id)
+
+
+def _place(investor_id, listing_id, side, kind, quantity, price):
+    with transaction.atomic():
+        state = _lock(listing_id)
+        if side == Order.SIDE_SELL:
+            free = available(investor_id, listing_id)
+            if free < quantity:
+                raise ledger.InsufficientPosition(max(free, ZERO))
+        book = _take_book(listing_id, state.sequence)
+        order = Order.objects.create(
+            listing_id=listing_id,
+            investor_id=investor_id,
+            side=side,
+            kind=kind,
+            price=price if kind == Order.KIND_LIMIT else None,
+            quantity=quantity,
+            remaining=quantity,
+            sequence=state.sequence + 1,
+        )
+        taker = _book_order(order)
+        fills, self_trades = book.submit(taker)
+        trades = _settle(order, fills)
+
+        order.remaining = _amount(taker.remaining)
+        if not taker.remaining:
+            order.status = Order.STATUS_FILLED
+        elif kind == Order.KIND_MARKET:
+            order.status = Order.STATUS_CANCELLED  # the unmatched remainder
+        order.save(update_fields=["remaining", "status", "updated_at"])
+        if self_trades:
+            Order.objects.filter(pk__in=self_trades).update(
+                status=Order.STATUS_CANCELLED, updated_at=timezone.now()
+            )
+        _advance(state, book)
+    return order, trades
+
+
+def _settle(taker, fills):
+    """Save the fills as trades, transfer the positions and update the makers."""
+    makers = Order.objects.in_bulk([fill.maker_id for fill in fills])
+    now = timezone.now()
+    trades = []
+    for fill in fills:
+        maker = makers[fill.maker_id]
+        quantity = _amount(fill.quantity)
+        maker.remaining -= quantity
+        if not maker.remaining:
+            maker.status = Order.STATUS_FILLED
+        maker.updated_at = now
+        buy, sell = (taker, maker) if taker.side == Order.SIDE_BUY else (maker, taker)
+        try:
+            ledger.transfer(
+                taker.listing_id, sell.investor_id, buy.investor_id, quantity
+            )
+        except ledger.InsufficientPosition:
+            if sell is maker:
+                raise _MakerShort(maker.pk)
+            raise
+        trades.append(
+            Trade(
+                listing_id=taker.listing_id,
+                buy_order=buy,
+                sell_order=sell,
+                buyer_id=buy.investor_id,
+                seller_id=sell.investor_id,
+                price=_amount(fill.price),
+                quantity=quantity,
+                sequence=taker.sequence,
+            )
+        )
+    if makers:
+        Order.objects.bulk_update(
+            list(makers.values()), ["remaining", "status", "updated_at"]
+        )
+    for investor_id in {t.buyer_id for t in trades} | {t.seller_id for t in trades}:
+        transaction.on_commit(partial(portfolio.invalidate, investor_id))
+    return Trade.objects.bulk_create(trades)
+
+
+def cancel_order(order_id):
+    """Cancel an open order; returns it, or None if it wasn't open."""
+    listing_id = Order.objects.values_list("listing_id", flat=True).get(pk=order_id)
+    with transaction.atomic():
+        state = _lock(listing_id)
+        order = Order.objects.get(pk=order_id)
+        if order.status != Order.STATUS_OPEN:
+            return None
+        book = _take_book(listing_id, state.sequence)
+        book.cancel(order.pk)
+        order.status = Order.STATUS_CANCELLED
+        order.cancel_sequence = _advance(state, book)
+        order.save(update_fields=["status", "cancel_sequence", "updated_at"])
+    return order
+
+
+def recover(listing_id):
+    """The listing's book, from its resting orders in sequence order."""
+    book = orderbook.OrderBook()
+    resting = Order.objects.filter(
+        listing_id=listing_id, status=Order.STATUS_OPEN
+    ).order_by("sequence")
+    for order in resting:
+        book.rest(_book_order(order))
+    return book
+
+
+def replay(listing_id):
+    """
+    Re-run every command on the listing's book from the start, as
+    orderbook.replay() does: returns (book, results).
+    """
+    orders = list(Order.objects.filter(listing_id=listing_id).order_by("sequence"))
+    commands = [(o.sequence, "place", _book_order(o, o.quantity)) for o in orders]
+    commands += [
+        (o.cancel_sequence, "cancel", o.pk)
+        for o in orders
+        if o.cancel_sequence is not None
+    ]
+    commands.sort(key=lambda command: command[0])
+    return orderbook.replay((name, arg) for _, name, arg in commands)
+
+
+def verify(listing_id):
+    """
+    The differences between replaying the listing's commands and what was
+    persisted, as [(what, replayed, persisted)]; empty when they agree.
+    """
+    book, results = replay(listing_id)
+    sides = dict(Order.objects.filter(listing_id=listing_id).values_list("pk", "side"))
+    replayed = []
+    for taker, fills, _ in results:
+        for fill in fills:
+            pair = (taker, fill.maker_id)
+            if sides[taker] == Order.SIDE_SELL:
+                pair = pair[::-1]
+            replayed.append((*pair, _amount(fill.price), _amount(fill.quantity)))
+    persisted = list(
+        Trade.objects.filter(listing_id=listing_id)
+        .order_by("id")
+        .values_list("buy_order_id", "sell_order_id", "price", "quantity")
+    )
+    problems = []
+    if replayed != persisted:
+        problems.append(("trades", replayed, persisted))
+    resting = recover(listing_id).snapshot()
+    if book.snapshot() != resting:
+        problems.append(("book", book.snapshot(), resting))
+    return problems
+
+
+def depth(listing_id, levels=10):
+    """The best `levels` prices on each side, with their open quantity."""
+    rows = list(
+        Order.objects.filter(listing_id=listing_id, status=Order.STATUS_OPEN)
+        .order_by()
+        .values("side", "price")
+        .annotate(quantity=Sum("remaining"), orders=Count("id"))
+    )
+
+    def side(name, best_first):
+        ordered = sorted(
+            (row for row in rows if row["side"] == name),
+            key=lambda row: row["price"],
+            reverse=best_first,
+        )
+        return [
+            {
+                "price": f"{row['price']}",
+                "quantity": f"{Decimal(row['quantity']).quantize(CENT)}",
+                "orders": row["orders"],
+            }
+            for row in ordered[:levels]
+        ]
+
+    return {
+        "bids": side(Order.SIDE_BUY, best_first=True),
+        "asks": side(Order.SIDE_SELL, best_first=False),
+    }
@@ -1,7 +1,12 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import InvestmentViewSet
+from .views import InvestmentViewSet, OrderViewSet, export_view
 
 router = DefaultRouter()
 router.register(r"investments", InvestmentViewSet, basename="investment")
+router.register(r"orders", OrderViewSet, basename="order")
 
-urlpatterns = router.urls
+# Before the router, whose "investments/<pk>.<format>" route would also match
+urlpatterns = [
+    path("investments/export.<str:fmt>", export_view),
+] + router.urls
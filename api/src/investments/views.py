@@ -1,21 +1,184 @@
-from rest_framework import viewsets, permissions
-from .models import Investment
-from .serializers import InvestmentSerializer
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.response import Response
+from core import export
+from core.asyncviews import AsyncReadMixin
+from core.conditional import ConditionalGetMixin
+from core.fastlist import FAST_RENDERER_CLASSES, FastListMixin
+from core.replicas import ReplicaReadsMixin
+from . import ledger, portfolio, trading
+from .models import Investment, Order
+from .serializers import InvestmentSerializer, OrderSerializer, TradeSerializer
 
 
-class InvestmentViewSet(viewsets.ModelViewSet):
+class InvestmentViewSet(
+    ReplicaReadsMixin,
+    ConditionalGetMixin,
+    FastListMixin,
+    AsyncReadMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    An investor's investments. There is no update: an amount or listing
+    change would bypass the capacity claim, the ledger and the stats that
+    creating and deleting go through.
+    """
+
     serializer_class = InvestmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+    # Investments are immutable; only the embedded listing fields (funding
+    # moves listing.updated_at too), the position-based fields, which
+    # trades change, and the summary can
+    etag_fields = (
+        "created_at",
+        "listing__updated_at",
+        "ownership_percent",
+        "investor_rank",
+        *portfolio.SUMMARY_FIELDS,
+    )
+    last_modified_fields = ("created_at", "listing__updated_at")
 
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return Investment.objects.none()
-        return (
+        queryset = (
             Investment.objects.filter(investor=user)
             .select_related("listing")
-            .order_by("-created_at")
+            .order_by("-created_at", "-id")
         )
+        # ownership, funding, rank and the summary in the same query
+        return portfolio.annotate_investments(queryset, user)
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if self._summary_missing(response):
+            totals = portfolio.holdings(request.user).aggregate(
+                **portfolio.summary_aggregates()
+            )
+            response.data["summary"] = portfolio.summary(totals)
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        response = await super().alist(request, *args, **kwargs)
+        if self._summary_missing(response):
+            totals = await portfolio.holdings(request.user).aaggregate(
+                **portfolio.summary_aggregates()
+            )
+            response.data["summary"] = portfolio.summary(totals)
+        return response
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        page = self.paginator.page
+        if page:
+            response.data["summary"] = portfolio.summary(page[0])
+        return response
+
+    def _summary_missing(self, response):
+        # An empty page has no row to read the totals from; positions
+        # bought on the market have no Investment rows at all
+        data = getattr(response, "data", None)
+        return isinstance(data, dict) and "results" in data and "summary" not in data
+
+    def validators_for(self, rows, extra=None):
+        # an empty page's summary isn't in its rows, so nothing validates it
+        if not rows:
+            return None
+        return super().validators_for(rows, extra)
 
     def perform_create(self, serializer):
         serializer.save(investor=self.request.user)
+        # read it back with the annotations the response shows
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
+
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ledger.InsufficientPosition as exc:
+            return Response(
+                {
+                    "detail": f"Only {exc.held:.2f} of this position is still held; "
+                    "what was sold can't be refunded."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+
+class OrderViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Secondary-market orders (see investments/trading.py). Placing an order
+    matches it at once; the response lists the trades it made. DELETE
+    cancels an open order.
+    """
+
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Order.objects.filter(investor=self.request.user).order_by(
+            "-created_at", "-id"
+        )
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save(investor=request.user)
+        data = {
+            **serializer.data,
+            "trades": TradeSerializer(order.new_trades, many=True).data,
+        }
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, *args, **kwargs):
+        if trading.cancel_order(self.get_object().pk) is None:
+            return Response(
+                {"detail": "Only open orders can be cancelled."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["get"])
+    def book(self, request):
+        """Open quantity per price for ?listing=<id>, best prices first."""
+        try:
+            listing_id = int(request.query_params.get("listing", ""))
+        except ValueError:
+            return Response(
+                {"listing": "Give a listing id."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"listing": listing_id, **trading.depth(listing_id)})
+
+
+EXPORT_COLUMNS = [
+    ("id", "id"),
+    ("investor_id", "investor_id"),
+    ("investor_email", "investor__email"),
+    ("listing_id", "listing_id"),
+    ("listing_title", "listing__title"),
+    ("listing_status", "listing__status"),
+    ("amount", "amount"),
+    ("created_at", "created_at"),
+]
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def export_view(request, fmt):
+    """Staff-only streaming dump of every investment (see core/export.py)."""
+    qs = export.filter_export(
+        Investment.objects.all(), request.query_params, "listing_id", "listing__status"
+    )
+    return export.export_response(request, qs, EXPORT_COLUMNS, fmt, "investments")
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from . import search
 from .models import Listing
 
 
@@ -6,4 +7,17 @@ from .models import Listing
 class ListingAdmin(admin.ModelAdmin):
     list_display = ("id", "title", "seller", "status", "target_amount", "created_at")
     list_filter = ("status", "category", "created_at")
-    search_fields = ("title", "description", "seller__email")
+    # Title/category/description go through the full-text index instead of
+    # icontains scans; see get_search_results.
+    search_fields = ("=seller__email",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("search_vector")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        by_email, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        return search.matching(queryset, search_term) | by_email, may_have_duplicates
@@ -0,0 +1,68 @@
+"""
+Batch listing creation.
+
+`create_listings()` validates the items with one ListingSerializer(many=True),
+derives every valid item's target_amount in one pass (offered_amounts) and
+inserts them with a single bulk_create in one transaction. Invalid items
+are reported by index and don't stop the rest of the batch.
+
+bulk_create skips Listing.save() and post_save, so this does what those
+would have: target_amount here, the marketplace stats delta, cache
+invalidation after commit. The search index is maintained by database
+triggers either way.
+"""
+
+from operator import itemgetter
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from . import stats
+from .models import Listing, offered_amounts
+from .serializers import ListingSerializer
+from .signals import invalidate_on_commit
+
+MAX_BATCH_SIZE = 500
+NEEDS_VALUE_MESSAGE = (
+    "asset_value and seller_retain_percent are needed to compute target_amount."
+)
+
+
+def create_listings(items, seller, context):
+    """
+    Returns (created listings, errors) where errors is a list of
+    {"index": i, "errors": {...}} for the items that failed validation.
+    """
+    # One ListingSerializer(many=True) for the batch: its fields are built
+    # once, and each item goes through the child's validation as in
+    # ListSerializer.is_valid(), except that a bad item doesn't discard
+    # the rest.
+    serializer = ListingSerializer(data=items, many=True, context=context)
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, serializer.run_child_validation(item)))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.detail})
+
+    targets = offered_amounts(
+        (data.get("asset_value"), data.get("seller_retain_percent"))
+        for _, data in valid
+    )
+    listings = []
+    for (index, data), target in zip(valid, targets):
+        if target is None:
+            # Listing.save() would leave target_amount unset and fail the insert
+            errors.append(
+                {"index": index, "errors": {"asset_value": [NEEDS_VALUE_MESSAGE]}}
+            )
+            continue
+        listings.append(Listing(seller=seller, target_amount=target, **data))
+    errors.sort(key=itemgetter("index"))
+
+    if listings:
+        with transaction.atomic():
+            Listing.objects.bulk_create(listings)
+            stats.listings_added(listings)
+            invalidate_on_commit(*(listing.pk for listing in listings))
+    return listings, errors
@@ -0,0 +1,131 @@
+"""
+Versioned response cache for anonymous listing reads.
+
+Keys embed a version number instead of being deleted on writes:
+
+    listings:list:v<list version>:<hash of host + query params>
+    listings:detail:<id>:v<listing version>
+
+Any listing change bumps the list version (every list page may show it)
+and that listing's own version, so other listings' detail entries stay
+warm. Old entries are never read again and simply expire.
+"""
+
+import asyncio
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+
+LIST_VERSION_KEY = "listings:list:version"
+
+# How long a rebuilding request holds the lock, and how long other requests
+# wait for it before building the response themselves.
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+
+
+def _version_key(listing_id):
+    return f"listings:detail:{listing_id}:version"
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from a clock-based number so a lost (evicted) version can
+        # never line up with entries cached under an older one.
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def list_key(request):
+    params = sorted(
+        (k, v) for k, values in request.query_params.lists() for v in values
+    )
+    raw = f"{request.get_host()}?{urlencode(params)}"
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"listings:list:v{_version(LIST_VERSION_KEY)}:{digest}"
+
+
+def detail_key(listing_id):
+    return f"listings:detail:{listing_id}:v{_version(_version_key(listing_id))}"
+
+
+def invalidate_listings(*listing_ids):
+    _bump(LIST_VERSION_KEY)
+    for listing_id in listing_ids:
+        _bump(_version_key(listing_id))
+
+
+def get_or_build(key, build, timeout=None):
+    """
+    Return the cached value for `key`, building and caching it on a miss.
+
+    Only one request rebuilds a given key at a time (a short-lived lock via
+    cache.add); concurrent misses wait briefly for that result instead of
+    all hitting the database at once.
+    """
+    if timeout is None:
+        timeout = settings.LISTING_CACHE_TIMEOUT
+
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+    # The builder is slow or died; don't make this request wait any longer.
+    return build()
+
+
+async def aget_or_build(key, build, timeout=None):
+    """get_or_build() for the async read path; `build` is a coroutine function."""
+    if timeout is None:
+        timeout = settings.LISTING_CACHE_TIMEOUT
+
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    lock_key = f"{key}:lock"
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = await build()
+            await cache.aset(key, value, timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL)
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+
+    return await build()
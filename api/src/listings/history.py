@@ -0,0 +1,135 @@
+"""
+A listing's funding over time, for charts: /api/listings/<id>/funding-history/.
+
+Points come from the investment ledger (investments/ledger.py), not from
+Investment rows: the ledger is append-only, so once a bucket has closed
+its numbers never change, whereas a refund deletes its Investment and
+would rewrite the past. Invest and refund entries count; transfers move
+holdings between investors and leave the listing's funding alone.
+
+Each point is one bucket (an hour or a day, UTC) with any funding
+activity: the net amount invested in it and the running total at its
+end, both computed in SQL with window functions over the truncated entry
+times. Only the last MAX_BUCKETS points are returned.
+
+Closed buckets are cached without expiry, per listing and bucket size,
+and only extended as more buckets close. A request recomputes just the
+buckets that are still open: a bucket counts as closed once its end is
+ledger.SETTLE in the past, the same margin snapshots allow for entries
+that commit late.
+"""
+
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum, Window
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from core import replicas
+from investments.ledger import SETTLE
+from investments.models import LedgerEntry
+
+BUCKETS = {"1h": "hour", "1d": "day"}
+MAX_BUCKETS = 720
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+FUNDING_KINDS = (LedgerEntry.KIND_INVEST, LedgerEntry.KIND_REFUND)
+
+
+def _key(listing_id, bucket):
+    return f"listings:funding-history:{listing_id}:{bucket}"
+
+
+def _truncate(moment, kind):
+    moment = moment.astimezone(dt_timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    )
+    return moment.replace(hour=0) if kind == "day" else moment
+
+
+def _points(listing_id, kind, since=None, until=None):
+    """
+    [(bucket start, invested, running total)] for the buckets starting in
+    [since, until), oldest first. Totals start from zero at `since`.
+    """
+    start = Trunc("created_at", kind, tzinfo=dt_timezone.utc)
+    entries = LedgerEntry.objects.filter(
+        listing_id=listing_id, kind__in=FUNDING_KINDS
+    ).order_by()
+    if since is not None:
+        entries = entries.filter(created_at__gte=since)
+    if until is not None:
+        entries = entries.filter(created_at__lt=until)
+    # Every entry of a bucket carries the same bucket-wide sums (the
+    # running total's default frame includes the bucket's other entries),
+    # so DISTINCT leaves one row per bucket.
+    rows = (
+        entries.annotate(
+            start=start,
+            invested=Window(Sum("amount"), partition_by=start),
+            total=Window(Sum("amount"), order_by=start.asc()),
+        )
+        .values_list("start", "invested", "total")
+        .distinct()
+        .order_by("-start")[:MAX_BUCKETS]
+    )
+    # SQLite sums decimals as floats
+    return [
+        (start, invested.quantize(CENT), total.quantize(CENT))
+        for start, invested, total in reversed(rows)
+    ]
+
+
+def _shifted(points, base):
+    return [(start, invested, base + total) for start, invested, total in points]
+
+
+def closed_points(listing_id, bucket, now=None):
+    """
+    The closed buckets' points, from the cache, computing (on the primary)
+    only those that closed since it was last extended. Returns
+    (points, end of the last closed bucket).
+    """
+    kind = BUCKETS[bucket]
+    now = now or timezone.now()
+    through = _truncate(now - SETTLE, kind)
+    key = _key(listing_id, bucket)
+    cached = cache.get(key)
+    if cached is not None and cached["through"] >= through:
+        return cached["points"], cached["through"]
+
+    points = cached["points"] if cached is not None else []
+    since = cached["through"] if cached is not None else None
+    base = points[-1][2] if points else ZERO
+    # a lagging replica could miss entries in a bucket cached for good
+    with replicas.primary():
+        new = _points(listing_id, kind, since=since, until=through)
+    points = (points + _shifted(new, base))[-MAX_BUCKETS:]
+    cache.set(key, {"through": through, "points": points}, None)
+    return points, through
+
+
+def funding_history(listing_id, bucket, now=None):
+    """The endpoint's response body; `bucket` is a key of BUCKETS."""
+    points, through = closed_points(listing_id, bucket, now)
+    base = points[-1][2] if points else ZERO
+    open_points = _points(listing_id, BUCKETS[bucket], since=through)
+    points = (points + _shifted(open_points, base))[-MAX_BUCKETS:]
+    return {
+        "bucket": bucket,
+        "points": [
+            {
+                "start": start.isoformat().replace("+00:00", "Z"),
+                "invested": f"{invested}",
+                "total": f"{total}",
+            }
+            for start, invested, total in points
+        ],
+    }
+
+
+def forget(listing_id):
+    """Drop a deleted listing's cached buckets."""
+    cache.delete_many([_key(listing_id, bucket) for bucket in BUCKETS])
@@ -0,0 +1,257 @@
+"""
+Live funding progress over Server-Sent Events.
+
+When an investment is committed (or deleted), `publish_funding()` reads the
+listing's fresh counters and publishes them with the delta on the
+"funding:<listing id>" channel. SSE views subscribe to the channels they
+need and stream each message to the client as a `funding` event, after an
+initial `snapshot` event per listing.
+
+Fan-out is two-level so open streams stay cheap: each process holds one
+pattern subscription to Redis (when REDIS_URL is set) and hands messages
+to its local subscribers, which are just asyncio queues. Without Redis the
+in-process broker does the same within one process (tests, runserver).
+If the Redis subscription fails, the streams it fed end (clients
+reconnect, with a fresh snapshot) and the next stream starts a new one.
+The views are async, so under ASGI an idle stream costs a queue and a
+suspended coroutine rather than a worker thread.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+
+from .models import Listing, percent_funded
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "funding:"
+SNAPSHOT_FIELDS = (
+    "id",
+    "total_invested",
+    "investor_count",
+    "target_amount",
+    "funding_version",
+)
+# reconnect delay hint for EventSource, in milliseconds
+RETRY_MS = 3000
+
+
+def channel(listing_id):
+    return f"{CHANNEL_PREFIX}{listing_id}"
+
+
+def funding_payload(row, delta=Decimal("0.00")):
+    percent = percent_funded(row["total_invested"], row["target_amount"])
+    return {
+        "listing": row["id"],
+        "delta": str(Decimal(delta).quantize(Decimal("0.01"))),
+        "total_invested": str(row["total_invested"]),
+        "investor_count": row["investor_count"],
+        "target_amount": str(row["target_amount"]),
+        "percent_funded": str(percent),
+        "funding_version": row["funding_version"],
+    }
+
+
+def publish_funding(listing_id, delta):
+    """Publish the listing's current funding state; call after commit."""
+    row = Listing.objects.filter(pk=listing_id).values(*SNAPSHOT_FIELDS).first()
+    if row is not None:
+        get_broker().publish(channel(listing_id), json.dumps(funding_payload(row, delta)))
+
+
+def event(name, data):
+    return f"event: {name}\ndata: {data}\n\n"
+
+
+async def stream(listing_ids):
+    """
+    The SSE body for `listing_ids`: a snapshot per listing, then a funding
+    event per committed change, with keepalive comments in between. Ends
+    after FUNDING_STREAM_MAX_AGE seconds; EventSource reconnects by itself
+    and gets a fresh snapshot.
+    """
+    # Subscribe before taking the snapshot so nothing committed in between
+    # is lost; messages the snapshot already covers are dropped by version.
+    sub = await get_broker().subscribe(channel(pk) for pk in listing_ids)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        versions = {}
+        rows = Listing.objects.filter(pk__in=listing_ids).values(*SNAPSHOT_FIELDS)
+        async for row in rows.order_by("pk"):
+            versions[row["id"]] = row["funding_version"]
+            yield event("snapshot", json.dumps(funding_payload(row)))
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.FUNDING_STREAM_MAX_AGE
+        while (left := deadline - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(
+                    sub.get(), min(settings.FUNDING_STREAM_HEARTBEAT, left)
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                return  # the broker lost its feed; the client reconnects
+            payload = json.loads(message)
+            # Publishers read counters after commit, so two commits can
+            # publish the same state or arrive out of order.
+            if payload["funding_version"] <= versions.get(payload["listing"], -1):
+                continue
+            versions[payload["listing"]] = payload["funding_version"]
+            yield event("funding", message)
+    finally:
+        sub.close()
+
+
+# --- brokers ---------------------------------------------------------------
+
+
+class Subscription:
+    """Messages for `channels`, as an async iterator of JSON strings."""
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = set(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=1000)
+        self.ended = False
+
+    def deliver(self, message):
+        # called on self.loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass  # a stuck client; the next message carries full totals anyway
+
+    def end(self):
+        """No more messages will come; get() returns None once drained."""
+        self.ended = True
+        self.deliver(None)
+
+    async def get(self):
+        if self.ended and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub; publish() may be called from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+
+    def publish(self, channel, message):
+        self.dispatch(channel, message)
+
+    def dispatch(self, channel, message):
+        with self._lock:
+            targets = [s for s in self._subscriptions if channel in s.channels]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, message)
+            except RuntimeError:
+                # its event loop is gone
+                self.unsubscribe(sub)
+
+    async def subscribe(self, channels):
+        sub = Subscription(self, channels)
+        with self._lock:
+            self._subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Publishes through Redis; one pattern subscription per event loop feeds
+    LocalBroker's fan-out, however many streams are open.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._listeners = {}  # event loop -> (listener task, subscribed event)
+
+    def publish(self, channel, message):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, message)
+
+    async def subscribe(self, channels):
+        """
+        A Subscription, returned once this loop's listener is subscribed to
+        Redis, so the caller's snapshot can't miss anything published
+        before. Raises ConnectionError if the listener can't subscribe.
+        """
+        loop = asyncio.get_running_loop()
+        listener = self._listeners.get(loop)
+        if listener is None or listener[0].done():
+            subscribed = asyncio.Event()
+            task = loop.create_task(self._listen(loop, subscribed))
+            listener = self._listeners[loop] = (task, subscribed)
+        task, subscribed = listener
+        # added before waiting, so a listener that fails meanwhile ends it
+        sub = await super().subscribe(channels)
+        waiting = loop.create_task(subscribed.wait())
+        await asyncio.wait({task, waiting}, return_when=asyncio.FIRST_COMPLETED)
+        if not subscribed.is_set():
+            waiting.cancel()
+            sub.close()
+            raise ConnectionError("Can't subscribe to funding updates.")
+        return sub
+
+    async def _listen(self, loop, subscribed):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            subscribed.set()
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                self.dispatch(message["channel"].decode(), message["data"].decode())
+        except Exception:
+            logger.exception("Funding subscription to Redis failed")
+        finally:
+            # the streams it fed would wait forever; end them so their
+            # clients reconnect, and the next subscribe() starts over
+            with self._lock:
+                ended = [s for s in self._subscriptions if s.loop is loop]
+            for sub in ended:
+                # after the messages dispatch() has already scheduled
+                loop.call_soon(sub.end)
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = settings.REDIS_URL
+                _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
@@ -0,0 +1,95 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from listings import batch
+from listings.models import Listing
+
+User = get_user_model()
+
+
+def listing_items(count, prefix):
+    return [
+        {
+            "title": f"{prefix} {i}",
+            "description": "batch_create_benchmark test listing",
+            "category": "cards",
+            "asset_value": f"{1000 + i}.00",
+            "seller_retain_percent": "25.00",
+        }
+        for i in range(count)
+    ]
+
+
+def batch_create_benchmark(
+    seller, count, batch_size=batch.MAX_BATCH_SIZE, prefix="bench"
+):
+    """
+    Listings per second created through POST /api/listings/ one at a time
+    and through POST /api/listings/batch/ in `batch_size` chunks, as
+    `seller`, with the same `count` items each way.
+    """
+    client = Client()
+    client.force_login(seller)
+
+    def post(url, data):
+        res = client.post(url, json.dumps(data), content_type="application/json")
+        if res.status_code != 201:
+            raise RuntimeError(f"{url} answered {res.status_code}: {res.content!r}")
+
+    single_items = listing_items(count, f"{prefix} single")
+    started = time.perf_counter()
+    for item in single_items:
+        post("/api/listings/", item)
+    single = time.perf_counter() - started
+
+    batch_items = listing_items(count, f"{prefix} batch")
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        post("/api/listings/batch/", batch_items[start : start + batch_size])
+    batched = time.perf_counter() - started
+
+    return {
+        "listings": count,
+        "batch_size": batch_size,
+        "single": _rate(count, single),
+        "batch": _rate(count, batched),
+        "speedup": round(single / batched, 1) if batched else None,
+    }
+
+
+def _rate(count, seconds):
+    return {
+        "seconds": round(seconds, 3),
+        "listings_per_second": round(count / seconds, 1) if seconds else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark batch listing creation against the single-item endpoint "
+        "(listings per second each way) as JSON. Run against a dev database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=2000)
+        parser.add_argument("--batch-size", type=int, default=batch.MAX_BATCH_SIZE)
+        parser.add_argument(
+            "--keep", action="store_true", help="Don't delete the test data."
+        )
+
+    def handle(self, *args, **opts):
+        stamp = int(time.time())
+        seller = User.objects.create_user(f"batch-seller-{stamp}@example.com")
+        try:
+            report = batch_create_benchmark(
+                seller, opts["listings"], opts["batch_size"], prefix=f"bench {stamp}"
+            )
+        finally:
+            if not opts["keep"]:
+                Listing.objects.filter(seller=seller).delete()
+                seller.delete()
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from listings import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the marketplace stats rollup from Listing, report where "
+        "the incrementally maintained values drifted, and replace them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drift, don't write anything.",
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        drift = stats.verify()
+        for (category, status), field, have, want in drift:
+            self.stdout.write(
+                f"{category or '(none)'}/{status}: {field} {have} -> {want}"
+            )
+        if not dry_run:
+            stats.recompute()
+
+        verb = "found" if dry_run else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} drifted value(s)."))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:03
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_funding_counters(apps, schema_editor):
+    Listing = apps.get_model("listings", "Listing")
+    Investment = apps.get_model("investments", "Investment")
+
+    totals = (
+        Investment.objects.filter(listing=OuterRef("pk"))
+        .order_by()
+        .values("listing")
+    )
+    Listing.objects.update(
+        total_invested=Coalesce(
+            Subquery(totals.annotate(t=Sum("amount")).values("t")),
+            Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        investor_count=Coalesce(
+            Subquery(
+                totals.annotate(c=Count("investor", distinct=True)).values("c")
+            ),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0002_listing_asset_value_listing_seller_retain_percent"),
+        ("investments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="investor_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="listing",
+            name="total_invested",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal("0.00"),
+                editable=False,
+                max_digits=12,
+            ),
+        ),
+        migrations.RunPython(
+            backfill_funding_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_listing_funding_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="capacity_shards",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
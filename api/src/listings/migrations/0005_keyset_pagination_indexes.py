@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0004_listing_capacity_shards"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(fields=["created_at", "id"], name="listing_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["status", "created_at", "id"], name="listing_status_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["seller", "created_at", "id"], name="listing_seller_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0005_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="funding_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
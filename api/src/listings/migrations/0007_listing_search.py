@@ -0,0 +1,78 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:24
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from listings.search import ensure_sqlite_fts
+
+POSTGRES_FORWARD = [
+    """
+    CREATE FUNCTION listings_listing_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.category, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER listings_listing_search_vector_trg
+    BEFORE INSERT OR UPDATE OF title, category, description
+    ON listings_listing
+    FOR EACH ROW EXECUTE FUNCTION listings_listing_search_vector()
+    """,
+    # fire the trigger once for existing rows
+    "UPDATE listings_listing SET title = title",
+    """
+    CREATE INDEX listing_search_idx ON listings_listing
+    USING gin (search_vector)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS listing_search_idx",
+    "DROP TRIGGER IF EXISTS listings_listing_search_vector_trg ON listings_listing",
+    "DROP FUNCTION IF EXISTS listings_listing_search_vector()",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS listings_listing_fts_au",
+    "DROP TRIGGER IF EXISTS listings_listing_fts_ad",
+    "DROP TRIGGER IF EXISTS listings_listing_fts_ai",
+    "DROP TABLE IF EXISTS listings_listing_fts",
+]
+
+
+def forwards(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "postgresql":
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+    elif connection.vendor == "sqlite":
+        ensure_sqlite_fts(connection)
+
+
+def backwards(apps, schema_editor):
+    statements = {"postgresql": POSTGRES_REVERSE, "sqlite": SQLITE_REVERSE}
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0006_listing_funding_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="listing",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:59
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+from core.expressions import Percent
+
+
+def backfill_stats(apps, schema_editor):
+    Listing = apps.get_model("listings", "Listing")
+    CategoryStat = apps.get_model("listings", "CategoryStat")
+    rows = (
+        Listing.objects.order_by()
+        .values("category", "status")
+        .annotate(
+            listings=Count("id"),
+            total_raised=Sum("total_invested"),
+            total_target=Sum("target_amount"),
+            percent_sum=Sum(Percent("total_invested", "target_amount")),
+        )
+    )
+    CategoryStat.objects.bulk_create(
+        CategoryStat(
+            slot=0,
+            **{
+                **row,
+                "percent_sum": Decimal(row["percent_sum"]).quantize(
+                    Decimal("0.000001")
+                ),
+            },
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0007_listing_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(blank=True, max_length=100)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("draft", "Draft"),
+                            ("live", "Live"),
+                            ("funded", "Funded"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("slot", models.PositiveSmallIntegerField()),
+                ("listings", models.IntegerField(default=0)),
+                (
+                    "total_raised",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=16
+                    ),
+                ),
+                (
+                    "total_target",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=16
+                    ),
+                ),
+                (
+                    "percent_sum",
+                    models.DecimalField(
+                        decimal_places=6, default=Decimal("0.00"), max_digits=20
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("category", "status", "slot"),
+                        name="uniq_category_stat_slot",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,55 @@
-from django.conf import settings
-from django.db import models
-from decimal import Decimal
-from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
-from django.db import models
-from django.db.models import Sum
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+
+FUNDING_FIELDS = (
+    "total_invested",
+    "investor_count",
+    "capacity_shards",
+    "funding_version",
+)
+
+# Written by database triggers, never by the ORM (see listings/search.py)
+DB_MAINTAINED_FIELDS = FUNDING_FIELDS + ("search_vector",)
+
+# What a listing contributes to the marketplace stats (listings/stats.py)
+STATS_FIELDS = ("category", "status", "target_amount")
+
+
+def offered_amount(asset_value, seller_retain_percent, default=None):
+    """
+    The target_amount for a listing: the part of `asset_value` offered to
+    investors. Returns `default` unless both inputs are known.
+    """
+    amount = offered_amounts([(asset_value, seller_retain_percent)])[0]
+    return default if amount is None else amount
+
+
+def offered_amounts(pairs):
+    """
+    offered_amount() for many (asset_value, seller_retain_percent) pairs in
+    one pass, e.g. a batch of new listings; None where an input is missing.
+    """
+    hundred, zero, cent = Decimal("100.00"), Decimal("0.00"), Decimal("0.01")
+    return [
+        None
+        if value is None or retain is None
+        else (value * max(hundred - retain, zero) / hundred).quantize(cent)
+        for value, retain in pairs
+    ]
+
+
+def percent_funded(total_invested, target_amount):
+    """How much of `target_amount` is raised, in percent to the cent."""
+    if not target_amount or target_amount == 0:
+        return Decimal("0.00")
+    return (total_invested / target_amount * Decimal("100.00")).quantize(
+        Decimal("0.01")
+    )
+
 
 class Listing(models.Model):
     STATUS_DRAFT = "draft"
@@ -61,34 +106,115 @@ class Listing(models.Model):
         max_length=20, choices=STATUS_CHOICES, default=STATUS_DRAFT
     )
 
+    # Denormalized funding counters. These are maintained by Investment.save()
+    # inside the same transaction as the investment insert (for sharded
+    # listings, folded in just after it commits; see investments.capacity),
+    # and can be rebuilt with `manage.py reconcile_funding`.
+    total_invested = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00"), editable=False
+    )
+    investor_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped on every funding change; part of the listing's ETag
+    funding_version = models.PositiveIntegerField(default=0, editable=False)
+
+    # When > 0, remaining capacity is split across this many
+    # investments.CapacityShard rows (see investments.capacity).
+    capacity_shards = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # Weighted title/category/description tsvector on PostgreSQL, filled by
+    # a trigger and GIN-indexed; always NULL on SQLite, which uses FTS5.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination on (created_at, id), alone and behind the
+            # `status` / `mine` filters
+            models.Index(fields=["created_at", "id"], name="listing_created_idx"),
+            models.Index(
+                fields=["status", "created_at", "id"], name="listing_status_created_idx"
+            ),
+            models.Index(
+                fields=["seller", "created_at", "id"], name="listing_seller_created_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.title} ({self.get_status_display()})"
     
     def save(self, *args, **kwargs):
-        # If we know the full asset value and seller retention,
         # keep target_amount in sync as "amount offered to investors"
-        if self.asset_value is not None and self.seller_retain_percent is not None:
-            for_sale_percent = Decimal("100.00") - self.seller_retain_percent
-            if for_sale_percent < 0:
-                for_sale_percent = Decimal("0.00")
-            self.target_amount = (
-                self.asset_value * for_sale_percent / Decimal("100.00")
-            ).quantize(Decimal("0.01"))
+        self.target_amount = offered_amount(
+            self.asset_value, self.seller_retain_percent, self.target_amount
+        )
 
-        super().save(*args, **kwargs)
+        # The funding counters are written with F() updates by Investment.save()
+        # and the search vector by a trigger, so never write back a (possibly
+        # stale) in-memory copy of them here.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in DB_MAINTAINED_FIELDS
+            ]
 
-    @property
-    def total_invested(self) -> Decimal:
-        agg = self.investments.aggregate(total=Sum("amount"))
-        return agg["total"] or Decimal("0.00")
+        from . import stats
+
+        adding = self._state.adding
+        update_fields = kwargs.get("update_fields")
+        tracks_stats = adding or set(update_fields) & set(STATS_FIELDS)
+        with transaction.atomic():
+            before = None
+            if tracks_stats and not adding:
+                # under the row lock, so a concurrent investment can't move
+                # total_invested between this read and the stats delta
+                before = (
+                    Listing.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values(*STATS_FIELDS, "total_invested")
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            if adding:
+                stats.listings_added([self])
+            elif before is not None:
+                stats.listing_changed(before, self)
 
     @property
     def percent_funded(self) -> Decimal:
-        if not self.target_amount or self.target_amount == 0:
-            return Decimal("0.00")
-        return (self.total_invested / self.target_amount * Decimal("100.00")).quantize(
-            Decimal("0.01")
-        )
+        return percent_funded(self.total_invested, self.target_amount)
+
+
+class CategoryStat(models.Model):
+    """
+    Marketplace rollup for one (category, status), maintained incrementally
+    by listings/stats.py. Each key is spread over a few `slot` rows so
+    concurrent investments don't queue on one row lock; read the sum.
+    """
+
+    category = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=Listing.STATUS_CHOICES)
+    slot = models.PositiveSmallIntegerField()
+    listings = models.IntegerField(default=0)
+    total_raised = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00")
+    )
+    total_target = models.DecimalField(
+        max_digits=16, decimal_places=2, default=Decimal("0.00")
+    )
+    # sum of the listings' percent_funded, for the average
+    percent_sum = models.DecimalField(
+        max_digits=20, decimal_places=6, default=Decimal("0.00")
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "status", "slot"], name="uniq_category_stat_slot"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.category or '-'}/{self.status}#{self.slot}: {self.listings}"
@@ -0,0 +1,131 @@
+"""
+Full-text search over listings.
+
+PostgreSQL keeps a weighted `search_vector` column (title A, category B,
+description C) up to date with a trigger and serves `@@` matches from a GIN
+index. Local SQLite runs use an external-content FTS5 table
+(`listings_listing_fts`) kept in sync by triggers instead, ranked with
+bm25() using the same relative weights. Both are set up in migration 0007.
+
+`search()` adds a `search_rank` annotation where higher is better on both
+backends, so views can order (and keyset-paginate) on it.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+CONFIG = "english"
+FTS_TABLE = "listings_listing_fts"
+# bm25() column weights for (title, category, description)
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+_WORD = re.compile(r"\w+")
+
+
+def matching(queryset, q):
+    """Rows of `queryset` matching the search terms in `q`."""
+    if _is_postgres(queryset):
+        return queryset.filter(search_vector=_pg_query(q))
+    match = _fts_match(q)
+    if match is None:
+        return queryset.none()
+    return queryset.filter(
+        id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)
+        )
+    )
+
+
+def search(queryset, q):
+    """`matching()` plus a `search_rank` annotation (higher is better)."""
+    queryset = matching(queryset, q)
+    if _is_postgres(queryset):
+        rank = SearchRank(F("search_vector"), _pg_query(q))
+    else:
+        table = queryset.model._meta.db_table
+        weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+        # bm25() is "lower is better", so flip it to match ts_rank
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id",
+            (_fts_match(q),),
+            output_field=FloatField(),
+        )
+    return queryset.annotate(search_rank=rank)
+
+
+def _is_postgres(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def _pg_query(q):
+    return SearchQuery(q, search_type="websearch", config=CONFIG)
+
+
+def _fts_match(q):
+    # Quote every word so user input can't use (or break) FTS5 query syntax;
+    # the terms are ANDed like websearch_to_tsquery does.
+    words = _WORD.findall(q)
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words)
+
+
+SQLITE_FTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, category, description,
+        content='listings_listing', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON listings_listing
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, category, description)
+        VALUES (new.id, new.title, new.category, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON listings_listing
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, category, description)
+        VALUES ('delete', old.id, old.title, old.category, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, category, description ON listings_listing
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, category, description)
+        VALUES ('delete', old.id, old.title, old.category, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, category, description)
+        VALUES (new.id, new.title, new.category, new.description);
+    END
+    """,
+]
+SQLITE_FTS_TRIGGERS = {f"{FTS_TABLE}_ai", f"{FTS_TABLE}_ad", f"{FTS_TABLE}_au"}
+
+
+def ensure_sqlite_fts(connection):
+    """
+    Create the FTS5 table and its sync triggers if any are missing, and
+    rebuild the index when they were.
+
+    SQLite migrations that alter listings_listing rebuild the table, which
+    silently drops its triggers, so this also runs after every migrate.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = 'listings_listing'"
+        )
+        if SQLITE_FTS_TRIGGERS <= {name for (name,) in cursor.fetchall()}:
+            return
+        for sql in SQLITE_FTS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
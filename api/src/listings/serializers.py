@@ -1,8 +1,15 @@
 from rest_framework import serializers
-from .models import Listing
+from core.fastlist import Computed
+from core.metrics import TimedSerializerMixin
+from .models import Listing, percent_funded
 
+# for core.fastlist: percent_funded is a property, not a column
+ROW_SOURCES = {
+    "percent_funded": Computed(("total_invested", "target_amount"), percent_funded)
+}
 
-class ListingSerializer(serializers.ModelSerializer):
+
+class ListingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     seller_name = serializers.CharField(source="seller.name", read_only=True)
     seller_email = serializers.EmailField(source="seller.email", read_only=True)
 
@@ -17,6 +24,8 @@ class ListingSerializer(serializers.ModelSerializer):
         read_only=True,
     )
 
+    row_sources = ROW_SOURCES
+
     class Meta:
         model = Listing
         fields = [
@@ -63,3 +72,41 @@ class ListingSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         # normal partial update model.save() will recompute target_amount
         return super().update(instance, validated_data)
+
+
+class ListingSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Compact representation for listing lists (cards / grids): no
+    description or seller details. ListingViewSet uses it by default for
+    list responses; ?fields= switches back to ListingSerializer's fields.
+    """
+
+    total_invested = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        read_only=True,
+    )
+    percent_funded = serializers.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        read_only=True,
+    )
+
+    row_sources = ROW_SOURCES
+
+    class Meta:
+        model = Listing
+        fields = [
+            "id",
+            "title",
+            "category",
+            "asset_value",
+            "seller_retain_percent",
+            "target_amount",
+            "total_invested",
+            "percent_funded",
+            "min_investment",
+            "status",
+            "created_at",
+        ]
+        read_only_fields = fields
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache as listing_cache
+from . import history
+from . import stats
+from .models import Listing
+
+
+def invalidate_on_commit(*listing_ids):
+    # Bump after commit so a concurrent reader can't re-cache the old rows
+    # between our invalidation and the commit.
+    transaction.on_commit(lambda: listing_cache.invalidate_listings(*listing_ids))
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def listing_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.pk)
+
+
+@receiver(post_delete, sender=Listing)
+def listing_deleted(sender, instance, **kwargs):
+    # Here rather than in Listing.delete() so cascades are counted too
+    stats.listing_removed(instance)
+    listing_id = instance.pk
+    transaction.on_commit(lambda: history.forget(listing_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def seller_changed(sender, instance, created, update_fields=None, **kwargs):
+    # Listings embed seller_name / seller_email; logins only touch last_login
+    if created or (update_fields and set(update_fields) <= {"last_login", "password"}):
+        return
+    listing_ids = list(instance.listings.values_list("pk", flat=True))
+    if listing_ids:
+        # Their representations changed, so move their ETag / Last-Modified
+        # along too
+        Listing.objects.filter(pk__in=listing_ids).update(updated_at=Now())
+        invalidate_on_commit(*listing_ids)
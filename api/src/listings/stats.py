@@ -0,0 +1,272 @@
+"""
+Marketplace statistics per (category, status).
+
+Reads come from CategoryStat rollup rows instead of scanning Listing. The
+rows are kept current by applying a delta wherever a listing's
+contribution changes, in the same transaction as the change:
+
+  * Listing.save(): creation, and edits of category / status / target
+  * Listing post_delete (which cascades fire too)
+  * investments.capacity, wherever it moves a listing's funding counters
+    (unsharded claims and releases, folds of sharded ones): amount raised
+    and percent funded, keyed on the row as locked for that update
+  * batch.create_listings() and reconcile_funding, which bypass those
+
+`recompute_stats` rebuilds the rows from Listing and reports any drift.
+Percent funded is summed per investment, so the rollup's average can
+differ from a recompute by rounding; verify() allows for that.
+"""
+
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from core.expressions import Percent
+from .models import CategoryStat, Listing
+
+SLOTS = 8
+PERCENT_PLACES = Decimal("0.000001")
+CENT = Decimal("0.01")
+FIELDS = ("listings", "total_raised", "total_target", "percent_sum")
+CACHE_KEY = "stats:marketplace"
+
+
+def percent(raised, target):
+    if not target or target <= 0:
+        return Decimal("0")
+    return (raised * 100 / target).quantize(PERCENT_PLACES)
+
+
+def contribution(category, status, target, raised, sign=1):
+    """One listing's share of its (category, status) row, as a delta."""
+    return (
+        (category or "", status),
+        {
+            "listings": sign,
+            "total_raised": sign * raised,
+            "total_target": sign * target,
+            "percent_sum": sign * percent(raised, target),
+        },
+    )
+
+
+def apply(deltas):
+    """Add [(key, {field: delta})] to the rollup."""
+    merged = {}
+    for key, delta in deltas:
+        row = merged.setdefault(key, dict.fromkeys(FIELDS, 0))
+        for field, value in delta.items():
+            row[field] += value
+    # One slot per call and keys in a fixed order, so two writers can't
+    # take each other's row locks in opposite orders.
+    slot = random.randrange(SLOTS)
+    with transaction.atomic():
+        for key in sorted(merged):
+            delta = {f: v for f, v in merged[key].items() if v}
+            if delta:
+                _apply_one(key, slot, delta)
+
+
+def _apply_one(key, slot, delta):
+    category, status = key
+    rows = CategoryStat.objects.filter(category=category, status=status, slot=slot)
+    increments = {field: F(field) + value for field, value in delta.items()}
+    if rows.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            CategoryStat.objects.create(
+                category=category, status=status, slot=slot, **delta
+            )
+    except IntegrityError:
+        # created concurrently
+        rows.update(**increments)
+
+
+# --- hooks -----------------------------------------------------------------
+
+
+def listings_added(listings):
+    apply(
+        contribution(l.category, l.status, l.target_amount, l.total_invested)
+        for l in listings
+    )
+
+
+def listing_removed(listing):
+    apply(
+        [
+            contribution(
+                listing.category,
+                listing.status,
+                listing.target_amount,
+                listing.total_invested,
+                sign=-1,
+            )
+        ]
+    )
+
+
+def listing_changed(before, listing):
+    """`before` holds the row's category / status / target / total_invested."""
+    if (before["category"], before["status"], before["target_amount"]) == (
+        listing.category,
+        listing.status,
+        listing.target_amount,
+    ):
+        return
+    raised = before["total_invested"]  # counters aren't written by save()
+    apply(
+        [
+            contribution(
+                before["category"],
+                before["status"],
+                before["target_amount"],
+                raised,
+                sign=-1,
+            ),
+            contribution(
+                listing.category, listing.status, listing.target_amount, raised
+            ),
+        ]
+    )
+
+
+def funding_changed(listing, amount):
+    apply(
+        [
+            (
+                (listing.category or "", listing.status),
+                {
+                    "total_raised": amount,
+                    "percent_sum": percent(amount, listing.target_amount),
+                },
+            )
+        ]
+    )
+
+
+# --- reads -----------------------------------------------------------------
+
+
+def rollup():
+    """{(category, status): {field: total}} from the rollup rows."""
+    rows = (
+        CategoryStat.objects.order_by()
+        .values("category", "status")
+        .annotate(**{field: Sum(field) for field in FIELDS})
+    )
+    return {(r["category"], r["status"]): {f: r[f] for f in FIELDS} for r in rows}
+
+
+def expected():
+    """The same, computed from Listing (a full scan)."""
+    rows = (
+        Listing.objects.order_by()
+        .values("category", "status")
+        .annotate(
+            listings=Count("id"),
+            total_raised=Sum("total_invested"),
+            total_target=Sum("target_amount"),
+            percent_sum=Sum(Percent("total_invested", "target_amount")),
+        )
+    )
+    return {
+        (r["category"], r["status"]): {
+            "listings": r["listings"],
+            "total_raised": r["total_raised"],
+            "total_target": r["total_target"],
+            "percent_sum": Decimal(r["percent_sum"]).quantize(PERCENT_PLACES),
+        }
+        for r in rows
+    }
+
+
+def _summary(category, rows):
+    listings = sum(r["listings"] for r in rows.values())
+    raised = sum((r["total_raised"] for r in rows.values()), Decimal("0"))
+    live = rows.get(Listing.STATUS_LIVE)
+    average = Decimal("0")
+    if live and live["listings"]:
+        average = live["percent_sum"] / live["listings"]
+    summary = {
+        "listings": listings,
+        "live_listings": live["listings"] if live else 0,
+        "total_raised": f"{raised.quantize(CENT)}",
+        "average_percent_funded": f"{average.quantize(CENT)}",
+        "by_status": {
+            status: rows[status]["listings"] if status in rows else 0
+            for status, _ in Listing.STATUS_CHOICES
+            if status != Listing.STATUS_DRAFT
+        },
+    }
+    if category is not None:
+        summary = {"category": category, **summary}
+    return summary
+
+
+def marketplace():
+    """
+    The public numbers: per category and overall, drafts left out. The
+    average percent funded is over live listings.
+    """
+    per_category = {}
+    overall = {}
+    for (category, status), row in sorted(rollup().items()):
+        if status == Listing.STATUS_DRAFT or not row["listings"]:
+            continue
+        per_category.setdefault(category, {})[status] = row
+        total = overall.setdefault(status, dict.fromkeys(FIELDS, 0))
+        for field in FIELDS:
+            total[field] += row[field]
+    return {
+        "categories": [_summary(c, rows) for c, rows in per_category.items()],
+        "totals": _summary(None, overall),
+    }
+
+
+def get_marketplace():
+    return cache.get_or_set(CACHE_KEY, marketplace, settings.STATS_CACHE_TIMEOUT)
+
+
+# --- verification ----------------------------------------------------------
+
+
+def verify():
+    """
+    [(key, field, rollup value, expected value)] for every difference.
+    Percent sums may differ by under 0.01 per listing (rounding).
+    """
+    current, truth = rollup(), expected()
+    empty = dict.fromkeys(FIELDS, 0)
+    drift = []
+    for key in sorted(set(current) | set(truth)):
+        have, want = current.get(key, empty), truth.get(key, empty)
+        for field in FIELDS:
+            if field == "percent_sum":
+                allowed = CENT * max(want["listings"], 1)
+                same = abs(have[field] - want[field]) < allowed
+            else:
+                same = have[field] == want[field]
+            if not same:
+                drift.append((key, field, have[field], want[field]))
+    return drift
+
+
+def recompute():
+    """Replace the rollup with values computed from Listing."""
+    with transaction.atomic():
+        # Wait for writers holding rollup rows; the ones that come after
+        # add their deltas on top of the recomputed rows.
+        list(CategoryStat.objects.select_for_update().values_list("pk", flat=True))
+        truth = expected()
+        CategoryStat.objects.all().delete()
+        CategoryStat.objects.bulk_create(
+            CategoryStat(category=category, status=status, slot=0, **row)
+            for (category, status), row in truth.items()
+        )
+    cache.delete(CACHE_KEY)
@@ -1,3 +1,1300 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+import unittest
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from threading import Timer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from asgiref.sync import async_to_sync, sync_to_async
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.fastlist import FastJSONRenderer, compile_plan
+from . import batch, history, live, stats
+from core.queryplans import analyze, captured_plan_problems
+from investments import capacity, ledger
+from investments.models import Investment, LedgerEntry
+from . import cache as listing_cache
+from .management.commands.batch_create_benchmark import batch_create_benchmark
+from .models import CategoryStat, Listing
+from .serializers import ListingSerializer, ListingSummarySerializer
+
+User = get_user_model()
+
+
+def make_listing(seller, **extra):
+    fields = {
+        "title": "Jordan 1 Chicago",
+        "description": "Deadstock, size 10",
+        "category": "sneakers",
+        "asset_value": Decimal("10000.00"),
+        "seller_retain_percent": Decimal("20.00"),
+        "status": Listing.STATUS_LIVE,
+    }
+    fields.update(extra)
+    return Listing.objects.create(seller=seller, **fields)
+
+
+class FundingCounterTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.alice = User.objects.create_user("alice@example.com", "pw-123456")
+        self.bob = User.objects.create_user("bob@example.com", "pw-123456")
+        self.listing = make_listing(self.seller)
+
+    def test_counters_follow_investments(self):
+        Investment.objects.create(
+            investor=self.alice, listing=self.listing, amount=Decimal("500")
+        )
+        Investment.objects.create(
+            investor=self.alice, listing=self.listing, amount=Decimal("250")
+        )
+        bob_inv = Investment.objects.create(
+            investor=self.bob, listing=self.listing, amount=Decimal("100")
+        )
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("850.00"))
+        self.assertEqual(self.listing.investor_count, 2)
+        self.assertEqual(self.listing.percent_funded, Decimal("10.62"))
+
+        bob_inv.delete()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("750.00"))
+        self.assertEqual(self.listing.investor_count, 1)
+
+    def test_listing_save_does_not_clobber_counters(self):
+        stale = Listing.objects.get(pk=self.listing.pk)
+        Investment.objects.create(
+            investor=self.alice, listing=self.listing, amount=Decimal("500")
+        )
+        stale.title = "Jordan 1 Chicago (1985)"
+        stale.save()
+
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.title, "Jordan 1 Chicago (1985)")
+        self.assertEqual(self.listing.total_invested, Decimal("500.00"))
+
+    def test_list_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)  # skip the anonymous cache
+        for i in range(3):
+            listing = make_listing(self.seller, title=f"Card {i}")
+            Investment.objects.create(
+                investor=self.alice, listing=listing, amount=Decimal("100")
+            )
+        with self.assertNumQueries(1):
+            client.get("/api/listings/")
+
+        for i in range(10):
+            make_listing(self.seller, title=f"More {i}")
+        with self.assertNumQueries(1):
+            client.get("/api/listings/")
+
+    def test_reconcile_funding_fixes_drift(self):
+        Investment.objects.create(
+            investor=self.alice, listing=self.listing, amount=Decimal("500")
+        )
+        Listing.objects.filter(pk=self.listing.pk).update(
+            total_invested=Decimal("1.00"), investor_count=7
+        )
+
+        out = StringIO()
+        call_command("reconcile_funding", "--dry-run", stdout=out)
+        self.assertIn("found 1 drifted", out.getvalue())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.investor_count, 7)
+
+        call_command("reconcile_funding", stdout=StringIO())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.total_invested, Decimal("500.00"))
+        self.assertEqual(self.listing.investor_count, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.other = User.objects.create_user("other@example.com", "pw-123456")
+        for i in range(7):
+            make_listing(self.seller, title=f"Live {i}")
+        for i in range(3):
+            make_listing(self.other, title=f"Draft {i}", status=Listing.STATUS_DRAFT)
+        # Ties on created_at must still page deterministically by id
+        Listing.objects.filter(title__in=["Live 2", "Live 3", "Live 4"]).update(
+            created_at=timezone.now()
+        )
+
+    def walk(self, url, link="next"):
+        seen = []
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, 200)
+                seen.extend(row["id"] for row in res.data["results"])
+                last = res.data
+                url = res.data[link]
+        sql = " ".join(q["sql"].upper() for q in ctx.captured_queries)
+        self.assertNotIn("OFFSET", sql)
+        return seen, last
+
+    def test_pages_cover_everything_once_in_order(self):
+        expected = list(
+            Listing.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        seen, last = self.walk("/api/listings/?page_size=3")
+        self.assertEqual(seen, expected)
+
+        # ...and walking back from the last page visits the rest in reverse
+        back = []
+        url = last["previous"]
+        while url:
+            res = self.client.get(url)
+            back = [row["id"] for row in res.data["results"]] + back
+            url = res.data["previous"]
+        self.assertEqual(back, expected[: len(back)])
+        self.assertEqual(len(back) + len(last["results"]), len(expected))
+
+    def test_pagination_respects_filters(self):
+        seen, _ = self.walk("/api/listings/?status=live&page_size=2")
+        self.assertEqual(len(seen), 7)
+
+        self.client.force_authenticate(self.other)
+        seen, _ = self.walk("/api/listings/?mine=1&page_size=2")
+        mine = Listing.objects.filter(seller=self.other).values_list("id", flat=True)
+        self.assertEqual(set(seen), set(mine))
+
+    def test_bad_cursor_is_404(self):
+        res = self.client.get("/api/listings/?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 404)
+
+
+class ListingQueryPlanTests(TestCase):
+    """Hot listing reads must stay on indexes once the tables are large."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sellers = User.objects.bulk_create(
+            User(email=f"seller{i}@example.com", password="!") for i in range(50)
+        )
+        statuses = [s for s, _ in Listing.STATUS_CHOICES]
+        Listing.objects.bulk_create(
+            Listing(
+                seller=sellers[i % len(sellers)],
+                title=f"Item {i}",
+                description="x" * 200,
+                category=("sneakers", "cards", "watches")[i % 3],
+                target_amount=Decimal("1000.00"),
+                status=statuses[i % len(statuses)],
+            )
+            for i in range(3000)
+        )
+        analyze(User, Listing)
+        cls.seller = sellers[0]
+
+    def assert_indexed(self, *urls):
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        with CaptureQueriesContext(connection) as ctx:
+            for url in urls:
+                res = client.get(url)
+                self.assertEqual(res.status_code, 200, url)
+                if "next" in res.data and res.data["next"]:
+                    client.get(res.data["next"])
+        problems = captured_plan_problems(
+            ctx.captured_queries, ["listings_listing"]
+        )
+        self.assertEqual(problems, {})
+
+    def test_list_filters_use_indexes(self):
+        self.assert_indexed(
+            "/api/listings/",
+            "/api/listings/?status=live",
+            "/api/listings/?mine=1",
+            "/api/listings/?status=draft&mine=1",
+        )
+
+    def test_detail_uses_primary_key(self):
+        listing = Listing.objects.order_by("id").last()
+        self.assert_indexed(f"/api/listings/{listing.pk}/")
+
+
+class ListingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        self.listing = make_listing(self.seller)
+        self.other = make_listing(self.seller, title="Rolex Daytona")
+
+    def test_anonymous_reads_are_cached(self):
+        self.client.get("/api/listings/")
+        self.client.get(f"/api/listings/{self.listing.pk}/")
+        with self.assertNumQueries(0):
+            self.client.get("/api/listings/")
+            self.client.get(f"/api/listings/{self.listing.pk}/")
+        # different query params are a different entry
+        with self.assertNumQueries(1):
+            self.client.get("/api/listings/?status=live")
+
+    def test_listing_save_invalidates(self):
+        self.client.get(f"/api/listings/{self.listing.pk}/")
+        self.client.get(f"/api/listings/{self.other.pk}/")
+        self.client.get("/api/listings/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = "Jordan 1 Bred"
+            self.listing.save()
+
+        res = self.client.get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.data["title"], "Jordan 1 Bred")
+        res = self.client.get("/api/listings/")
+        self.assertIn("Jordan 1 Bred", [row["title"] for row in res.data["results"]])
+        # unrelated detail entries stay cached
+        with self.assertNumQueries(0):
+            self.client.get(f"/api/listings/{self.other.pk}/")
+
+    def test_investment_invalidates_funding(self):
+        self.client.get(f"/api/listings/{self.listing.pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(
+                investor=self.investor, listing=self.listing, amount=Decimal("800")
+            )
+        res = self.client.get(f"/api/listings/{self.listing.pk}/")
+        self.assertEqual(res.data["total_invested"], "800.00")
+
+    def test_concurrent_miss_waits_for_builder(self):
+        built = []
+        # another request holds the rebuild lock and finishes shortly
+        cache.add("listings:test:lock", 1)
+        Timer(0.1, cache.set, ("listings:test", {"from": "builder"})).start()
+
+        value = listing_cache.get_or_build(
+            "listings:test", lambda: built.append(1) or {"from": "us"}
+        )
+        self.assertEqual(value, {"from": "builder"})
+        self.assertEqual(built, [])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        self.listing = make_listing(self.seller)
+        # authenticated requests skip the anonymous response cache
+        self.client.force_authenticate(self.investor)
+
+    def test_detail_304_until_funding_changes(self):
+        url = f"/api/listings/{self.listing.pk}/"
+        res = self.client.get(url)
+        etag = res["ETag"]
+        self.assertTrue(res.has_header("Last-Modified"))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        Investment.objects.create(
+            investor=self.investor, listing=self.listing, amount=Decimal("100")
+        )
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_list_etag_tracks_rows_and_query(self):
+        res = self.client.get("/api/listings/")
+        etag = res["ETag"]
+        self.assertEqual(
+            self.client.get("/api/listings/", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        self.assertEqual(
+            self.client.get(
+                "/api/listings/?status=live", HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            200,
+        )
+
+        self.listing.title = "Jordan 1 Bred"
+        self.listing.save()
+        self.assertEqual(
+            self.client.get("/api/listings/", HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_lists_ignore_if_modified_since(self):
+        other = make_listing(self.seller, title="Other")
+        res = self.client.get("/api/listings/")
+        self.assertFalse(res.has_header("Last-Modified"))
+        # the newest row stays, so max(updated_at) wouldn't move
+        Listing.objects.filter(pk=self.listing.pk).delete()
+        res = self.client.get(
+            "/api/listings/", HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row["id"] for row in res.data["results"]], [other.pk])
+
+    def test_seller_changes_move_the_validators(self):
+        url = f"/api/listings/{self.listing.pk}/"
+        etag = self.client.get(url)["ETag"]
+        self.seller.name = "Sam Seller"
+        self.seller.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["seller_name"], "Sam Seller")
+
+    def test_investment_list_etag(self):
+        # an empty list has no validators (its summary comes from the ledger)
+        self.assertNotIn("ETag", self.client.get("/api/investments/"))
+        Investment.objects.create(
+            investor=self.investor, listing=self.listing, amount=Decimal("100")
+        )
+        res = self.client.get("/api/investments/")
+        etag = res["ETag"]
+        self.assertEqual(
+            self.client.get("/api/investments/", HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+        Investment.objects.create(
+            investor=self.investor, listing=self.listing, amount=Decimal("100")
+        )
+        self.assertEqual(
+            self.client.get("/api/investments/", HTTP_IF_NONE_MATCH=etag).status_code,
+            200,
+        )
+
+    def test_anonymous_304_from_cache(self):
+        anon = APIClient()
+        url = f"/api/listings/{self.listing.pk}/"
+        etag = anon.get(url)["ETag"]
+        self.assertEqual(etag, self.client.get(url)["ETag"])
+        with self.assertNumQueries(0):
+            self.assertEqual(anon.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(
+                investor=self.investor, listing=self.listing, amount=Decimal("100")
+            )
+        self.assertEqual(anon.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_reconcile_moves_validators_and_cache(self):
+        Investment.objects.create(
+            investor=self.investor, listing=self.listing, amount=Decimal("100")
+        )
+        Listing.objects.filter(pk=self.listing.pk).update(total_invested=1)
+        anon = APIClient()
+        url = f"/api/listings/{self.listing.pk}/"
+        etag = anon.get(url)["ETag"]  # cached with the drifted total
+        self.assertEqual(anon.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("reconcile_funding", stdout=StringIO())
+        for client in (anon, self.client):
+            res = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.data["total_invested"], "100.00")
+
+    def test_bad_lookup_is_404(self):
+        self.assertEqual(self.client.get("/api/listings/nope/").status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.listings = [make_listing(self.seller) for _ in range(3)]
+        self.client.force_authenticate(self.seller)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, 200, res.data)
+        (select,) = [
+            q["sql"] for q in ctx.captured_queries if "listings_listing" in q["sql"]
+        ]
+        return res, select
+
+    def test_list_defaults_to_summary(self):
+        res, sql = self.get("/api/listings/")
+        self.assertEqual(
+            list(res.data["results"][0]),
+            list(ListingSummarySerializer.Meta.fields),
+        )
+        self.assertEqual(res.data["results"][0]["percent_funded"], "0.00")
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn("users_user", sql)
+
+    def test_fields_and_omit(self):
+        res, sql = self.get("/api/listings/", fields="id,title,seller_email")
+        self.assertEqual(
+            res.data["results"][0],
+            {
+                "id": self.listings[2].pk,
+                "title": "Jordan 1 Chicago",
+                "seller_email": "seller@example.com",
+            },
+        )
+        self.assertIn("users_user", sql)
+        self.assertNotIn('"description"', sql)
+
+        url = f"/api/listings/{self.listings[0].pk}/"
+        res, sql = self.get(url, omit="description,seller_name,seller_email")
+        self.assertNotIn("description", res.data)
+        self.assertIn("updated_at", res.data)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn("users_user", sql)
+
+        res = self.client.get("/api/listings/", {"fields": "title,secret"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_keyset_and_etags_need_no_extra_queries(self):
+        first = self.client.get("/api/listings/", {"page_size": 2, "fields": "title"})
+        with self.assertNumQueries(1):
+            res = self.client.get(first.data["next"])
+        self.assertEqual(res.data["results"], [{"title": "Jordan 1 Chicago"}])
+        self.assertIn("ETag", res)
+
+
+class ListingSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.in_title = make_listing(
+            self.seller, title="Omega Speedmaster watch", description="Moonwatch"
+        )
+        self.in_category = make_listing(
+            self.seller, title="Rolex Submariner", category="watches"
+        )
+        self.in_description = make_listing(
+            self.seller, title="Mystery box", description="might contain a watch"
+        )
+        self.unrelated = make_listing(self.seller, title="Charizard holo")
+
+    def search(self, q, **params):
+        res = self.client.get("/api/listings/", {"q": q, **params})
+        self.assertEqual(res.status_code, 200)
+        return [row["id"] for row in res.data["results"]]
+
+    def test_ranked_by_field_weight(self):
+        self.assertEqual(
+            self.search("watch"),
+            [self.in_title.pk, self.in_category.pk, self.in_description.pk],
+        )
+        self.assertEqual(self.search("charizard"), [self.unrelated.pk])
+        self.assertEqual(self.search("omega watch"), [self.in_title.pk])
+        self.assertEqual(self.search('"); --'), [])
+
+    def test_ranked_results_paginate(self):
+        first = self.client.get("/api/listings/", {"q": "watch", "page_size": 2})
+        ids = [row["id"] for row in first.data["results"]]
+        ids += [row["id"] for row in self.client.get(first.data["next"]).data["results"]]
+        self.assertEqual(ids, self.search("watch"))
+
+    def test_index_follows_writes(self):
+        self.unrelated.title = "Pocket watch"
+        self.unrelated.save()
+        self.in_title.delete()
+        Listing.objects.bulk_create(
+            [
+                Listing(
+                    seller=self.seller,
+                    title="Casio watch",
+                    description="",
+                    target_amount=Decimal("100.00"),
+                )
+            ]
+        )
+        cache.clear()
+        found = Listing.objects.filter(pk__in=self.search("watch"))
+        self.assertEqual(
+            set(found.values_list("title", flat=True)),
+            {"Pocket watch", "Rolex Submariner", "Mystery box", "Casio watch"},
+        )
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser("admin@example.com", "pw-123456")
+        self.client.force_login(admin)
+        url = "/api/admin/listings/listing/"
+        res = self.client.get(url, {"q": "speedmaster"})
+        self.assertEqual(list(res.context["cl"].result_list), [self.in_title])
+        res = self.client.get(url, {"q": "seller@example.com"})
+        self.assertEqual(res.context["cl"].result_count, 4)
+
+
+class BatchCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.client.force_authenticate(self.seller)
+
+    def item(self, i, **extra):
+        return {
+            "title": f"Card {i}",
+            "description": "Base set",
+            "asset_value": "1000.00",
+            "seller_retain_percent": "25.00",
+            **extra,
+        }
+
+    def test_creates_valid_items_and_reports_the_rest(self):
+        items = [
+            self.item(0),
+            self.item(1, seller_retain_percent="150"),
+            self.item(2, asset_value=None),
+            self.item(3, asset_value="50.00", seller_retain_percent="0"),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/listings/batch/", items, format="json")
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(
+            [(row["title"], row["target_amount"]) for row in res.data["created"]],
+            [("Card 0", "750.00"), ("Card 3", "50.00")],
+        )
+        self.assertEqual([e["index"] for e in res.data["errors"]], [1, 2])
+        self.assertIn("seller_retain_percent", res.data["errors"][0]["errors"])
+        self.assertEqual(Listing.objects.get(title="Card 0").seller_id, self.seller.pk)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        # every stats slot exists, so each batch's rollup delta is one UPDATE
+        CategoryStat.objects.bulk_create(
+            [
+                CategoryStat(category="", status=Listing.STATUS_DRAFT, slot=slot)
+                for slot in range(stats.SLOTS)
+            ],
+            ignore_conflicts=True,
+        )
+        self.client.post("/api/listings/batch/", [self.item(0)], format="json")
+        with CaptureQueriesContext(connection) as one:
+            self.client.post("/api/listings/batch/", [self.item(1)], format="json")
+        items = [self.item(i) for i in range(50)]
+        with self.assertNumQueries(len(one)):
+            res = self.client.post("/api/listings/batch/", items, format="json")
+        self.assertEqual(len(res.data["created"]), 50)
+
+    def test_invalidates_cached_lists(self):
+        anonymous = APIClient()
+        anonymous.get("/api/listings/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/listings/batch/", [self.item(0)], format="json")
+        res = anonymous.get("/api/listings/")
+        self.assertEqual([row["title"] for row in res.data["results"]], ["Card 0"])
+
+    def test_benchmark(self):
+        report = batch_create_benchmark(self.seller, 6, batch_size=4)
+        self.assertEqual(report["listings"], 6)
+        self.assertGreater(report["speedup"], 0)
+        self.assertEqual(Listing.objects.filter(seller=self.seller).count(), 12)
+
+    def test_rejects_bad_batches(self):
+        res = self.client.post("/api/listings/batch/", {"title": "x"}, format="json")
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post(
+            "/api/listings/batch/", [self.item(0, asset_value="x")], format="json"
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.data["created"], [])
+        anonymous = APIClient()
+        res = anonymous.post("/api/listings/batch/", [self.item(0)], format="json")
+        self.assertEqual(res.status_code, 403)
+
+
+class ListingExportTests(TestCase):
+    def test_streams_filtered_listings(self):
+        seller = User.objects.create_user("seller@example.com", "pw-123456")
+        live = make_listing(seller)
+        make_listing(seller, status=Listing.STATUS_DRAFT)
+        client = APIClient()
+        client.force_authenticate(seller)
+        self.assertEqual(client.get("/api/listings/export.csv").status_code, 403)
+
+        client.force_authenticate(User.objects.create_superuser("a@example.com", "pw"))
+        res = client.get("/api/listings/export.csv", {"status": "live"})
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{live.pk},{seller.pk},seller@example.com,"))
+
+
+@override_settings(ROOT_URLCONF="core.asgi_urls")
+class AsyncReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        self.listings = [
+            make_listing(self.seller, title=f"Item {i}") for i in range(3)
+        ]
+        Investment.objects.create(
+            investor=self.investor, listing=self.listings[0], amount=Decimal("100")
+        )
+
+    def get_both(self, url, user=None, **params):
+        sync_client, async_client = APIClient(), AsyncClient()
+        if user:
+            sync_client.force_login(user)
+            async_client.force_login(user)
+        sync = sync_client.get(url, params)
+        cache.clear()
+        response = async_to_sync(async_client.get)(url, params)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(response.get("ETag"), sync.get("ETag"))
+        return response, sync
+
+    def test_async_reads_match_sync(self):
+        for url, user, params in [
+            ("/api/listings/", None, {"page_size": 2}),
+            ("/api/listings/", self.seller, {"mine": 1}),
+            ("/api/listings/", None, {"q": "item"}),
+            (f"/api/listings/{self.listings[1].pk}/", None, {}),
+            ("/api/investments/", self.investor, {}),
+            (f"/api/investments/{Investment.objects.get().pk}/", self.investor, {}),
+            ("/api/investments/", None, {}),
+            (f"/api/listings/{self.listings[1].pk + 100}/", None, {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                response, sync = self.get_both(url, user, **params)
+                self.assertEqual(response.json(), sync.json())
+
+    def test_async_conditional_get_and_cache(self):
+        client = AsyncClient()
+        url = f"/api/listings/{self.listings[0].pk}/"
+        first = async_to_sync(client.get)(url)
+        with self.assertNumQueries(0):
+            again = async_to_sync(client.get)(
+                url, headers={"if-none-match": first["ETag"]}
+            )
+        self.assertEqual(again.status_code, 304)
+
+    def test_writes_and_other_routes_fall_through(self):
+        client = AsyncClient()
+        client.force_login(self.seller)
+        item = {
+            "title": "x",
+            "description": "y",
+            "asset_value": "10",
+            "seller_retain_percent": "0",
+        }
+        res = async_to_sync(client.post)(
+            "/api/listings/batch/", [item], content_type="application/json"
+        )
+        self.assertEqual(res.status_code, 201)
+        res = async_to_sync(client.patch)(
+            f"/api/listings/{self.listings[0].pk}/",
+            {"status": "draft"},
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, 200)
+        res = async_to_sync(client.get)("/api/auth/me")
+        self.assertEqual(res.json()["email"], "seller@example.com")
+        res = async_to_sync(AsyncClient().get)("/api/auth/me")
+        self.assertEqual(res.status_code, 401)
+
+
+class FastListTests(TestCase):
+    """core.fastlist must render exactly what the serializers do."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(
+            "seller@example.com", "pw-123456", name='Zoë "Z" \u2028 \\ \t'
+        )
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        self.listings = [
+            make_listing(self.seller),
+            make_listing(
+                self.seller,
+                title="Odd <chars> \u2029 \x01 \x1f \x7f 🏀",
+                category="",
+                asset_value=Decimal("3333.33"),
+                seller_retain_percent=Decimal("0.01"),
+                status=Listing.STATUS_FUNDED,
+            ),
+            make_listing(
+                self.seller,
+                title="No asset value",
+                asset_value=None,
+                target_amount=Decimal("7.5"),
+                status=Listing.STATUS_DRAFT,
+            ),
+            make_listing(
+                self.seller,
+                asset_value=Decimal("9999999999.99"),
+                seller_retain_percent=Decimal("99.99"),
+            ),
+        ]
+        Investment.objects.create(
+            investor=self.investor, listing=self.listings[1], amount=Decimal("1000")
+        )
+
+    def test_rows_match_serializers(self):
+        queryset = Listing.objects.select_related("seller").order_by("pk")
+        for serializer_class in (ListingSerializer, ListingSummarySerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                slow = serializer_class(queryset, many=True).data
+                plan = compile_plan(serializer_class())
+                fast = plan.rows(queryset.values(*plan.columns))
+                self.assertEqual(
+                    [list(row.items()) for row in fast],
+                    [list(row.items()) for row in slow],
+                )
+                self.assertEqual(
+                    FastJSONRenderer().render(fast), JSONRenderer().render(slow)
+                )
+
+    def test_responses_match_serializers(self):
+        sync_client, async_client = APIClient(), AsyncClient()
+        sync_client.force_login(self.seller)
+        async_client.force_login(self.seller)
+        for client, params in [
+            (APIClient(), {}),
+            (sync_client, {}),
+            (sync_client, {"fields": "id,seller_name,seller_email,percent_funded"}),
+            (sync_client, {"omit": "created_at", "status": "live"}),
+            (sync_client, {"q": "chicago", "page_size": 1}),
+            (sync_client, {"mine": 1, "page_size": 3}),
+            (async_client, {"fields": "title,description,seller"}),
+        ]:
+            with self.subTest(params=params):
+                responses = []
+                for fast in (True, False):
+                    cache.clear()
+                    with override_settings(FAST_LIST_SERIALIZATION=fast):
+                        if isinstance(client, AsyncClient):
+                            with override_settings(ROOT_URLCONF="core.asgi_urls"):
+                                get = async_to_sync(client.get)
+                                res = get("/api/listings/", params)
+                        else:
+                            res = client.get("/api/listings/", params)
+                    responses.append(res)
+                fast, slow = responses
+                self.assertEqual(fast.status_code, 200)
+                self.assertTrue(fast.data["results"])
+                # rows from the plan, not a serializer's ReturnList
+                self.assertIs(type(fast.data["results"]), list)
+                self.assertIsNot(type(slow.data["results"]), list)
+                self.assertEqual(fast["ETag"], slow["ETag"])
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast.content, JSONRenderer().render(slow.data))
+
+    def test_pages_need_one_query(self):
+        client = APIClient()
+        first = client.get("/api/listings/", {"page_size": 2})
+        cache.clear()
+        with self.assertNumQueries(1):
+            res = client.get(first.data["next"])
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_unmapped_fields_use_the_serializer(self):
+        class WithMethod(ListingSummarySerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(ListingSummarySerializer.Meta):
+                fields = ["id", "label"]
+
+            def get_label(self, obj):
+                return obj.title.upper()
+
+        self.assertIsNone(compile_plan(WithMethod()))
+        self.assertIsNotNone(compile_plan(ListingSummarySerializer()))
+
+    def test_renderer_matches_json_renderer(self):
+        text = "".join(chr(c) for c in range(0x3000) if not 0xD800 <= c < 0xE000)
+        data = {
+            "text": text,
+            "nested": [{"a": None, "b": True, "c": -(2**63)}, [], {}],
+            "amount": Decimal("1.10"),  # a float in JSONRenderer: its output
+            "when": timezone.now(),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.client = APIClient()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.listing = make_listing(self.seller)
+
+    def timing(self, response):
+        entries = [e.strip().split(";") for e in response["Server-Timing"].split(",")]
+        return {e[0]: e[1:] for e in entries}
+
+    def test_server_timing_header(self):
+        timing = self.timing(self.client.get("/api/listings/"))
+        self.assertEqual(set(timing), {"total", "db", "auth", "serialize"})
+        self.assertEqual(timing["db"][1], 'desc="1 queries"')
+
+        # served from cache: no queries, nothing serialized
+        timing = self.timing(self.client.get("/api/listings/"))
+        self.assertEqual(timing["db"][1], 'desc="0 queries"')
+        self.assertNotIn("serialize", timing)
+
+    def test_async_views_are_measured(self):
+        with override_settings(ROOT_URLCONF="core.asgi_urls"):
+            url = f"/api/listings/{self.listing.pk}/"
+            res = async_to_sync(AsyncClient().get)(url)
+        self.assertEqual(self.timing(res)["db"][1], 'desc="1 queries"')
+        self.assertIn(
+            'api_request_db_queries_count{view="ListingViewSet.retrieve"} 1',
+            metrics.registry.exposition(),
+        )
+
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_metrics_endpoint(self):
+        self.client.get("/api/listings/")
+        self.client.get("/api/listings/")
+        self.client.post("/api/auth/login", {"email": "x@example.com", "password": "x"})
+
+        self.assertEqual(self.client.get("/api/metrics").status_code, 403)
+        for wrong in ("Bearer scrape-m", "Bearer scrape-mé"):
+            res = self.client.get("/api/metrics", HTTP_AUTHORIZATION=wrong)
+            self.assertEqual(res.status_code, 403)
+        res = self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        body = res.content.decode()
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn(
+            'api_request_duration_seconds_count{view="ListingViewSet.list"} 2', body
+        )
+        self.assertIn(
+            'api_request_db_queries_bucket{view="login_view",le="+Inf"} 1', body
+        )
+
+        staff = User.objects.create_superuser("staff@example.com", "pw-123456")
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get("/api/metrics").status_code, 200)
+
+    @unittest.skipUnless(
+        connection.settings_dict["OPTIONS"].get("pool"), "needs DB_POOL on Postgres"
+    )
+    @override_settings(METRICS_TOKEN="scrape-me")
+    def test_pool_metrics(self):
+        self.client.get("/api/listings/")
+        res = self.client.get("/api/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        body = res.content.decode()
+        self.assertRegex(body, r'db_pool_checkouts_total\{alias="default"\} [1-9]')
+        self.assertIn('db_pool_timeouts_total{alias="default"} 0', body)
+        self.assertIn("# TYPE db_pool_idle gauge", body)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        res = self.client.get("/api/listings/")
+        self.assertNotIn("Server-Timing", res)
+        self.assertNotIn("ListingViewSet", metrics.registry.exposition())
+
+
+@override_settings(
+    ROOT_URLCONF="core.asgi_urls",
+    FUNDING_STREAM_HEARTBEAT=0.2,
+    FUNDING_STREAM_MAX_AGE=1,
+)
+class FundingStreamTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        self.first = make_listing(self.seller)
+        self.second = make_listing(self.seller, title="Other")
+
+    def invest(self, listing, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Investment.objects.create(
+                investor=self.investor, listing=listing, amount=Decimal(amount)
+            )
+
+    def withdraw(self, investment):
+        with self.captureOnCommitCallbacks(execute=True):
+            investment.delete()
+
+    def read_stream(self, url, snapshots, *writes):
+        """Open the stream, run `writes` once the snapshots are in, and
+        read until the server closes it (FUNDING_STREAM_MAX_AGE)."""
+
+        async def scenario():
+            response = await AsyncClient().get(url)
+            chunks = []
+            async for chunk in response.streaming_content:
+                chunks.append(chunk.decode())
+                if sum(c.startswith("event: snapshot") for c in chunks) == snapshots:
+                    break
+            for write in writes:
+                await sync_to_async(write)()
+            async for chunk in response.streaming_content:
+                chunks.append(chunk.decode())
+            return response, chunks
+
+        response, chunks = async_to_sync(scenario)()
+        events = [
+            (lines[0].removeprefix("event: "), json.loads(lines[1][6:]))
+            for lines in (c.strip().split("\n") for c in chunks)
+            if lines[0].startswith("event: ")
+        ]
+        return response, chunks, events
+
+    def test_snapshot_then_committed_changes(self):
+        url = f"/api/listings/{self.first.pk}/funding/stream/"
+        response, chunks, events = self.read_stream(
+            url,
+            1,
+            lambda: self.invest(self.first, "200"),
+            lambda: self.invest(self.second, "50"),
+            lambda: self.withdraw(self.invest(self.first, "600")),
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(chunks[0], "retry: 3000\n\n")
+        self.assertIn(": keepalive\n\n", chunks)
+        self.assertEqual(
+            [
+                (name, e["delta"], e["total_invested"], e["percent_funded"])
+                for name, e in events
+            ],
+            [
+                ("snapshot", "0.00", "0.00", "0.00"),
+                ("funding", "200.00", "200.00", "2.50"),
+                ("funding", "600.00", "800.00", "10.00"),
+                ("funding", "-600.00", "200.00", "2.50"),
+            ],
+        )
+        self.assertEqual(events[1][1]["investor_count"], 1)
+
+    def test_multiplexed_stream(self):
+        url = f"/api/listings/funding/stream/?ids={self.second.pk},{self.first.pk},999"
+        _, _, events = self.read_stream(
+            url, 2, lambda: self.invest(self.second, "80")
+        )
+        self.assertEqual(
+            [(name, e["listing"]) for name, e in events],
+            [
+                ("snapshot", self.first.pk),
+                ("snapshot", self.second.pk),
+                ("funding", self.second.pk),
+            ],
+        )
+
+    def test_bad_requests(self):
+        client = AsyncClient()
+        for url, code in [
+            (f"/api/listings/{self.first.pk + 100}/funding/stream/", 404),
+            ("/api/listings/funding/stream/?ids=999", 404),
+            ("/api/listings/funding/stream/?ids=1,x", 400),
+            ("/api/listings/funding/stream/", 400),
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(async_to_sync(client.get)(url).status_code, code)
+        # WSGI deployments don't serve the streams
+        with override_settings(ROOT_URLCONF="core.urls"):
+            url = f"/api/listings/{self.first.pk}/funding/stream/"
+            self.assertEqual(APIClient().get(url).status_code, 404)
+
+
+class FakeRedis:
+    """A redis.asyncio client whose pubsub follows a script, for RedisBroker."""
+
+    def __init__(self, subscribed, messages, fail_subscribe=False):
+        self.subscribed = subscribed  # asyncio.Event gating psubscribe()
+        self.messages = messages  # asyncio.Queue; an exception ends listen()
+        self.fail_subscribe = fail_subscribe
+
+    def pubsub(self):
+        return self
+
+    async def psubscribe(self, pattern):
+        await self.subscribed.wait()
+        if self.fail_subscribe:
+            raise ConnectionError("refused")
+
+    async def listen(self):
+        while True:
+            item = await self.messages.get()
+            if isinstance(item, Exception):
+                raise item
+            channel, data = item
+            yield {"type": "pmessage", "channel": channel, "data": data}
+
+    async def aclose(self):
+        pass
+
+
+class RedisBrokerTests(SimpleTestCase):
+    def test_subscribe_returns_once_redis_subscribed(self):
+        async def scenario():
+            subscribed, messages = asyncio.Event(), asyncio.Queue()
+            broker = live.RedisBroker("redis://test")
+            with mock.patch(
+                "redis.asyncio.Redis.from_url",
+                return_value=FakeRedis(subscribed, messages),
+            ):
+                pending = asyncio.ensure_future(broker.subscribe(["funding:1"]))
+                await asyncio.sleep(0.01)
+                self.assertFalse(pending.done())
+                subscribed.set()
+                sub = await pending
+            await messages.put((b"funding:1", b"{}"))
+            self.assertEqual(await sub.get(), "{}")
+            sub.close()
+
+        async_to_sync(scenario)()
+
+    def test_failed_listener_ends_streams_and_restarts(self):
+        async def scenario():
+            ready = asyncio.Event()
+            ready.set()
+            first, second = asyncio.Queue(), asyncio.Queue()
+            broker = live.RedisBroker("redis://test")
+            with self.assertLogs("listings.live", "ERROR"), mock.patch(
+                "redis.asyncio.Redis.from_url",
+                side_effect=[FakeRedis(ready, first), FakeRedis(ready, second)],
+            ):
+                sub = await broker.subscribe(["funding:1"])
+                await first.put((b"funding:1", b"{}"))
+                await first.put(ConnectionError("gone"))
+                self.assertEqual(await sub.get(), "{}")
+                self.assertIsNone(await sub.get())
+                sub.close()
+
+                again = await broker.subscribe(["funding:1"])
+                await second.put((b"funding:1", b"{}"))
+                self.assertEqual(await again.get(), "{}")
+                again.close()
+
+        async_to_sync(scenario)()
+
+    def test_subscribe_fails_when_redis_does(self):
+        async def scenario():
+            ready = asyncio.Event()
+            ready.set()
+            broker = live.RedisBroker("redis://test")
+            with self.assertLogs("listings.live", "ERROR"), mock.patch(
+                "redis.asyncio.Redis.from_url",
+                return_value=FakeRedis(ready, asyncio.Queue(), fail_subscribe=True),
+            ):
+                with self.assertRaises(ConnectionError):
+                    await broker.subscribe(["funding:1"])
+            self.assertFalse(broker._subscriptions)
+
+        async_to_sync(scenario)()
+
+
+class FundingHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.alice = User.objects.create_user("alice@example.com", "pw-123456")
+        self.bob = User.objects.create_user("bob@example.com", "pw-123456")
+        self.listing = make_listing(self.seller)
+        self.started = timezone.now()
+        self.invest(self.alice, "100", 2026, 3, 1, 9, 15)
+        second = self.invest(self.bob, "50", 2026, 3, 1, 9, 40)
+        second.delete()
+        self.backdate(LedgerEntry.KIND_REFUND, 2026, 3, 1, 11, 5)
+        self.invest(self.bob, "30", 2026, 3, 2, 8, 0)
+        # moves holdings, not funding
+        ledger.transfer(self.listing.pk, self.alice.pk, self.bob.pk, Decimal("10"))
+        self.backdate(LedgerEntry.KIND_TRANSFER, 2026, 3, 1, 10, 0)
+
+    def invest(self, investor, amount, *when):
+        investment = Investment.objects.create(
+            investor=investor, listing=self.listing, amount=Decimal(amount)
+        )
+        self.backdate(LedgerEntry.KIND_INVEST, *when)
+        return investment
+
+    def backdate(self, kind, *when):
+        # the ledger refuses updates; history is written directly here
+        entries = LedgerEntry.objects.filter(
+            listing=self.listing, kind=kind, created_at__gte=self.started
+        )
+        QuerySet.update(entries, created_at=datetime(*when, tzinfo=dt_timezone.utc))
+
+    def points(self, body):
+        return [(p["start"], p["invested"], p["total"]) for p in body["points"]]
+
+    def test_hourly_and_daily_points(self):
+        now = datetime(2026, 3, 2, 8, 30, tzinfo=dt_timezone.utc)
+        hourly = history.funding_history(self.listing.pk, "1h", now=now)
+        self.assertEqual(
+            self.points(hourly),
+            [
+                ("2026-03-01T09:00:00Z", "150.00", "150.00"),
+                ("2026-03-01T11:00:00Z", "-50.00", "100.00"),
+                ("2026-03-02T08:00:00Z", "30.00", "130.00"),
+            ],
+        )
+        daily = history.funding_history(self.listing.pk, "1d", now=now)
+        self.assertEqual(
+            self.points(daily),
+            [
+                ("2026-03-01T00:00:00Z", "100.00", "100.00"),
+                ("2026-03-02T00:00:00Z", "30.00", "130.00"),
+            ],
+        )
+
+    def test_only_open_buckets_are_recomputed(self):
+        now = datetime(2026, 3, 2, 8, 30, tzinfo=dt_timezone.utc)
+        with self.assertNumQueries(2):  # closed buckets, then the open one
+            first = history.funding_history(self.listing.pk, "1h", now=now)
+        with self.assertNumQueries(1):
+            again = history.funding_history(self.listing.pk, "1h", now=now)
+        self.assertEqual(again, first)
+        _, through = history.closed_points(self.listing.pk, "1h", now=now)
+        self.assertEqual(through, datetime(2026, 3, 2, 8, tzinfo=dt_timezone.utc))
+
+        # once the 08:00 bucket closes, only it is added to the cache
+        later = datetime(2026, 3, 2, 9, 30, tzinfo=dt_timezone.utc)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(
+                history.funding_history(self.listing.pk, "1h", now=later), first
+            )
+        self.assertEqual(len(ctx.captured_queries), 2)
+        points, through = history.closed_points(self.listing.pk, "1h", now=later)
+        self.assertEqual(len(points), 3)
+        self.assertEqual(through, datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc))
+
+    def test_endpoint(self):
+        url = f"/api/listings/{self.listing.pk}/funding-history/"
+        client = APIClient()
+        res = client.get(url, {"bucket": "1h"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["bucket"], "1h")
+        self.assertEqual(res.json()["points"][-1]["total"], "130.00")
+        self.assertEqual(len(client.get(url).json()["points"]), 2)  # 1d
+        self.assertEqual(client.get(url, {"bucket": "5m"}).status_code, 400)
+        missing = f"/api/listings/{self.listing.pk + 1000}/funding-history/"
+        self.assertEqual(client.get(missing).status_code, 404)
+
+
+class MarketplaceStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user("seller@example.com", "pw-123456")
+        self.investor = User.objects.create_user("inv@example.com", "pw-123456")
+        # target 8000 each
+        self.cards = [make_listing(self.seller, category="cards") for _ in range(2)]
+        self.watch = make_listing(self.seller, category="watches")
+        make_listing(self.seller, category="cards", status=Listing.STATUS_DRAFT)
+
+    def invest(self, listing, amount):
+        return Investment.objects.create(
+            investor=self.investor, listing=listing, amount=Decimal(amount)
+        )
+
+    def get_stats(self):
+        cache.delete(stats.CACHE_KEY)
+        return self.client.get("/api/stats/").json()
+
+    def test_incremental_updates(self):
+        self.invest(self.cards[0], "2000")
+        self.invest(self.cards[1], "800")
+        self.invest(self.watch, "8000")
+        self.watch.status = Listing.STATUS_FUNDED
+        self.watch.save()
+        refunded = self.invest(self.cards[1], "400")
+        refunded.delete()
+        batch.create_listings(
+            [
+                {
+                    "title": "Batch",
+                    "description": "d",
+                    "category": "cards",
+                    "asset_value": "1000",
+                    "seller_retain_percent": "0",
+                    "status": Listing.STATUS_LIVE,
+                }
+            ],
+            self.seller,
+            {},
+        )
+
+        data = self.get_stats()
+        cards, watches = data["categories"]
+        self.assertEqual(
+            cards,
+            {
+                "category": "cards",
+                "listings": 3,
+                "live_listings": 3,
+                "total_raised": "2800.00",
+                # (25% + 10% + 0%) / 3
+                "average_percent_funded": "11.67",
+                "by_status": {"live": 3, "funded": 0, "cancelled": 0},
+            },
+        )
+        self.assertEqual(watches["by_status"]["funded"], 1)
+        self.assertEqual(watches["average_percent_funded"], "0.00")
+        self.assertEqual(data["totals"]["total_raised"], "10800.00")
+        self.assertEqual(data["totals"]["listings"], 4)
+        self.assertEqual(stats.verify(), [])
+
+        self.cards[0].category = "watches"
+        self.cards[0].save()
+        # a listing with ledger history is protected; drop it for the test
+        LedgerEntry.objects.filter(listing=self.cards[1]).purge()
+        Listing.objects.get(pk=self.cards[1].pk).delete()
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(self.get_stats()["totals"]["total_raised"], "10000.00")
+
+    def test_funding_lands_under_the_locked_status(self):
+        stale = Listing.objects.get(pk=self.watch.pk)
+        self.watch.status = Listing.STATUS_CANCELLED  # committed first
+        self.watch.save()
+        self.invest(stale, "800")
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(
+            stats.rollup()[("watches", Listing.STATUS_CANCELLED)]["total_raised"],
+            Decimal("800.00"),
+        )
+
+        # sharded funding is counted when it folds into the listing
+        capacity.shard_capacity(self.cards[0], 4)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.invest(self.cards[0], "500")
+        self.assertEqual(stats.verify(), [])
+        callbacks[0]()
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(self.get_stats()["totals"]["total_raised"], "1300.00")
+
+    def test_cached_endpoint(self):
+        self.client.get("/api/stats/")
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/stats/")
+        self.assertEqual(res.json()["totals"]["live_listings"], 3)
+
+    def test_recompute_command_reports_and_fixes_drift(self):
+        self.invest(self.cards[0], "2000")
+        # counters written behind the rollup's back
+        Listing.objects.filter(pk=self.watch.pk).update(total_invested=100)
+
+        out = StringIO()
+        call_command("recompute_stats", dry_run=True, stdout=out)
+        self.assertRegex(
+            out.getvalue(), r"watches/live: total_raised 0(\.00)? -> 100(\.00)?\n"
+        )
+        self.assertIn("found 2 drifted value(s).", out.getvalue())
+
+        call_command("recompute_stats", stdout=StringIO())
+        self.assertEqual(stats.verify(), [])
+        self.assertEqual(self.get_stats()["totals"]["total_raised"], "2100.00")
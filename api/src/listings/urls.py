@@ -1,7 +1,12 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import ListingViewSet
+from .views import ListingViewSet, export_view, stats_view
 
 router = DefaultRouter()
 router.register(r"listings", ListingViewSet, basename="listings")
 
-urlpatterns = router.urls
+# Before the router, whose "listings/<pk>.<format>" route would also match
+urlpatterns = [
+    path("listings/export.<str:fmt>", export_view),
+    path("stats/", stats_view),
+] + router.urls
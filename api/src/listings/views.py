@@ -1,6 +1,24 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.cache import get_conditional_response
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action, api_view, permission_classes
+from core import export, replicas
+from core.asyncviews import AsyncReadMixin
+from core.conditional import ConditionalGetMixin
+from core.fastlist import FAST_RENDERER_CLASSES, FastListMixin
+from core.replicas import ReplicaReadsMixin
+from core.sparse import SparseFieldsetMixin
+from . import batch
+from . import cache as listing_cache
+from . import history
+from . import live
+from . import stats
+from . import search
 from .models import Listing
-from .serializers import ListingSerializer
+from .serializers import ListingSerializer, ListingSummarySerializer
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 
@@ -23,19 +41,130 @@ class IsSellerOrReadOnly(permissions.BasePermission):
         return super().destroy(request, *args, **kwargs)
 
 
-class ListingViewSet(viewsets.ModelViewSet):
+class CachedAnonymousReadsMixin:
+    """
+    Anonymous marketplace reads are identical for everyone, so serve them
+    from the versioned cache in listings/cache.py. The conditional-GET
+    validators are cached with the body, so cache hits and 304s cost no
+    queries at all. Must come before ConditionalGetMixin in the bases.
+    alist / aretrieve do the same for the async read path. Entries are
+    always built from the primary (see core/replicas.py).
+    """
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        def build():
+            with replicas.primary():
+                response = super(ConditionalGetMixin, self).list(
+                    request, *args, **kwargs
+                )
+                return self.get_page_validators(), response.data
+
+        key = listing_cache.list_key(request)
+        return self._cached_response(request, *listing_cache.get_or_build(key, build))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            # normalized, so "/listings/007/" can't dodge invalidation
+            listing_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            listing_id = None
+        if request.user.is_authenticated or listing_id is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        def build():
+            with replicas.primary():
+                response = super(ConditionalGetMixin, self).retrieve(
+                    request, *args, **kwargs
+                )
+                return self.validators_for([self._object]), response.data
+
+        key = listing_cache.detail_key(listing_id)
+        return self._cached_response(request, *listing_cache.get_or_build(key, build))
+
+    async def alist(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return await super().alist(request, *args, **kwargs)
+
+        async def build():
+            with replicas.primary():
+                response = await super(ConditionalGetMixin, self).alist(
+                    request, *args, **kwargs
+                )
+                return self.get_page_validators(), response.data
+
+        key = await sync_to_async(listing_cache.list_key)(request)
+        cached = await listing_cache.aget_or_build(key, build)
+        return self._cached_response(request, *cached)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            listing_id = int(kwargs[self.lookup_field])
+        except ValueError:
+            listing_id = None
+        if request.user.is_authenticated or listing_id is None:
+            return await super().aretrieve(request, *args, **kwargs)
+
+        async def build():
+            with replicas.primary():
+                response = await super(ConditionalGetMixin, self).aretrieve(
+                    request, *args, **kwargs
+                )
+                return self.validators_for([self._object]), response.data
+
+        key = await sync_to_async(listing_cache.detail_key)(listing_id)
+        cached = await listing_cache.aget_or_build(key, build)
+        return self._cached_response(request, *cached)
+
+    def _cached_response(self, request, validators, data):
+        not_modified = get_conditional_response(request, *validators)
+        if not_modified is not None:
+            return not_modified
+        return self.set_validators(Response(data), validators)
+
+
+class ListingViewSet(
+    ReplicaReadsMixin,
+    CachedAnonymousReadsMixin,
+    ConditionalGetMixin,
+    SparseFieldsetMixin,
+    FastListMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = ListingSerializer
+    summary_serializer_class = ListingSummarySerializer
+    field_columns = {"percent_funded": ("total_invested", "target_amount")}
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsSellerOrReadOnly]
+    etag_fields = ("updated_at", "funding_version")
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    @property
+    def search_query(self):
+        return self.request.query_params.get("q", "").strip()
+
+    @property
+    def keyset_ordering(self):
+        # ?q= results come best match first
+        if self.action == "list" and self.search_query:
+            return ("-search_rank", "-created_at", "-id")
+        return ("-created_at", "-id")
 
     def get_queryset(self):
         qs = (
             Listing.objects.all()
             .select_related("seller")
-            .order_by("-created_at")
+            .defer("search_vector")
+            .order_by("-created_at", "-id")
         )
         request = self.request
         user = getattr(request, "user", None)
 
+        if self.action == "list" and self.search_query:
+            qs = search.search(qs, self.search_query).order_by(*self.keyset_ordering)
+
         status_param = self.request.query_params.get("status")
         if status_param:
             qs = qs.filter(status=status_param)
@@ -50,11 +179,64 @@ class ListingViewSet(viewsets.ModelViewSet):
                 # if not logged in, no personal listings
                 qs = Listing.objects.none()
 
-        return qs
+        # only the columns (and the seller join) the response needs
+        return self.narrow_queryset(qs)
 
     def perform_create(self, serializer):
         serializer.save(seller=self.request.user)
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Create up to batch.MAX_BATCH_SIZE listings from a JSON list in one
+        insert. Valid items are created even if others fail; the response
+        has both, and is 400 only when nothing could be created.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "Expected a non-empty list of listings."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > batch.MAX_BATCH_SIZE:
+            return Response(
+                {"detail": f"At most {batch.MAX_BATCH_SIZE} listings per batch."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created, errors = batch.create_listings(
+            items, request.user, self.get_serializer_context()
+        )
+        return Response(
+            {
+                "created": self.get_serializer(created, many=True).data,
+                "errors": errors,
+            },
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=True, methods=["get"], url_path="funding-history")
+    def funding_history(self, request, pk=None):
+        """
+        Funding over time in ?bucket=1h or 1d (the default) buckets; see
+        listings/history.py.
+        """
+        bucket = request.query_params.get("bucket", "1d")
+        if bucket not in history.BUCKETS:
+            return Response(
+                {"bucket": f"Expected one of {', '.join(history.BUCKETS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            listing_id = int(pk)
+        except ValueError:
+            listing_id = None
+        if listing_id is None or not Listing.objects.filter(pk=listing_id).exists():
+            return Response(
+                {"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(history.funding_history(listing_id, bucket))
+
     def update(self, request, *args, **kwargs):
         """
         Handles both PUT and PATCH.
@@ -88,3 +270,76 @@ class ListingViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data)
 
+
+EXPORT_COLUMNS = [
+    ("id", "id"),
+    ("seller_id", "seller_id"),
+    ("seller_email", "seller__email"),
+    ("title", "title"),
+    ("category", "category"),
+    ("description", "description"),
+    ("status", "status"),
+    ("asset_value", "asset_value"),
+    ("seller_retain_percent", "seller_retain_percent"),
+    ("target_amount", "target_amount"),
+    ("min_investment", "min_investment"),
+    ("total_invested", "total_invested"),
+    ("investor_count", "investor_count"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+]
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def export_view(request, fmt):
+    """Staff-only streaming dump of every listing (see core/export.py)."""
+    qs = export.filter_export(
+        Listing.objects.all(), request.query_params, "id", "status"
+    )
+    return export.export_response(request, qs, EXPORT_COLUMNS, fmt, "listings")
+
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def stats_view(request):
+    """Marketplace numbers per category (see listings/stats.py)."""
+    return Response(stats.get_marketplace())
+
+
+def _event_stream(listing_ids):
+    response = StreamingHttpResponse(
+        live.stream(listing_ids), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # tell proxies not to buffer
+    return response
+
+
+@require_safe
+async def funding_stream_view(request, pk):
+    """SSE funding progress for one listing (see listings/live.py)."""
+    if not await Listing.objects.filter(pk=pk).aexists():
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _event_stream([pk])
+
+
+@require_safe
+async def funding_multiplex_view(request):
+    """SSE funding progress for the listings in ?ids=1,2,3 on one connection."""
+    try:
+        raw = request.GET.get("ids", "").split(",")
+        ids = sorted({int(i) for i in raw if i.strip()})
+    except ValueError:
+        ids = None
+    limit = settings.FUNDING_STREAM_MAX_LISTINGS
+    if not ids or len(ids) > limit:
+        return JsonResponse(
+            {"ids": f"Give 1 to {limit} comma-separated listing ids."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    existing = Listing.objects.filter(pk__in=ids).values_list("pk", flat=True)
+    ids = [pk async for pk in existing]
+    if not ids:
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _event_stream(ids)
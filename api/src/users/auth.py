@@ -0,0 +1,49 @@
+"""
+Session authentication without database reads in the common case.
+
+Sessions use the cached_db engine (see SESSION_ENGINE), and
+`CachedModelBackend` keeps the session's user in the cache by id. Entries
+are dropped whenever the user row is saved (profile edits, password
+changes, last_login on login) or deleted, and on logout. Django still
+checks the session's auth hash against the cached user's password hash,
+so a password change invalidates other sessions exactly as before.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+UserModel = get_user_model()
+
+
+def cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def invalidate(user_id):
+    cache.delete(cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        user = cache.get(cache_key(user_id))
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(cache_key(user_id), user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id):
+        user = await cache.aget(cache_key(user_id))
+        if user is None:
+            try:
+                user = await UserModel._default_manager.aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            if not self.user_can_authenticate(user):
+                return None
+            await cache.aset(
+                cache_key(user_id), user, settings.AUTH_USER_CACHE_TIMEOUT
+            )
+        return user
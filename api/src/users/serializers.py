@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from core.metrics import TimedSerializerMixin
 
 User = get_user_model()
 
@@ -16,7 +17,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             name=validated.get("name", ""),
         )
 
-class MeSerializer(serializers.ModelSerializer):
+class MeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("id", "email", "name")
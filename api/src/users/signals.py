@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import auth
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, **kwargs):
+    # Drop it now and again after commit, so a request that re-cached the
+    # old row before the commit doesn't keep serving it.
+    auth.invalidate(instance.pk)
+    transaction.on_commit(lambda: auth.invalidate(instance.pk))
+
+
+@receiver(user_logged_out)
+def logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        auth.invalidate(user.pk)
@@ -1,3 +1,137 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from investments.models import Investment
+from listings.models import Listing
+from . import auth
+
+User = get_user_model()
+
+
+class PortfolioViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        seller = User.objects.create_user("seller@example.com")
+        self.investor = User.objects.create_user("inv@example.com")
+        other = User.objects.create_user("other@example.com")
+        self.watch = Listing.objects.create(
+            seller=seller,
+            title="Rolex Daytona",
+            description="",
+            asset_value=Decimal("20000.00"),
+            seller_retain_percent=Decimal("50.00"),
+            status=Listing.STATUS_LIVE,
+        )
+        self.card = Listing.objects.create(
+            seller=seller,
+            title="Charizard",
+            description="",
+            asset_value=Decimal("4000.00"),
+            seller_retain_percent=Decimal("0.00"),
+            status=Listing.STATUS_LIVE,
+        )
+        for listing, amount in (
+            (self.watch, "1000"),
+            (self.watch, "500"),
+            (self.card, "400"),
+        ):
+            Investment.objects.create(
+                investor=self.investor, listing=listing, amount=Decimal(amount)
+            )
+        Investment.objects.create(
+            investor=other, listing=self.watch, amount=Decimal("2500")
+        )
+
+    def test_requires_login(self):
+        self.assertEqual(self.client.get("/api/auth/portfolio").status_code, 401)
+
+    def test_positions_and_totals_in_one_query(self):
+        self.client.force_authenticate(self.investor)
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/auth/portfolio")
+        self.assertEqual(res.status_code, 200)
+
+        positions = {p["listing"]: p for p in res.data["positions"]}
+        watch = positions[self.watch.pk]
+        self.assertEqual(watch["total_invested"], "1500.00")
+        self.assertEqual(watch["investments"], 2)
+        self.assertEqual(watch["ownership_percent"], "7.50")
+        self.assertEqual(watch["percent_funded"], "40.00")
+        self.assertEqual(watch["listing_status"], Listing.STATUS_LIVE)
+        self.assertEqual(positions[self.card.pk]["ownership_percent"], "10.00")
+        self.assertEqual(
+            res.data["totals"],
+            {"total_invested": "1900.00", "listings": 2, "investments": 3},
+        )
+
+    def test_cached_until_user_invests(self):
+        self.client.force_authenticate(self.investor)
+        self.client.get("/api/auth/portfolio")
+        with self.assertNumQueries(0):
+            self.client.get("/api/auth/portfolio")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Investment.objects.create(
+                investor=self.investor, listing=self.card, amount=Decimal("100")
+            )
+        res = self.client.get("/api/auth/portfolio")
+        self.assertEqual(res.data["totals"]["total_invested"], "2000.00")
+
+
+class CachedSessionAuthTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("inv@example.com", "pw-123456", "Ann")
+        self.client = APIClient()
+        res = self.client.post(
+            "/api/auth/login", {"email": "inv@example.com", "password": "pw-123456"}
+        )
+        self.assertEqual(res.status_code, 200)
+
+    def test_warm_auth_costs_no_queries(self):
+        self.client.get("/api/auth/me")  # login saved last_login: first load
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/auth/me")
+        self.assertEqual(res.data["email"], "inv@example.com")
+        timing = res["Server-Timing"]
+        self.assertIn('db;dur=0.0;desc="0 queries"', timing)
+        self.assertIn("auth;dur=", timing)
+
+    @override_settings(ROOT_URLCONF="core.asgi_urls")
+    def test_async_auth_costs_no_queries(self):
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+        async_to_sync(client.get)("/api/auth/me")
+        with self.assertNumQueries(0):
+            res = async_to_sync(client.get)("/api/auth/me")
+        self.assertEqual(res.json()["email"], "inv@example.com")
+
+    def test_sessions_from_model_backend_still_authenticate(self):
+        session = self.client.session
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session.save()
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 200)
+
+    def test_invalidated_when_user_changes(self):
+        self.client.get("/api/auth/me")
+        self.user.name = "Ann B."
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/me").data["name"], "Ann B.")
+
+        # a password change (without update_session_auth_hash) ends the session
+        self.user.set_password("new-pw-123456")
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
+
+    def test_invalidated_on_logout(self):
+        self.client.get("/api/auth/me")
+        self.assertIsNotNone(cache.get(auth.cache_key(self.user.pk)))
+        self.client.post("/api/auth/logout")
+        self.assertIsNone(cache.get(auth.cache_key(self.user.pk)))
+        self.assertEqual(self.client.get("/api/auth/me").status_code, 401)
@@ -1,9 +1,12 @@
 from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_protect
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from investments.portfolio import get_portfolio
 from .serializers import RegisterSerializer, MeSerializer
 
 User = get_user_model()
@@ -49,3 +52,19 @@ def me_view(request):
         return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
     return Response(MeSerializer(request.user).data)
 
+
+@require_safe
+async def ame_view(request):
+    # me_view for the ASGI entry point; no queries once the session and its
+    # user are cached (users/auth.py)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    return JsonResponse(MeSerializer(user).data)
+
+
+@api_view(["GET"])
+def portfolio_view(request):
+    if not request.user.is_authenticated:
+        return Response({"detail": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response(get_portfolio(request.user))
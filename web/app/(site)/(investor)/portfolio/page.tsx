@@ -1,6 +1,7 @@
 "use client";
 
 import { useEffect, useState } from "react";
+import { collectPages, Page } from "@/lib/paginate";
 
 type Investment = {
   id: number;
@@ -58,12 +59,18 @@ export default function PortfolioPage() {
           return;
         }
   
-        const invData = (await invRes.json()) as Investment[];
+        const invData = await collectPages(
+          (await invRes.json()) as Page<Investment>,
+          { credentials: "include" },
+        );
   
         // If listings request fails, we just skip seller holdings, but keep investments
         let sellerListings: ListingSummary[] = [];
         if (myListingsRes.ok) {
-          sellerListings = (await myListingsRes.json()) as ListingSummary[];
+          sellerListings = await collectPages(
+            (await myListingsRes.json()) as Page<ListingSummary>,
+            { credentials: "include" },
+          );
         }
   
         // Build synthetic holdings from seller-retained ownership
@@ -1,6 +1,7 @@
 "use client";
 
 import { useEffect, useState } from "react";
+import { Page } from "@/lib/paginate";
 
 type Listing = {
   id: number;
@@ -21,7 +22,9 @@ const apiBase =
 
 export default function MarketplacePage() {
   const [listings, setListings] = useState<Listing[]>([]);
+  const [next, setNext] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
@@ -32,7 +35,22 @@ export default function MarketplacePage() {
       try {
         // For now: show ALL listings (draft + live) so you can see your data.
         // Later we can change this to `${apiBase}/listings/?status=live`
-        const res = await fetch(`${apiBase}/listings/?status=live`, {
+        // List responses default to a compact summary; ask for the extra
+        // fields the cards show.
+        const fields = [
+          "id",
+          "title",
+          "description",
+          "seller_name",
+          "asset_value",
+          "seller_retain_percent",
+          "target_amount",
+          "total_invested",
+          "percent_funded",
+          "min_investment",
+          "status",
+        ].join(",");
+        const res = await fetch(`${apiBase}/listings/?status=live&fields=${fields}`, {
           credentials: "include",
         });
 
@@ -42,8 +60,9 @@ export default function MarketplacePage() {
           return;
         }
 
-        const data = (await res.json()) as Listing[];
-        setListings(data);
+        const data = (await res.json()) as Page<Listing>;
+        setListings(data.results);
+        setNext(data.next);
       } catch (e) {
         console.error("Network error fetching listings:", e);
         setError("Network error while loading marketplace.");
@@ -56,6 +75,27 @@ export default function MarketplacePage() {
     fetchListings();
   }, []);
 
+  // The API pages listings; the next page is fetched on request.
+  async function loadMore() {
+    if (!next) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(next, { credentials: "include" });
+      if (!res.ok) {
+        setError(`Failed to load listings (status ${res.status})`);
+        return;
+      }
+      const data = (await res.json()) as Page<Listing>;
+      setListings((current) => [...current, ...data.results]);
+      setNext(data.next);
+    } catch (e) {
+      console.error("Network error fetching listings:", e);
+      setError("Network error while loading marketplace.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   if (loading) {
     return (
       <main className="p-8 max-w-6xl mx-auto">
@@ -158,6 +198,18 @@ export default function MarketplacePage() {
           })}
         </div>
       )}
+
+      {next && (
+        <div className="mt-6 flex justify-center">
+          <button
+            disabled={loadingMore}
+            onClick={loadMore}
+            className="rounded-full border border-foreground/20 px-4 py-1.5 text-sm hover:border-foreground/40 disabled:opacity-60"
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </main>
   );
 }
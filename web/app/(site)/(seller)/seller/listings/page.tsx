@@ -1,6 +1,7 @@
 "use client";
 
 import { useEffect, useState } from "react";
+import { collectPages, Page } from "@/lib/paginate";
 
 type Listing = {
   id: number;
@@ -83,8 +84,8 @@ export default function SellerListingsPage() {
         return;
       }
 
-      const data = (await res.json()) as Listing[];
-      setListings(data);
+      const data = (await res.json()) as Page<Listing>;
+      setListings(await collectPages(data, { credentials: "include" }));
     } catch (e) {
       console.error("Network error loading seller listings:", e);
       setError("Network error while loading your listings.");
@@ -0,0 +1,23 @@
+// List endpoints return keyset pages: { next, previous, results }.
+export type Page<T> = {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+};
+
+// Follow `next` links from an already-fetched first page and return every row.
+export async function collectPages<T>(
+  first: Page<T>,
+  init?: RequestInit,
+): Promise<T[]> {
+  const rows = [...first.results];
+  let next = first.next;
+  while (next) {
+    const res = await fetch(next, init);
+    if (!res.ok) break;
+    const page = (await res.json()) as Page<T>;
+    rows.push(...page.results);
+    next = page.next;
+  }
+  return rows;
+}